@@ -0,0 +1,176 @@
+from collections import defaultdict
+from datetime import datetime
+import asyncio
+import logging
+import time
+
+from sqlalchemy import insert
+
+import database
+import models
+import user_stats
+
+
+class ActivitySink:
+    """
+    Write-behind logger for UserActivity rows.
+
+    Handlers call log(), which only appends the event to a bounded in-memory
+    queue; a background flusher bulk-inserts queued events (one INSERT and one
+    commit per batch, which also updates the users' user_stats rollups) every
+    `flush_interval_ms` or as soon as `batch_size` events are waiting. When the
+    queue is full, log() waits up to `put_timeout` seconds for the flusher to
+    make room (backpressure) and then drops the event rather than stall the
+    request further. stop() drains the queue, so a clean shutdown loses nothing.
+
+    Until start() has run (or after stop()) events are inserted directly, one
+    transaction each.
+    """
+
+    def __init__(self, max_queue: int = 10000, batch_size: int = 500, flush_interval_ms: int = 200,
+                 put_timeout: float = 1.0, enabled: bool = True):
+        self.max_queue = max_queue
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.put_timeout = put_timeout
+        self.enabled = enabled
+        self._queue = None
+        self._batch_ready = None
+        self._task = None
+        self._flushing = None
+        self._stats = {
+            "logged": 0,
+            "written": 0,
+            "batches": 0,
+            "backpressure_waits": 0,
+            "dropped": 0,
+            "failed": 0,
+            "max_batch": 0,
+            "flush_ms_total": 0.0,
+        }
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        """Start the background flusher on the running event loop"""
+        if not self.enabled or self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._batch_ready = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flusher and write everything still queued"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        if self._flushing is not None:
+            await self._flushing
+        while not self._queue.empty():
+            await self._flush(self._take(self.batch_size))
+        logger = logging.getLogger(__name__)
+        logger.info(f"✓ Activity sink drained ({self._stats['written']} activities written)")
+
+    async def log(self, user_id: str, activity_type: str, activity_data: dict = None, meta_data: dict = None) -> bool:
+        """
+        Record one activity. Returns False if it was dropped because the
+        queue stayed full for `put_timeout` seconds.
+        """
+        event = {
+            "user_id": user_id,
+            "activity_type": activity_type,
+            "activity_data": activity_data,
+            "meta_data": meta_data,
+            "created_at": datetime.utcnow(),  # event time, not flush time
+        }
+        self._stats["logged"] += 1
+        if not self.running:
+            await self._flush([event])
+            return True
+
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self._stats["backpressure_waits"] += 1
+            try:
+                await asyncio.wait_for(self._queue.put(event), self.put_timeout)
+            except asyncio.TimeoutError:
+                self._stats["dropped"] += 1
+                logger = logging.getLogger(__name__)
+                logger.warning(f"⚠️ Activity queue full ({self.max_queue}); dropped {activity_type} activity for user {user_id}")
+                return False
+        if self._queue.qsize() >= self.batch_size:
+            self._batch_ready.set()
+        return True
+
+    def _take(self, limit: int) -> list:
+        batch = []
+        while len(batch) < limit and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            try:
+                if self._queue.qsize() + 1 < self.batch_size:
+                    self._batch_ready.clear()
+                    try:
+                        await asyncio.wait_for(self._batch_ready.wait(), self.flush_interval)
+                    except asyncio.TimeoutError:
+                        pass
+            finally:
+                # Also on cancellation: stop() awaits this flush, so a dequeued event is never lost
+                batch += self._take(self.batch_size - 1)
+                self._flushing = asyncio.ensure_future(self._flush(batch))
+            await asyncio.shield(self._flushing)
+            self._flushing = None
+
+    async def _flush(self, batch: list):
+        if not batch:
+            return
+        started = time.perf_counter()
+        try:
+            await asyncio.to_thread(self._insert, batch)
+        except Exception:
+            self._stats["failed"] += len(batch)
+            logger = logging.getLogger(__name__)
+            logger.exception(f"❌ Failed to write {len(batch)} activities")
+            return
+        self._stats["written"] += len(batch)
+        self._stats["batches"] += 1
+        self._stats["max_batch"] = max(self._stats["max_batch"], len(batch))
+        self._stats["flush_ms_total"] += (time.perf_counter() - started) * 1000
+
+    def _insert(self, batch: list):
+        db = database.SessionLocal()
+        try:
+            db.execute(insert(models.UserActivity), batch)
+            deltas = defaultdict(user_stats.StatsDelta)
+            for event in batch:
+                deltas[event["user_id"]].add_activity(event["activity_type"], event["created_at"])
+            user_stats.apply_deltas(db.connection(), deltas)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def get_stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "running": self.running,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue": self.max_queue,
+            "batch_size": self.batch_size,
+            **self._stats,
+            "flush_ms_total": round(self._stats["flush_ms_total"], 2),
+        }
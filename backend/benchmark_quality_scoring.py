@@ -0,0 +1,173 @@
+"""
+Quality scoring benchmark
+
+Compares the single-pass scoring engine (quality_scoring.score_prompt) with
+the original regex-per-feature implementation kept below as the reference,
+checks that both produce identical scores, and prints timings for 1 KB,
+10 KB and 100 KB prompts plus the batch (score_many) throughput.
+
+Usage:
+    python benchmark_quality_scoring.py
+    python benchmark_quality_scoring.py --sizes 1000,50000 --repeat 20
+"""
+
+import argparse
+import random
+import re
+import time
+
+from quality_scoring import score_many, score_prompt
+
+SAMPLE_TEXT = """Build a production-ready REST API for an e-commerce platform. The API must handle 10000 users
+and respond within 200ms for at least 95% of requests, e.g.checkout and search. Use case: customers browse
+the catalog, add items to a cart and pay. Currently the existing system is a monolith; the goal is better than
+2 seconds per page. Consider caching (Redis) and a PostgreSQL database schema with indexes.
+
+- Design the authentication module with JWT and encryption at rest
+- Avoid N+1 queries; limit payloads to 5 MB
+* Include a dashboard for business stakeholders
+1. Define the data model
+2. Implement the endpoints, i.e.orders, payments and refunds
+3. Write tests such as contract tests for instance, following best practice and quality standards
+
+Output: a structured report in Markdown format, nice-to-have: a high-performance enterprise-grade deployment template.
+"""
+
+
+def legacy_quality_scores(prompt: str) -> dict:
+    """The original GeminiService.generate_quality_scores, kept as the reference"""
+    words = len(prompt.split())
+    sentences = len([s for s in prompt.split('.') if s.strip()])
+    paragraphs = len([p for p in prompt.split('\n\n') if p.strip()])
+
+    action_verbs = len(re.findall(
+        r'\b(create|build|implement|design|develop|optimize|analyze|generate|process|handle|manage|define|structure|architect|deploy|monitor|test|validate|verify|ensure|provide|deliver|produce|make|establish)\b',
+        prompt, re.I))
+    specific_terms = len(re.findall(
+        r'\b(specific|detailed|comprehensive|professional|optimized|efficient|scalable|robust|secure|reliable|production-ready|enterprise-grade|high-performance)\b',
+        prompt, re.I))
+    technical_terms = len(re.findall(
+        r'\b(api|database|function|error|security|performance|architecture|schema|algorithm|framework|library|module|component|interface|protocol|encryption|authentication|cache|query|transaction)\b',
+        prompt, re.I))
+
+    must_haves = len(re.findall(r'\b(must|should|require|mandatory|essential|critical)\b', prompt, re.I))
+    nice_to_haves = len(re.findall(r'\b(could|might|consider|optionally|may|nice-to-have|future)\b', prompt, re.I))
+    constraints = len(re.findall(r'\b(limit|constraint|restrict|avoid|prevent|maximum|minimum|threshold)\b', prompt, re.I))
+
+    context_indicators = len(re.findall(
+        r'\b(background|context|currently|existing|problem|challenge|goal|objective|use case|scenario|situation|environment)\b',
+        prompt, re.I))
+    examples_provided = len(re.findall(r'\b(example|such as|for instance|like|e\.g\.|i\.e\.)\b', prompt, re.I))
+    domain_terms = len(re.findall(
+        r'\b(user|customer|business|enterprise|industry|market|stakeholder|requirement|workflow|process)\b',
+        prompt, re.I))
+    context_richness = min(10, (context_indicators * 1.2) + (examples_provided * 1.5) + (domain_terms * 0.8))
+
+    quantitative_specs = len(re.findall(r'\b\d+\s*(users?|items?|records?|requests?|ms|seconds?|GB|MB|%)\b', prompt, re.I))
+    comparison_terms = len(re.findall(r'\b(better than|faster than|more than|less than|at least|up to|within)\b', prompt, re.I))
+    boundary_definitions = len(re.findall(r'\b(between|from|to|range|scope|include|exclude)\b', prompt, re.I))
+    constraint_clarity = min(10, (constraints * 1.0) + (quantitative_specs * 1.5) + (comparison_terms * 1.2) + (boundary_definitions * 0.8))
+
+    deliverable_terms = len(re.findall(
+        r'\b(output|deliverable|result|artifact|document|code|design|report|dashboard|visualization|specification)\b',
+        prompt, re.I))
+    format_specs = len(re.findall(r'\b(format|structure|template|schema|layout|style|type)\b', prompt, re.I))
+    quality_criteria = len(re.findall(
+        r'\b(quality|standard|best practice|professional|production|complete|comprehensive)\b',
+        prompt, re.I))
+    output_specification = min(10, (deliverable_terms * 1.3) + (format_specs * 1.0) + (quality_criteria * 0.9))
+
+    clarity = min(10, (action_verbs * 1.5) + (3 if sentences > 0 else 0) + min(2, words / 50))
+    specificity = min(10, (specific_terms * 1.2) + (technical_terms * 0.8) + (constraints * 0.5))
+    completeness = min(10, (must_haves * 0.8) + (nice_to_haves * 0.4) + (paragraphs * 0.5) + min(3, words / 100))
+    technical = min(10, (technical_terms * 1.5) + (len(re.findall(r'[{}()\[\]]', prompt)) * 0.3))
+    structure = min(10, (paragraphs * 0.5) + (len(re.findall(r'^[-•*]\s', prompt, re.M)) * 0.5) + (len(re.findall(r'\d+\.', prompt)) * 0.4))
+    practicality = min(10, (action_verbs * 1.0) + (constraints * 0.6) + (must_haves * 0.5))
+
+    overall = (
+        clarity * 0.15 +
+        specificity * 0.15 +
+        completeness * 0.10 +
+        technical * 0.10 +
+        structure * 0.08 +
+        practicality * 0.10 +
+        context_richness * 0.12 +
+        constraint_clarity * 0.10 +
+        output_specification * 0.10
+    )
+
+    return {
+        "clarity": round(clarity, 2),
+        "specificity": round(specificity, 2),
+        "completeness": round(completeness, 2),
+        "technical": round(technical, 2),
+        "structure": round(structure, 2),
+        "practicality": round(practicality, 2),
+        "context_richness": round(context_richness, 2),
+        "constraint_clarity": round(constraint_clarity, 2),
+        "output_specification": round(output_specification, 2),
+        "overall": round(overall, 2),
+        "metadata": {
+            "word_count": words,
+            "sentence_count": sentences,
+            "paragraph_count": paragraphs,
+            "action_verbs": action_verbs,
+            "specific_terms": specific_terms,
+            "technical_terms": technical_terms,
+            "requirements_indicators": must_haves + nice_to_haves,
+            "context_indicators": context_indicators,
+            "quantitative_specs": quantitative_specs,
+            "deliverable_terms": deliverable_terms
+        }
+    }
+
+
+def make_prompt(size: int, seed: int = 0) -> str:
+    """Prompt of `size` characters built from shuffled lines of the sample text"""
+    rng = random.Random(seed)
+    lines = SAMPLE_TEXT.splitlines(keepends=True)
+    parts, length = [], 0
+    while length < size:
+        line = rng.choice(lines)
+        parts.append(line)
+        length += len(line)
+    return "".join(parts)[:size]
+
+
+def _time(function, prompt: str, repeat: int) -> float:
+    """Best-of-`repeat` wall time in milliseconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function(prompt)
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the quality scoring engine")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="Prompt sizes in characters")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--batch", type=int, default=20000, help="Prompts in the score_many throughput run")
+    args = parser.parse_args()
+
+    print(f"{'size':>8}  {'legacy ms':>10}  {'engine ms':>10}  {'speedup':>8}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        prompt = make_prompt(size)
+        if score_prompt(prompt) != legacy_quality_scores(prompt):
+            raise SystemExit(f"❌ Scores differ from the reference implementation at {size} characters")
+        legacy_ms = _time(legacy_quality_scores, prompt, args.repeat)
+        engine_ms = _time(score_prompt, prompt, args.repeat)
+        print(f"{size:>8}  {legacy_ms:>10.2f}  {engine_ms:>10.2f}  {legacy_ms / engine_ms:>7.1f}x")
+
+    if args.batch:
+        rng = random.Random(1)
+        prompts = [make_prompt(rng.randint(50, 600), seed=i) for i in range(args.batch)]
+        started = time.perf_counter()
+        score_many(prompts)
+        elapsed = time.perf_counter() - started
+        print(f"\nscore_many: {args.batch} prompts (50-600 chars) in {elapsed:.2f}s = {args.batch / elapsed * 60:,.0f} prompts/min")
+
+
+if __name__ == "__main__":
+    main()
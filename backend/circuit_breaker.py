@@ -0,0 +1,99 @@
+from collections import deque
+import logging
+import time
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker for one upstream model.
+
+    closed     - calls go through; failures inside `window_seconds` are counted
+    open       - after `failure_threshold` failures in the window, calls are
+                 short-circuited to the local fallback for `recovery_seconds`
+    half_open  - then up to `half_open_probes` calls are let through at a time;
+                 `success_threshold` successes close the breaker again, any
+                 failure re-opens it
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, window_seconds: float = 60,
+                 recovery_seconds: float = 30, half_open_probes: int = 2, success_threshold: int = 2):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.window_seconds = window_seconds
+        self.recovery_seconds = recovery_seconds
+        self.half_open_probes = half_open_probes
+        self.success_threshold = success_threshold
+
+        self.state = self.CLOSED
+        self._failures = deque()
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self._stats = {"short_circuited": 0, "times_opened": 0}
+
+    def allow_request(self) -> bool:
+        """Whether a call may go upstream now; every allowed call must be followed by one record_* call"""
+        if self.state == self.OPEN:
+            if time.monotonic() - self._opened_at < self.recovery_seconds:
+                self._stats["short_circuited"] += 1
+                return False
+            self._transition(self.HALF_OPEN)
+
+        if self.state == self.HALF_OPEN:
+            if self._probes_in_flight >= self.half_open_probes:
+                self._stats["short_circuited"] += 1
+                return False
+            self._probes_in_flight += 1
+        return True
+
+    def record_success(self):
+        if self.state == self.HALF_OPEN:
+            self._probes_in_flight = max(0, self._probes_in_flight - 1)
+            self._probe_successes += 1
+            if self._probe_successes >= self.success_threshold:
+                self._transition(self.CLOSED)
+
+    def record_failure(self):
+        now = time.monotonic()
+        if self.state == self.HALF_OPEN:
+            self._transition(self.OPEN)
+            return
+        self._failures.append(now)
+        while self._failures and now - self._failures[0] > self.window_seconds:
+            self._failures.popleft()
+        if self.state == self.CLOSED and len(self._failures) >= self.failure_threshold:
+            self._transition(self.OPEN)
+
+    def record_neutral(self):
+        """The call ended without telling us anything about upstream health (e.g. local queue full, cancelled)"""
+        if self.state == self.HALF_OPEN:
+            self._probes_in_flight = max(0, self._probes_in_flight - 1)
+
+    def _transition(self, state: str):
+        logger = logging.getLogger(__name__)
+        logger.warning(f"🔌 Circuit breaker for '{self.name}': {self.state} -> {state}")
+        self.state = state
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        if state == self.OPEN:
+            self._opened_at = time.monotonic()
+            self._stats["times_opened"] += 1
+        elif state == self.CLOSED:
+            self._failures.clear()
+
+    def get_state(self) -> dict:
+        """Breaker state for the health endpoint"""
+        retry_in = 0.0
+        if self.state == self.OPEN:
+            retry_in = max(0.0, self.recovery_seconds - (time.monotonic() - self._opened_at))
+        return {
+            "state": self.state,
+            "recent_failures": len(self._failures),
+            "failure_threshold": self.failure_threshold,
+            "retry_in_seconds": round(retry_in, 1),
+            **self._stats,
+        }
@@ -1,3 +1,4 @@
+import json
 import os
 from dotenv import load_dotenv
 
@@ -22,3 +23,113 @@ RAPTOR_MODEL_NAME = os.getenv("RAPTOR_MODEL_NAME", "raptor-mini-preview")
 HOST = os.getenv("HOST", "0.0.0.0")  # Changed to 0.0.0.0 for production
 PORT = int(os.getenv("PORT", 8000))
 DEBUG = os.getenv("DEBUG", "False").lower() == "true"  # Changed default to False for production
+
+# Optimization result cache (in-memory LRU in front of the optimization_cache table)
+OPTIMIZATION_CACHE_ENABLED = os.getenv("OPTIMIZATION_CACHE_ENABLED", "True").lower() == "true"
+OPTIMIZATION_CACHE_MAX_ENTRIES = int(os.getenv("OPTIMIZATION_CACHE_MAX_ENTRIES", 512))
+OPTIMIZATION_CACHE_TTL_SECONDS = int(os.getenv("OPTIMIZATION_CACHE_TTL_SECONDS", 86400))
+OPTIMIZATION_CACHE_PERSISTENT = os.getenv("OPTIMIZATION_CACHE_PERSISTENT", "True").lower() == "true"
+# Expired optimization_cache rows are deleted at most this often (on the next cache write)
+OPTIMIZATION_CACHE_PURGE_INTERVAL_SECONDS = int(os.getenv("OPTIMIZATION_CACHE_PURGE_INTERVAL_SECONDS", 3600))
+
+# Quality score memo (in-memory LRU keyed by a content hash of the scored text)
+QUALITY_SCORE_MEMO_ENABLED = os.getenv("QUALITY_SCORE_MEMO_ENABLED", "True").lower() == "true"
+QUALITY_SCORE_MEMO_MAX_ENTRIES = int(os.getenv("QUALITY_SCORE_MEMO_MAX_ENTRIES", 4096))
+
+# Gemini admission control (per model; 0 disables a bucket)
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", 16))
+GEMINI_RPM = int(os.getenv("GEMINI_RPM", 300))
+GEMINI_TPM = int(os.getenv("GEMINI_TPM", 1000000))
+GEMINI_MAX_QUEUE = int(os.getenv("GEMINI_MAX_QUEUE", 200))
+# Optional per-model overrides, e.g. {"gemini-2.0-pro": {"max_concurrency": 4, "rpm": 60}}
+GEMINI_MODEL_LIMITS = json.loads(os.getenv("GEMINI_MODEL_LIMITS", "{}"))
+
+# Deadline budget (seconds) for one Gemini optimization before the rule-based fallback is served.
+# mode_configs sets per-mode defaults; GEMINI_MODE_DEADLINES overrides them, e.g. {"image-generation": 10}
+GEMINI_DEADLINE_SECONDS = float(os.getenv("GEMINI_DEADLINE_SECONDS", 30))
+GEMINI_MODE_DEADLINES = json.loads(os.getenv("GEMINI_MODE_DEADLINES", "{}"))
+
+# Circuit breaker: after N failures within the window a model's breaker opens and
+# requests go straight to the rule-based fallback until a few probes succeed again
+CIRCUIT_BREAKER_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_BREAKER_FAILURE_THRESHOLD", 5))
+CIRCUIT_BREAKER_WINDOW_SECONDS = float(os.getenv("CIRCUIT_BREAKER_WINDOW_SECONDS", 60))
+CIRCUIT_BREAKER_RECOVERY_SECONDS = float(os.getenv("CIRCUIT_BREAKER_RECOVERY_SECONDS", 30))
+CIRCUIT_BREAKER_HALF_OPEN_PROBES = int(os.getenv("CIRCUIT_BREAKER_HALF_OPEN_PROBES", 2))
+
+# POST /optimize/batch: max items per call and max optimizations running at once per call
+OPTIMIZE_BATCH_MAX_ITEMS = int(os.getenv("OPTIMIZE_BATCH_MAX_ITEMS", 1000))
+OPTIMIZE_BATCH_MAX_CONCURRENCY = int(os.getenv("OPTIMIZE_BATCH_MAX_CONCURRENCY", 16))
+
+# POST /quality-score/batch: max prompts per call
+QUALITY_SCORE_BATCH_MAX_ITEMS = int(os.getenv("QUALITY_SCORE_BATCH_MAX_ITEMS", 50000))
+
+# /ws/analyze: max prompt length (UTF-16 code units) a live analysis connection keeps
+LIVE_ANALYSIS_MAX_CHARS = int(os.getenv("LIVE_ANALYSIS_MAX_CHARS", 200000))
+# Texts with more lines than this are re-analyzed as a whole on each edit instead of line by line
+LIVE_ANALYSIS_MAX_LINES = int(os.getenv("LIVE_ANALYSIS_MAX_LINES", 2000))
+
+# Write-behind UserActivity logging: events are queued (up to MAX_QUEUE) and bulk-inserted every
+# FLUSH_INTERVAL_MS or BATCH_SIZE events; a full queue makes handlers wait up to PUT_TIMEOUT_SECONDS
+# before the event is dropped. Disabled means one insert per activity
+ACTIVITY_SINK_ENABLED = os.getenv("ACTIVITY_SINK_ENABLED", "True").lower() == "true"
+ACTIVITY_SINK_MAX_QUEUE = int(os.getenv("ACTIVITY_SINK_MAX_QUEUE", 10000))
+ACTIVITY_SINK_BATCH_SIZE = int(os.getenv("ACTIVITY_SINK_BATCH_SIZE", 500))
+ACTIVITY_SINK_FLUSH_INTERVAL_MS = int(os.getenv("ACTIVITY_SINK_FLUSH_INTERVAL_MS", 200))
+ACTIVITY_SINK_PUT_TIMEOUT_SECONDS = float(os.getenv("ACTIVITY_SINK_PUT_TIMEOUT_SECONDS", 1.0))
+
+# /history and /user/history: max page size, and prompt characters returned with fields=preview
+HISTORY_PAGE_MAX_LIMIT = int(os.getenv("HISTORY_PAGE_MAX_LIMIT", 200))
+HISTORY_PREVIEW_CHARS = int(os.getenv("HISTORY_PREVIEW_CHARS", 200))
+
+# Gemini backend: "google" (real API) or "fake" (offline stand-in for benchmarks and CI, see fake_gemini.py)
+GEMINI_BACKEND = os.getenv("GEMINI_BACKEND", "google").lower()
+# Fake backend behaviour: latency spec (constant:S, uniform:A:B, exponential:MEAN, lognormal:MEDIAN:SIGMA),
+# error rate, chance per call that a 429 burst starts and how many calls it lasts
+GEMINI_FAKE_LATENCY = os.getenv("GEMINI_FAKE_LATENCY", "lognormal:0.8:0.5")
+GEMINI_FAKE_ERROR_RATE = float(os.getenv("GEMINI_FAKE_ERROR_RATE", 0.0))
+GEMINI_FAKE_BURST_RATE = float(os.getenv("GEMINI_FAKE_BURST_RATE", 0.0))
+GEMINI_FAKE_BURST_LENGTH = int(os.getenv("GEMINI_FAKE_BURST_LENGTH", 5))
+GEMINI_FAKE_SEED = int(os.getenv("GEMINI_FAKE_SEED")) if os.getenv("GEMINI_FAKE_SEED") else None
+
+# Output budget per Gemini call: max_output_tokens is the mode's max_tokens from mode_configs.
+# With the adaptive budget on, it is MIN + PER_INPUT_TOKEN * (input tokens), rounded up to STEP and
+# capped at the mode's max_tokens
+GEMINI_ADAPTIVE_OUTPUT_BUDGET = os.getenv("GEMINI_ADAPTIVE_OUTPUT_BUDGET", "False").lower() == "true"
+GEMINI_OUTPUT_BUDGET_MIN = int(os.getenv("GEMINI_OUTPUT_BUDGET_MIN", 1024))
+GEMINI_OUTPUT_BUDGET_PER_INPUT_TOKEN = int(os.getenv("GEMINI_OUTPUT_BUDGET_PER_INPUT_TOKEN", 4))
+GEMINI_OUTPUT_BUDGET_STEP = int(os.getenv("GEMINI_OUTPUT_BUDGET_STEP", 256))
+
+# Complexity router: prompts scoring <= MINI_MAX go to the mini model, >= PRO_MIN to pro, the rest
+# to flash (never above the model the mode is mapped to). MODEL_ROUTER_MODELS maps tier -> model name
+MODEL_ROUTER_ENABLED = os.getenv("MODEL_ROUTER_ENABLED", "True").lower() == "true"
+MODEL_ROUTER_MINI_MAX_SCORE = float(os.getenv("MODEL_ROUTER_MINI_MAX_SCORE", 3))
+MODEL_ROUTER_PRO_MIN_SCORE = float(os.getenv("MODEL_ROUTER_PRO_MIN_SCORE", 12))
+MODEL_ROUTER_MODELS = json.loads(os.getenv(
+    "MODEL_ROUTER_MODELS",
+    '{"mini": "gemini-2.0-mini", "flash": "gemini-2.0-flash", "pro": "gemini-2.0-pro"}'
+))
+
+# Model bandit: learn per mode which candidate model gives the best score improvement per second.
+# MODEL_BANDIT_CANDIDATES maps mode -> [models]; by default every mode uses the router's tier models
+MODEL_BANDIT_ENABLED = os.getenv("MODEL_BANDIT_ENABLED", "False").lower() == "true"
+MODEL_BANDIT_EPSILON = float(os.getenv("MODEL_BANDIT_EPSILON", 0.1))
+MODEL_BANDIT_MIN_PULLS = int(os.getenv("MODEL_BANDIT_MIN_PULLS", 3))
+MODEL_BANDIT_PERSISTENT = os.getenv("MODEL_BANDIT_PERSISTENT", "True").lower() == "true"
+MODEL_BANDIT_CANDIDATES = json.loads(os.getenv("MODEL_BANDIT_CANDIDATES", "{}"))
+
+# Hedged racing (request option "race"): send the call to the flash tier of MODEL_ROUTER_MODELS
+# (or the routed model if that is already mini) and start a second call if it has not answered
+# after the fast model's observed p90 latency (HEDGE_DEFAULT_DELAY_SECONDS until enough samples).
+# HEDGE_MODEL is the model for the second call; empty means the routed model
+HEDGE_DEFAULT_DELAY_SECONDS = float(os.getenv("HEDGE_DEFAULT_DELAY_SECONDS", 2.0))
+HEDGE_MIN_DELAY_SECONDS = float(os.getenv("HEDGE_MIN_DELAY_SECONDS", 0.2))
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", 90))
+HEDGE_MODEL = os.getenv("HEDGE_MODEL", "")
+
+# Retries for transient Gemini errors (429/5xx): attempts per call, full-jitter exponential backoff,
+# and a process-wide budget of retries as a fraction of calls
+GEMINI_RETRY_MAX_ATTEMPTS = int(os.getenv("GEMINI_RETRY_MAX_ATTEMPTS", 3))
+GEMINI_RETRY_BASE_DELAY = float(os.getenv("GEMINI_RETRY_BASE_DELAY", 0.25))
+GEMINI_RETRY_MAX_DELAY = float(os.getenv("GEMINI_RETRY_MAX_DELAY", 4.0))
+GEMINI_RETRY_BUDGET_RATIO = float(os.getenv("GEMINI_RETRY_BUDGET_RATIO", 0.1))
+GEMINI_RETRY_BUDGET_CAPACITY = float(os.getenv("GEMINI_RETRY_BUDGET_CAPACITY", 10))
@@ -0,0 +1,53 @@
+"""
+Shared pytest fixtures for the backend tests
+"""
+
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import database
+from fake_gemini import FakeGeminiClient
+from gemini_service import GeminiService
+from optimization_cache import OptimizationCache
+
+
+@pytest.fixture
+def memory_db(monkeypatch):
+    """
+    Fresh in-memory SQLite database with every table, installed as
+    database.SessionLocal. Returns a namespace with the `engine` and
+    `commits` (one entry per COMMIT, to assert on transaction counts).
+    """
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    database.Base.metadata.create_all(bind=engine)
+    monkeypatch.setattr(database, "SessionLocal", sessionmaker(autocommit=False, autoflush=False, bind=engine))
+    commits = []
+    event.listen(engine, "commit", lambda connection: commits.append(connection))
+    yield SimpleNamespace(engine=engine, commits=commits)
+    engine.dispose()
+
+
+@pytest.fixture
+def make_service():
+    """
+    Factory for a GeminiService with a memory-only cache and an enabled client.
+    `generate` / `stream` replace the client's calls; `fake_gemini` (a dict of
+    FakeGeminiClient options) swaps in the offline stand-in instead.
+    """
+    def make(generate=None, stream=None, fake_gemini: dict = None) -> GeminiService:
+        service = GeminiService()
+        service.cache = OptimizationCache(persistent=False)
+        if fake_gemini is not None:
+            service.client = FakeGeminiClient(scheduler=service.scheduler, **fake_gemini)
+        service.client.enabled = True
+        if generate:
+            service.client.generate = generate
+        if stream:
+            service.client.stream = stream
+        return service
+
+    return make
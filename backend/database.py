@@ -1,4 +1,5 @@
 from sqlalchemy import create_engine
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import sessionmaker, declarative_base
 from config import DATABASE_URL
 
@@ -19,6 +20,20 @@ engine = create_engine(DATABASE_URL, **engine_kwargs)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+def insert_if_missing(conn, table, values: dict):
+    """
+    INSERT one row unless its primary key already exists (INSERT IGNORE on MySQL,
+    ON CONFLICT DO NOTHING elsewhere). Unlike a SELECT ... FOR UPDATE of the missing
+    row followed by an INSERT, concurrent callers cannot deadlock on a gap lock.
+    """
+    dialect = conn.dialect.name
+    if dialect == "mysql":
+        statement = table.insert().prefix_with("IGNORE").values(**values)
+    else:
+        insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        statement = insert(table).values(**values).on_conflict_do_nothing(index_elements=list(table.primary_key.columns))
+    conn.execute(statement)
+
 def get_db():
     db = SessionLocal()
     try:
@@ -0,0 +1,142 @@
+from google.api_core import exceptions as google_exceptions
+from config import (
+    GEMINI_FAKE_LATENCY, GEMINI_FAKE_ERROR_RATE, GEMINI_FAKE_BURST_RATE,
+    GEMINI_FAKE_BURST_LENGTH, GEMINI_FAKE_SEED,
+)
+import asyncio
+import contextlib
+import logging
+import math
+import random
+import re
+
+# Numbered section headers in the 9-point / 10-point query templates
+QUERY_SECTION_PATTERN = re.compile(r'^\*\*(\d+\. [^*]+)\*\*', re.M)
+QUERY_REQUEST_PATTERN = re.compile(r'(?:ORIGINAL REQUEST|TASK: Create a detailed implementation guide for):\s*"?([^"\n]*)')
+
+GUIDE_SECTIONS = [
+    ("🎯", "Objective"),
+    ("📋", "Requirements"),
+    ("🏗️", "Architecture"),
+    ("💻", "Implementation Steps"),
+    ("🧪", "Testing Strategy"),
+    ("🚀", "Deployment"),
+]
+
+
+class LatencyDistribution:
+    """
+    Latency model parsed from a spec string (all values in seconds):
+
+        constant:0.5            always 0.5s
+        uniform:0.2:1.5         uniform between 0.2s and 1.5s
+        exponential:0.8         exponential with mean 0.8s
+        lognormal:0.8:0.5       log-normal with median 0.8s and sigma 0.5 (long tail)
+    """
+
+    def __init__(self, spec: str):
+        kind, *params = spec.split(":")
+        self.kind = kind
+        self.params = [float(p) for p in params]
+        expected = {"constant": 1, "uniform": 2, "exponential": 1, "lognormal": 2}
+        if expected.get(kind) != len(self.params):
+            raise ValueError(f"Invalid latency spec '{spec}'")
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == "constant":
+            return self.params[0]
+        if self.kind == "uniform":
+            return rng.uniform(*self.params)
+        if self.kind == "exponential":
+            return rng.expovariate(1 / self.params[0]) if self.params[0] > 0 else 0.0
+        median, sigma = self.params
+        return rng.lognormvariate(math.log(median), sigma) if median > 0 else 0.0
+
+
+class FakeGeminiClient:
+    """
+    Offline stand-in for GeminiClient (select it with GEMINI_BACKEND=fake).
+
+    Same interface as the real client: generate() and stream() take a
+    scheduler slot, wait a latency drawn from the configured distribution and
+    return canned text shaped like the real templates (9-point dev spec,
+    10-point image spec or an emoji-sectioned guide). Failures mirror what the
+    google client raises: ServiceUnavailable at `error_rate`, and 429 bursts
+    (ResourceExhausted for `burst_length` consecutive calls) starting at `burst_rate`.
+    """
+
+    def __init__(self, model_names=None, scheduler=None, latency: str = None, error_rate: float = None,
+                 burst_rate: float = None, burst_length: int = None, seed: int = None):
+        self.enabled = True
+        self.scheduler = scheduler
+        self.latency = LatencyDistribution(latency or GEMINI_FAKE_LATENCY)
+        self.error_rate = GEMINI_FAKE_ERROR_RATE if error_rate is None else error_rate
+        self.burst_rate = GEMINI_FAKE_BURST_RATE if burst_rate is None else burst_rate
+        self.burst_length = GEMINI_FAKE_BURST_LENGTH if burst_length is None else burst_length
+        self._random = random.Random(GEMINI_FAKE_SEED if seed is None else seed)
+        self._burst_remaining = 0
+        self._stats = {"calls": 0, "errors": 0, "rate_limited": 0}
+        logger = logging.getLogger(__name__)
+        logger.info(f"🧪 Using fake Gemini backend (latency={self.latency.kind}:{self.latency.params}, "
+                    f"error_rate={self.error_rate}, burst_rate={self.burst_rate})")
+
+    def get_model(self, model_name: str, generation_config: dict = None) -> str:
+        return model_name
+
+    async def generate(self, model_name: str, prompt: str, generation_config: dict = None) -> str:
+        async with self._slot(model_name, prompt, generation_config):
+            await asyncio.sleep(self.latency.sample(self._random))
+            self._maybe_fail(model_name)
+            return self.canned_response(prompt).strip()
+
+    async def stream(self, model_name: str, prompt: str, generation_config: dict = None):
+        async with self._slot(model_name, prompt, generation_config):
+            total = self.latency.sample(self._random)
+            # Time to first chunk is about a third of the call; the rest is spread over the chunks
+            await asyncio.sleep(total / 3)
+            self._maybe_fail(model_name)
+            chunks = self._chunks(self.canned_response(prompt))
+            for chunk in chunks:
+                await asyncio.sleep(total * 2 / 3 / len(chunks))
+                yield chunk
+
+    def _maybe_fail(self, model_name: str):
+        self._stats["calls"] += 1
+        if self._burst_remaining == 0 and self.burst_rate and self._random.random() < self.burst_rate:
+            self._burst_remaining = self.burst_length
+        if self._burst_remaining > 0:
+            self._burst_remaining -= 1
+            self._stats["rate_limited"] += 1
+            raise google_exceptions.ResourceExhausted(f"Quota exceeded for model {model_name} (fake)")
+        if self.error_rate and self._random.random() < self.error_rate:
+            self._stats["errors"] += 1
+            raise google_exceptions.ServiceUnavailable(f"The model {model_name} is overloaded (fake)")
+
+    def _chunks(self, text: str, size: int = 120) -> list:
+        return [text[i:i + size] for i in range(0, len(text), size)] or [""]
+
+    @staticmethod
+    def canned_response(query: str) -> str:
+        """Response shaped like the template the query asks for"""
+        match = QUERY_REQUEST_PATTERN.search(query)
+        request = match.group(1).strip() if match else "the request"
+        titles = QUERY_SECTION_PATTERN.findall(query)
+        if titles:
+            return "\n\n".join(
+                f"**{title.strip()}**\n{title.split('. ', 1)[1].strip()} for {request}.\n"
+                f"- Define the scope clearly\n- Specify measurable requirements\n- Document the constraints"
+                for title in titles
+            )
+        sections = "\n\n".join(
+            f"**{emoji} {name}**\n{name} for {request}:\n1. Identify the requirements\n2. Implement and validate\n3. Review the results"
+            for emoji, name in GUIDE_SECTIONS
+        )
+        return f"{sections}\n\n{'='*80}"
+
+    def get_stats(self) -> dict:
+        return dict(self._stats)
+
+    def _slot(self, model_name: str, prompt: str, generation_config: dict = None):
+        if self.scheduler is None:
+            return contextlib.nullcontext()
+        return self.scheduler.slot(model_name, prompt, generation_config)
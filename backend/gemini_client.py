@@ -0,0 +1,65 @@
+import google.generativeai as genai
+from config import GEMINI_API_KEY
+import contextlib
+import logging
+
+
+class GeminiClient:
+    """
+    Async Gemini client that keeps one pre-built GenerativeModel per
+    (model name, generation config) pair.
+
+    Building a GenerativeModel is cheap but not free, and the async transport
+    behind it is shared, so the service reuses instances instead of creating a
+    new one for every request. When a scheduler is given, every call first
+    takes a slot from it (concurrency cap and rate buckets per model).
+    """
+
+    def __init__(self, model_names=None, scheduler=None):
+        self.enabled = bool(GEMINI_API_KEY)
+        if self.enabled:
+            genai.configure(api_key=GEMINI_API_KEY)
+        self.scheduler = scheduler
+        self._models = {}
+        for model_name in model_names or []:
+            self.get_model(model_name)
+
+    @staticmethod
+    def _config_key(generation_config: dict = None) -> tuple:
+        """Hashable key for a generation config dict"""
+        if not generation_config:
+            return ()
+        return tuple(sorted(generation_config.items()))
+
+    def get_model(self, model_name: str, generation_config: dict = None):
+        """Return the shared GenerativeModel for this model name and config"""
+        key = (model_name, self._config_key(generation_config))
+        model = self._models.get(key)
+        if model is None:
+            model = genai.GenerativeModel(model_name, generation_config=generation_config or None)
+            self._models[key] = model
+            logger = logging.getLogger(__name__)
+            logger.debug(f"Built Gemini model '{model_name}' (config={generation_config or {}})")
+        return model
+
+    async def generate(self, model_name: str, prompt: str, generation_config: dict = None) -> str:
+        """Generate content without blocking the event loop and return the stripped text"""
+        model = self.get_model(model_name, generation_config)
+        async with self._slot(model_name, prompt, generation_config):
+            response = await model.generate_content_async(prompt)
+        return response.text.strip()
+
+    async def stream(self, model_name: str, prompt: str, generation_config: dict = None):
+        """Stream generated text chunks as they arrive"""
+        model = self.get_model(model_name, generation_config)
+        async with self._slot(model_name, prompt, generation_config):
+            response = await model.generate_content_async(prompt, stream=True)
+            async for chunk in response:
+                text = chunk.text
+                if text:
+                    yield text
+
+    def _slot(self, model_name: str, prompt: str, generation_config: dict = None):
+        if self.scheduler is None:
+            return contextlib.nullcontext()
+        return self.scheduler.slot(model_name, prompt, generation_config)
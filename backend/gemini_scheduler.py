@@ -0,0 +1,159 @@
+from collections import deque
+from contextlib import asynccontextmanager
+import asyncio
+import logging
+import time
+
+
+class GeminiQueueFullError(Exception):
+    """Raised when a model's wait queue is full; callers fall back instead of piling up"""
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at `per_minute` tokens per minute"""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` tokens are available (0 if they are available now)"""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount: float):
+        self.tokens -= min(amount, self.capacity)
+
+
+class ModelLimiter:
+    """Concurrency cap, RPM/TPM buckets and a bounded wait queue for one model"""
+
+    def __init__(self, model_name: str, max_concurrency: int, rpm: int, tpm: int, max_queue: int):
+        self.model_name = model_name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self._semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        self._requests = TokenBucket(rpm) if rpm else None
+        self._tokens = TokenBucket(tpm) if tpm else None
+        self.rpm = rpm
+        self.tpm = tpm
+        self.in_flight = 0
+        self.waiting = 0
+        self._waits = deque(maxlen=1000)
+        self._stats = {"admitted": 0, "rejected": 0, "max_wait_ms": 0.0}
+
+    def _rate_wait(self, tokens: int) -> float:
+        delays = [0.0]
+        if self._requests:
+            delays.append(self._requests.wait_time(1))
+        if self._tokens:
+            delays.append(self._tokens.wait_time(tokens))
+        return max(delays)
+
+    def _must_wait(self, tokens: int) -> bool:
+        return self._semaphore.locked() or self._rate_wait(tokens) > 0
+
+    @asynccontextmanager
+    async def slot(self, tokens: int):
+        """Hold one request slot for this model, waiting for capacity and rate budget"""
+        if self._must_wait(tokens) and self.waiting >= self.max_queue:
+            self._stats["rejected"] += 1
+            raise GeminiQueueFullError(
+                f"Gemini queue for '{self.model_name}' is full ({self.waiting} waiting)"
+            )
+
+        started = time.monotonic()
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+            try:
+                delay = self._rate_wait(tokens)
+                while delay > 0:
+                    await asyncio.sleep(delay)
+                    delay = self._rate_wait(tokens)
+            except BaseException:
+                self._semaphore.release()
+                raise
+            if self._requests:
+                self._requests.take(1)
+            if self._tokens:
+                self._tokens.take(tokens)
+        finally:
+            self.waiting -= 1
+
+        waited_ms = (time.monotonic() - started) * 1000
+        self._waits.append(waited_ms)
+        self._stats["admitted"] += 1
+        self._stats["max_wait_ms"] = max(self._stats["max_wait_ms"], round(waited_ms, 2))
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    def get_stats(self) -> dict:
+        waits = sorted(self._waits)
+        return {
+            "max_concurrency": self.max_concurrency,
+            "rpm": self.rpm,
+            "tpm": self.tpm,
+            "in_flight": self.in_flight,
+            "queue_depth": self.waiting,
+            "max_queue": self.max_queue,
+            **self._stats,
+            "avg_wait_ms": round(sum(waits) / len(waits), 2) if waits else 0.0,
+            "p95_wait_ms": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 2) if waits else 0.0,
+        }
+
+
+class GeminiScheduler:
+    """
+    Per-model admission control for Gemini calls.
+
+    Every generate call takes a slot from its model's limiter: at most
+    `max_concurrency` calls run at once, each call spends one request from the
+    RPM bucket and its estimated tokens from the TPM bucket, and callers that
+    have to wait queue up to `max_queue` deep before being rejected.
+    """
+
+    def __init__(self, model_names=None, max_concurrency: int = 16, rpm: int = 300, tpm: int = 1000000,
+                 max_queue: int = 200, overrides: dict = None):
+        self.defaults = {"max_concurrency": max_concurrency, "rpm": rpm, "tpm": tpm, "max_queue": max_queue}
+        self.overrides = overrides or {}
+        self._limiters = {}
+        for model_name in model_names or []:
+            self.limiter(model_name)
+
+    def limiter(self, model_name: str) -> ModelLimiter:
+        limiter = self._limiters.get(model_name)
+        if limiter is None:
+            limits = {**self.defaults, **self.overrides.get(model_name, {})}
+            limiter = ModelLimiter(model_name, **limits)
+            self._limiters[model_name] = limiter
+            logger = logging.getLogger(__name__)
+            logger.debug(f"Gemini limits for '{model_name}': {limits}")
+        return limiter
+
+    @staticmethod
+    def estimate_tokens(prompt: str, generation_config: dict = None) -> int:
+        """Rough token cost of a call: ~4 characters per prompt token plus the output budget"""
+        output_budget = (generation_config or {}).get("max_output_tokens", 1024)
+        return len(prompt) // 4 + output_budget
+
+    def slot(self, model_name: str, prompt: str, generation_config: dict = None):
+        return self.limiter(model_name).slot(self.estimate_tokens(prompt, generation_config))
+
+    def get_stats(self) -> dict:
+        """Queue depth, wait times and admission counters per model"""
+        return {name: limiter.get_stats() for name, limiter in self._limiters.items()}
@@ -1,12 +1,78 @@
-import google.generativeai as genai
-from config import GEMINI_API_KEY, RAPTOR_MINI_ENABLED, RAPTOR_MODEL_NAME
+from config import (
+    RAPTOR_MINI_ENABLED, RAPTOR_MODEL_NAME,
+    OPTIMIZATION_CACHE_ENABLED, OPTIMIZATION_CACHE_MAX_ENTRIES,
+    OPTIMIZATION_CACHE_TTL_SECONDS, OPTIMIZATION_CACHE_PERSISTENT, OPTIMIZATION_CACHE_PURGE_INTERVAL_SECONDS,
+    QUALITY_SCORE_MEMO_ENABLED, QUALITY_SCORE_MEMO_MAX_ENTRIES,
+    GEMINI_MAX_CONCURRENCY, GEMINI_RPM, GEMINI_TPM, GEMINI_MAX_QUEUE, GEMINI_MODEL_LIMITS,
+    GEMINI_DEADLINE_SECONDS, GEMINI_MODE_DEADLINES,
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD, CIRCUIT_BREAKER_WINDOW_SECONDS,
+    CIRCUIT_BREAKER_RECOVERY_SECONDS, CIRCUIT_BREAKER_HALF_OPEN_PROBES,
+    GEMINI_BACKEND, GEMINI_ADAPTIVE_OUTPUT_BUDGET, GEMINI_OUTPUT_BUDGET_MIN,
+    GEMINI_OUTPUT_BUDGET_PER_INPUT_TOKEN, GEMINI_OUTPUT_BUDGET_STEP,
+    MODEL_ROUTER_ENABLED, MODEL_ROUTER_MINI_MAX_SCORE, MODEL_ROUTER_PRO_MIN_SCORE, MODEL_ROUTER_MODELS,
+    MODEL_BANDIT_ENABLED, MODEL_BANDIT_EPSILON, MODEL_BANDIT_MIN_PULLS, MODEL_BANDIT_PERSISTENT,
+    MODEL_BANDIT_CANDIDATES,
+    HEDGE_DEFAULT_DELAY_SECONDS, HEDGE_MIN_DELAY_SECONDS, HEDGE_PERCENTILE, HEDGE_MODEL,
+    GEMINI_RETRY_MAX_ATTEMPTS, GEMINI_RETRY_BASE_DELAY, GEMINI_RETRY_MAX_DELAY,
+    GEMINI_RETRY_BUDGET_RATIO, GEMINI_RETRY_BUDGET_CAPACITY,
+)
+from circuit_breaker import CircuitBreaker
+from fake_gemini import FakeGeminiClient
+from gemini_client import GeminiClient
+from gemini_scheduler import GeminiQueueFullError, GeminiScheduler
+from hedging import Hedger
+from mode_store import ModeStore
+from model_bandit import ModelBandit
+from model_router import ComplexityRouter, ModelRoute
+from optimization_cache import OptimizationCache
+from prompt_features import PromptFeatures
+from request_coalescer import RequestCoalescer
+from retry_policy import RetryBudget, RetryPolicy
+from score_memo import ScoreMemo
+from stream_formatter import IncrementalFormatter
+import asyncio
 import re
 import logging
 
+# Section headers produced by the structured 9-point / 10-point templates
+STRUCTURED_SECTION_PATTERN = re.compile(r'\*\*(\d+\. [^*]+)\*\*')
+# Emoji section headers in general implementation guides
+GUIDE_SECTION_PATTERN = re.compile(r'\*\*([🎯📋🏗️📝💻🧪🚀📊⚠️💡🛠️])\s*([^*]+)\*\*')
+LIST_ITEM_SPACING_PATTERN = re.compile(r'\n(\d+\.)')
+
+# Banners wrapped around formatted Gemini output (shared with the streaming formatter)
+DEV_OUTPUT_HEADER = f"""
+{'='*80}
+🚀 AI DEVELOPMENT MODE - STRUCTURED PROJECT SPECIFICATION
+{'='*80}
+"""
+DEV_OUTPUT_FOOTER = f"""
+{'='*80}
+✨ STRUCTURED DEVELOPMENT PROMPT COMPLETE
+{'='*80}
+📋 This optimized prompt follows the 9-point AI development structure
+🎯 Ready for use with AI development assistants
+⚡ Includes comprehensive technical specifications
+{'='*80}
+"""
+IMAGE_OUTPUT_HEADER = f"""
+{'='*80}
+🎨 IMAGE GENERATION MODE - STRUCTURED PROMPT SPECIFICATION
+{'='*80}
+"""
+IMAGE_OUTPUT_FOOTER = f"""
+{'='*80}
+✨ STRUCTURED IMAGE PROMPT COMPLETE
+{'='*80}
+📸 This optimized prompt follows the 10-point image generation structure
+🎯 Ready for use with AI image generation models
+⚡ Includes comprehensive visual specifications
+{'='*80}
+"""
+GUIDE_OUTPUT_FOOTER = f'\n\n{"="*80}\n✨ END OF GUIDE\n{"="*80}\n'
+
 class GeminiService:
     def __init__(self):
-        if GEMINI_API_KEY:
-            genai.configure(api_key=GEMINI_API_KEY)
         # default model used for 'ai-dev' mode
         self.default_model = "gemini-2.0-flash"
         # mapping from optimization mode to Gemini model name
@@ -45,6 +111,7 @@ class GeminiService:
                 - Detailed architecture and design patterns''',
                 'temperature': 0.3,
                 'max_tokens': 2048,
+                'deadline_seconds': 30,
                 'prompt_structure': {
                     'required_fields': ['programming_language', 'functionality', 'requirements'],
                     'optional_fields': ['performance_criteria', 'security_requirements', 'testing_approach'],
@@ -60,6 +127,7 @@ class GeminiService:
                 - Provides clear value and actionable insights''',
                 'temperature': 0.7,
                 'max_tokens': 3072,
+                'deadline_seconds': 25,
                 'prompt_structure': {
                     'required_fields': ['content_type', 'target_audience', 'key_message'],
                     'optional_fields': ['tone', 'length', 'seo_keywords', 'call_to_action'],
@@ -75,6 +143,7 @@ class GeminiService:
                 - Reference artistic movements and techniques when appropriate''',
                 'temperature': 0.8,
                 'max_tokens': 1024,
+                'deadline_seconds': 20,
                 'prompt_structure': {
                     'required_fields': ['subject', 'style', 'composition'],
                     'optional_fields': ['lighting', 'colors', 'mood', 'technical_specs'],
@@ -90,6 +159,7 @@ class GeminiService:
                 - Risk analysis and implementation considerations''',
                 'temperature': 0.2,
                 'max_tokens': 2560,
+                'deadline_seconds': 25,
                 'prompt_structure': {
                     'required_fields': ['data_scope', 'analysis_objective', 'metrics'],
                     'optional_fields': ['timeframe', 'methodology', 'visualization_type'],
@@ -105,6 +175,7 @@ class GeminiService:
                 - Balance helpfulness with appropriate boundaries''',
                 'temperature': 0.5,
                 'max_tokens': 2048,
+                'deadline_seconds': 25,
                 'prompt_structure': {
                     'required_fields': ['bot_purpose', 'personality', 'conversation_scenarios'],
                     'optional_fields': ['tone', 'constraints', 'integration_requirements'],
@@ -120,6 +191,7 @@ class GeminiService:
                 - Contribution to existing knowledge and future research directions''',
                 'temperature': 0.3,
                 'max_tokens': 4096,
+                'deadline_seconds': 40,
                 'prompt_structure': {
                     'required_fields': ['research_question', 'methodology', 'scope'],
                     'optional_fields': ['literature_focus', 'theoretical_framework', 'limitations'],
@@ -128,11 +200,10 @@ class GeminiService:
             }
         }
         
-        # Current active mode configuration
-        self.current_mode = 'ai-dev'
-        self.current_mode_config = self.mode_configs['ai-dev']
-
-        self.model = self.default_model
+        # Working mode per user/session for /set-mode and the assistant; the service
+        # itself holds no per-request state, routing is passed down as a ModelRoute
+        self.default_mode = 'ai-dev'
+        self.mode_store = ModeStore(self.default_mode)
 
         # Image model mapping for image generation modes
         self.image_model_map = {
@@ -141,6 +212,68 @@ class GeminiService:
             "stylized": "gemini-image-stylized",
             "fast": "gemini-image-mini",
         }
+
+        # Per-model concurrency cap and RPM/TPM buckets for every text and image model
+        self.scheduler = GeminiScheduler(
+            [self.default_model, *self.model_map.values(), *self.image_model_map.values()],
+            max_concurrency=GEMINI_MAX_CONCURRENCY,
+            rpm=GEMINI_RPM,
+            tpm=GEMINI_TPM,
+            max_queue=GEMINI_MAX_QUEUE,
+            overrides=GEMINI_MODEL_LIMITS,
+        )
+
+        # Shared async client; text models are pre-built once and reused.
+        # GEMINI_BACKEND=fake swaps in the offline stand-in with the same interface.
+        client_class = FakeGeminiClient if GEMINI_BACKEND == "fake" else GeminiClient
+        self.client = client_class([self.default_model, *self.model_map.values()], scheduler=self.scheduler)
+
+        # Result cache keyed on normalized prompt, resolved mode, option flags and model
+        self.cache = OptimizationCache(
+            max_entries=OPTIMIZATION_CACHE_MAX_ENTRIES,
+            ttl_seconds=OPTIMIZATION_CACHE_TTL_SECONDS,
+            persistent=OPTIMIZATION_CACHE_PERSISTENT,
+            purge_interval_seconds=OPTIMIZATION_CACHE_PURGE_INTERVAL_SECONDS,
+            enabled=OPTIMIZATION_CACHE_ENABLED,
+        )
+        # Quality scores by content hash, so rescoring the same text is a lookup
+        self.score_memo = ScoreMemo(max_entries=QUALITY_SCORE_MEMO_MAX_ENTRIES, enabled=QUALITY_SCORE_MEMO_ENABLED)
+        # Identical concurrent cache misses share one in-flight Gemini call
+        self.coalescer = RequestCoalescer()
+        # Sends simple prompts to smaller models than the mode's default
+        self.router = ComplexityRouter(
+            MODEL_ROUTER_MODELS,
+            mini_max_score=MODEL_ROUTER_MINI_MAX_SCORE,
+            pro_min_score=MODEL_ROUTER_PRO_MIN_SCORE,
+            enabled=MODEL_ROUTER_ENABLED,
+        )
+        # Learns the best model per mode from improvement-per-second rewards (opt-in)
+        self.bandit = ModelBandit(
+            MODEL_BANDIT_CANDIDATES or {mode: list(MODEL_ROUTER_MODELS.values()) for mode in self.mode_configs},
+            epsilon=MODEL_BANDIT_EPSILON,
+            min_pulls=MODEL_BANDIT_MIN_PULLS,
+            persistent=MODEL_BANDIT_PERSISTENT,
+            enabled=MODEL_BANDIT_ENABLED,
+        )
+        # Second call for racing requests once the first runs past the model's p90 latency
+        self.hedger = Hedger(
+            default_delay=HEDGE_DEFAULT_DELAY_SECONDS,
+            min_delay=HEDGE_MIN_DELAY_SECONDS,
+            percentile=HEDGE_PERCENTILE,
+        )
+        # Shared retry policy for generate calls, with a process-wide retry budget
+        self.retry_policy = RetryPolicy(
+            max_attempts=GEMINI_RETRY_MAX_ATTEMPTS,
+            base_delay=GEMINI_RETRY_BASE_DELAY,
+            max_delay=GEMINI_RETRY_MAX_DELAY,
+            budget=RetryBudget(GEMINI_RETRY_BUDGET_RATIO, GEMINI_RETRY_BUDGET_CAPACITY),
+        )
+        # generation_config dicts per (mode, output budget), built on first use
+        self._generation_configs = {}
+        # One circuit breaker per text model (others are created on first use)
+        self.breakers = {}
+        for model_name in [self.default_model, *self.model_map.values()]:
+            self._breaker(model_name)
     def _apply_chain_of_thought(self, prompt: str, mode: str = "ai-dev") -> str:
         """
         Apply Chain-of-Thought (CoT) reasoning to break complex prompts into logical steps.
@@ -908,31 +1041,223 @@ Please provide a comprehensive, detailed response that will guide someone from b
             "full": full_prompt
         }
     
-    def optimize_prompt_for_mode(self, original_prompt: str, mode: str = "ai-dev", options: dict = None) -> str:
+    async def optimize_prompt_for_mode(self, original_prompt: str, mode: str = "ai-dev", options: dict = None) -> dict:
         """
         Enhanced mode-specific optimization with template selection
         Supports Image Mode, Dev Mode, and Auto-detect Mode
+
+        Returns a dict with the optimized prompt, the resolved mode, the model
+        that served it and the path ('gemini', 'fallback', 'cache', ...).
         """
         if options is None:
             options = {}
         
         # Handle auto-detection mode
         if mode == "auto" or mode == "auto-detect":
-            detected_mode = self._auto_detect_mode(original_prompt)
+            detected_mode = self._auto_detect_mode(self.prompt_features(original_prompt))
             logger = logging.getLogger(__name__)
             logger.info(f"🤖 Auto-detected mode: {detected_mode}")
             mode = detected_mode
-        
+
+        route = self.route(original_prompt, mode)
+        cache_key = self.cache.make_key(original_prompt, mode, options, route.model)
+        cached = await self.cache.get(cache_key)
+        if cached is not None:
+            return {"optimized_prompt": cached, "mode": mode, "model": route.model, "source": "cache"}
+
+        # A raced request may be answered by another model, so it never joins an unraced one in flight
+        flight_key = f"{cache_key}:race" if options.get('race') else cache_key
+        result = await self.coalescer.run(
+            flight_key, lambda: self._optimize_uncached(original_prompt, route, options)
+        )
+        return {**result, "mode": mode, "model": result.get("model") or route.model}
+
+    async def _optimize_uncached(self, original_prompt: str, route: ModelRoute, options: dict) -> dict:
+        """Run the mode-specific optimization and cache successful Gemini output under the model that wrote it"""
+        mode = route.mode
         # Select appropriate template and optimization strategy
         if mode == "image-generation" or mode == "image-mode":
-            return self._optimize_image_mode(original_prompt, options)
+            result = await self._optimize_image_mode(original_prompt, options, route.model)
         elif mode == "ai-dev" or mode == "dev-mode":
-            return self._optimize_dev_mode(original_prompt, options)
+            result = await self._optimize_dev_mode(original_prompt, options, route.model)
         else:
             # Fallback to general optimization for other modes
-            return self.optimize_prompt(original_prompt, mode, options)
+            result = await self.optimize_prompt(original_prompt, mode, options, route.model)
+
+        # Only real Gemini output is cached; fallbacks should be retried next time
+        if result["source"] == "gemini":
+            model_name = result.get("model") or route.model
+            cache_key = self.cache.make_key(original_prompt, mode, options, model_name)
+            await self.cache.put(cache_key, result["optimized_prompt"], mode, model_name)
+        return result
+
+    async def stream_optimize_prompt_for_mode(self, original_prompt: str, mode: str = "ai-dev", options: dict = None):
+        """
+        Streaming variant of optimize_prompt_for_mode.
+
+        Async generator of (event, data) pairs: a 'start' event, one 'section'
+        event per formatted section as soon as it is complete, and a final
+        'result' event with the full optimized prompt and the path that served it.
+        The section texts concatenate to the same string the non-streaming path returns.
+        """
+        if options is None:
+            options = {}
+        
+        if mode == "auto" or mode == "auto-detect":
+            mode = self._auto_detect_mode(self.prompt_features(original_prompt))
+            logger = logging.getLogger(__name__)
+            logger.info(f"🤖 Auto-detected mode: {mode}")
+
+        model_name = self.route(original_prompt, mode).model
+        yield "start", {"mode": mode, "model": model_name}
+
+        cache_key = self.cache.make_key(original_prompt, mode, options, model_name)
+        cached = await self.cache.get(cache_key)
+        if cached is not None:
+            yield "section", {"index": 0, "title": None, "text": cached}
+            yield "result", {"optimized_prompt": cached, "mode": mode, "model": model_name, "source": "cache"}
+            return
+
+        sections = []
+        source = "fallback"
+        outcome = {}
+        breaker = self._breaker(model_name)
+        if self.client.enabled and not breaker.allow_request():
+            logger = logging.getLogger(__name__)
+            logger.info(f"🔌 Circuit open for '{model_name}'; streaming rule-based fallback for mode '{mode}'")
+            source = "circuit_open"
+        elif self.client.enabled:
+            formatter = self._incremental_formatter(mode)
+            stream = self.client.stream(
+                model_name,
+                self._query_for_mode(original_prompt, mode, options),
+                self._generation_config(mode, original_prompt),
+            )
+            loop = asyncio.get_running_loop()
+            deadline = self._deadline_for_mode(mode)
+            started = loop.time()
+            deadline_at = started + deadline
+            try:
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(stream.__anext__(), timeout=max(0.0, deadline_at - loop.time()))
+                    except StopAsyncIteration:
+                        break
+                    for title, text in formatter.feed(chunk):
+                        sections.append(text)
+                        yield "section", {"index": len(sections) - 1, "title": title, "text": text}
+                source = "gemini"
+                breaker.record_success()
+                outcome["latency_ms"] = round((loop.time() - started) * 1000, 1)
+            except asyncio.TimeoutError:
+                breaker.record_failure()
+                logger = logging.getLogger(__name__)
+                logger.warning(f"⏱️ Gemini stream for mode '{mode}' exceeded its {deadline}s budget")
+                source = "deadline_fallback"
+                outcome["latency_ms"] = deadline * 1000
+            except GeminiQueueFullError:
+                breaker.record_neutral()
+                logger = logging.getLogger(__name__)
+                logger.warning(f"🚦 Gemini queue for '{model_name}' is full; streaming rule-based fallback")
+            except Exception:
+                breaker.record_failure()
+                logger = logging.getLogger(__name__)
+                logger.exception("Gemini API error while streaming optimization")
+            except BaseException:
+                # Client went away mid-stream
+                breaker.record_neutral()
+                raise
+            finally:
+                await stream.aclose()
+            # Keep what the client already received; only start over if nothing was sent
+            if source != "gemini" and sections:
+                source = "partial"
+                outcome.clear()
+            if source in ("gemini", "partial"):
+                for title, text in formatter.finish():
+                    sections.append(text)
+                    yield "section", {"index": len(sections) - 1, "title": title, "text": text}
+
+        if source in ("fallback", "deadline_fallback", "circuit_open"):
+            text = self._fallback_for_mode(original_prompt, mode, options)
+            sections.append(text)
+            yield "section", {"index": 0, "title": None, "text": text}
+
+        optimized_prompt = "".join(sections)
+        if source == "gemini":
+            await self.cache.put(cache_key, optimized_prompt, mode, model_name)
+        yield "result", {"optimized_prompt": optimized_prompt, "mode": mode, "model": model_name, "source": source, **outcome}
+
+    def _query_for_mode(self, prompt: str, mode: str, options: dict) -> str:
+        """Gemini query used for the given (resolved) optimization mode"""
+        if mode == "image-generation" or mode == "image-mode":
+            return self._image_mode_query(prompt)
+        if mode == "ai-dev" or mode == "dev-mode":
+            return self._dev_mode_query(prompt)
+        return self._general_mode_query(prompt, mode, options)
+
+    def _fallback_for_mode(self, prompt: str, mode: str, options: dict) -> str:
+        """Rule-based output used for the given (resolved) mode when Gemini is unavailable"""
+        if mode == "image-generation" or mode == "image-mode":
+            return self._structured_image_fallback(prompt, options)
+        if mode == "ai-dev" or mode == "dev-mode":
+            return self._structured_dev_fallback(prompt, options)
+        return self._fallback_optimize(prompt, mode, options)
+
+    def _incremental_formatter(self, mode: str) -> IncrementalFormatter:
+        """Streaming counterpart of the output formatter for the given (resolved) mode"""
+        if mode == "image-generation" or mode == "image-mode":
+            return IncrementalFormatter(self._format_structured_image_body, STRUCTURED_SECTION_PATTERN,
+                                        header=IMAGE_OUTPUT_HEADER, footer=IMAGE_OUTPUT_FOOTER)
+        if mode == "ai-dev" or mode == "dev-mode":
+            return IncrementalFormatter(self._format_structured_dev_body, STRUCTURED_SECTION_PATTERN,
+                                        header=DEV_OUTPUT_HEADER, footer=DEV_OUTPUT_FOOTER)
+        return IncrementalFormatter(self._format_output_body, GUIDE_SECTION_PATTERN,
+                                    footer=GUIDE_OUTPUT_FOOTER, footer_marker='='*80, list_spacing=True)
+
+    def route(self, prompt: str, mode: str) -> ModelRoute:
+        """Immutable routing decision for one request in the given (resolved) mode"""
+        if self.bandit.handles(self._config_mode(mode)):
+            model_name = self.bandit.select(self._config_mode(mode))
+            logger = logging.getLogger(__name__)
+            logger.info(f"🎰 Bandit picked {model_name} for '{mode}'")
+            return ModelRoute(mode=mode, model=model_name, strategy="bandit")
+        return self.router.route(mode, self._model_for_mode(mode), self._complexity_features(prompt))
+
+    async def record_outcome(self, result: dict, improvement_percentage: float):
+        """
+        Feed a scored optimization back to the model bandit.
+        Only fresh Gemini calls carry a latency; a missed deadline counts as zero improvement.
+        """
+        if "latency_ms" not in result:
+            return
+        if result["source"] == "deadline_fallback":
+            improvement_percentage = 0.0
+        elif result["source"] != "gemini":
+            return
+        await self.bandit.record(self._config_mode(result["mode"]), result["model"], improvement_percentage, result["latency_ms"])
+
+    def _complexity_features(self, prompt: str) -> dict:
+        """The cheap quality-score features the complexity router works from"""
+        features = self.prompt_features(prompt).counts
+        return {
+            "words": features["words"],
+            "technical_terms": features["technical_terms"],
+            "constraints": features["constraints"],
+            "must_haves": features["must_haves"],
+            "quantitative_specs": features["quantitative_specs"],
+        }
+
+    def _model_for_mode(self, mode: str) -> str:
+        """Gemini model that serves the given (resolved) optimization mode"""
+        if mode == "image-generation" or mode == "image-mode":
+            return self.model_map.get('image-generation', self.default_model)
+        if mode == "ai-dev" or mode == "dev-mode":
+            return self.model_map.get('ai-dev', self.default_model)
+        return self.model_map.get(mode, self.default_model)
     
-    def optimize_prompt(self, original_prompt: str, mode: str = "ai-dev", options: dict = None) -> str:
+    async def optimize_prompt(self, original_prompt: str, mode: str = "ai-dev", options: dict = None,
+                              model_name: str = None) -> dict:
         """
         Optimize a prompt using Gemini API with comprehensive project guidance
         For AI Development mode: Creates the most complete project implementation guide possible
@@ -942,69 +1267,178 @@ Please provide a comprehensive, detailed response that will guide someone from b
         
         # If this is AI Development mode, use structured 9-point optimization
         if mode == "ai-dev":
-            return self._optimize_dev_mode(original_prompt, options)
+            return await self._optimize_dev_mode(original_prompt, options, model_name)
         
-        try:
-            # For other modes, use general optimization
-            if GEMINI_API_KEY:
-                optimization_query = f"""TASK: Create a detailed implementation guide for: "{original_prompt}"
-MODE: {mode}
-OPTIONS: Tests={options.get('include_tests', False)}, Docs={options.get('add_documentation', False)}, Performance={options.get('performance_optimization', False)}, Security={options.get('security_features', False)}
-
-Provide a comprehensive, well-structured response that covers all aspects of implementing this request."""
-                
-                # Select model according to requested optimization mode
-                selected_model = self.model_map.get(mode, self.default_model)
-                # update instance model for downstream use
-                self.model = selected_model
-                logger = logging.getLogger(__name__)
-                logger.debug(f"Using Gemini model '{selected_model}' for mode '{mode}'")
-
-                model = genai.GenerativeModel(selected_model)
-                response = model.generate_content(optimization_query)
-                optimized_text = response.text.strip()
-                # Post-process to add visual separators and improve readability
-                optimized_text = self._format_output(optimized_text)
-                return optimized_text
-        except Exception as e:
+        # For other modes, use general optimization
+        if self.client.enabled:
+            # Select model according to requested optimization mode (unless already routed)
+            selected_model = model_name or self.model_map.get(mode, self.default_model)
             logger = logging.getLogger(__name__)
-            logger.exception("Gemini API error while optimizing prompt; falling back to rule-based optimization")
+            logger.debug(f"Using Gemini model '{selected_model}' for mode '{mode}'")
+
+            # Post-process to add visual separators and improve readability
+            return await self._generate_with_deadline(
+                mode,
+                selected_model,
+                self._general_mode_query(original_prompt, mode, options),
+                self._format_output,
+                lambda: self._fallback_optimize(original_prompt, mode, options),
+                self._generation_config(mode, original_prompt),
+                race=options.get('race', False),
+            )
         
         # Fallback rule-based optimization
-        return self._fallback_optimize(original_prompt, mode, options)
+        return {"optimized_prompt": self._fallback_optimize(original_prompt, mode, options), "source": "fallback"}
     
-    def _auto_detect_mode(self, prompt: str) -> str:
-        """Auto-detect the appropriate mode based on prompt content"""
-        prompt_lower = prompt.lower()
-        
-        # Image generation keywords
-        image_keywords = ['image', 'picture', 'photo', 'visual', 'design', 'artwork', 'illustration', 
-                         'drawing', 'render', 'graphic', 'logo', 'icon', 'banner', 'poster']
-        
-        # Development keywords
-        dev_keywords = ['code', 'function', 'class', 'method', 'api', 'database', 'algorithm',
-                       'programming', 'develop', 'implement', 'build', 'create app', 'software']
-        
-        # Count keyword matches
-        image_score = sum(1 for keyword in image_keywords if keyword in prompt_lower)
-        dev_score = sum(1 for keyword in dev_keywords if keyword in prompt_lower)
-        
-        # Return mode with highest score, defaulting to ai-dev
-        if image_score > dev_score and image_score > 0:
-            return 'image-generation'
-        elif dev_score > 0:
-            return 'ai-dev'
-        else:
-            return 'ai-dev'
-    
-    def _optimize_image_mode(self, prompt: str, options: dict) -> str:
+    async def _generate_with_deadline(self, mode: str, model_name: str, query: str, format_output, fallback,
+                                      generation_config: dict = None, race: bool = False) -> dict:
         """
-        Specialized optimization for image generation mode using structured 10-point format
-        Outputs optimized prompts in the required image generation structure
+        Race a Gemini call against the mode's deadline budget.
+
+        The rule-based fallback is built in a worker thread once the call has
+        been dispatched, so it is ready the moment the deadline passes or the
+        call fails. The
+        'source' key records which path served the request and 'retries' how
+        many retries (see RetryPolicy) were made. With `race`, the call goes to
+        the fast tier first and is hedged with HEDGE_MODEL (or `model_name`)
+        after the fast model's p90 latency (see Hedger); only a response that
+        passes validation wins. Gemini results carry the 'model' that answered.
         """
+        logger = logging.getLogger(__name__)
+        breaker = self._breaker(model_name)
+        if not breaker.allow_request():
+            logger.info(f"🔌 Circuit open for '{model_name}'; serving rule-based fallback for mode '{mode}'")
+            return {"optimized_prompt": fallback(), "source": "circuit_open"}
+
+        deadline = self._deadline_for_mode(mode)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        retry_state = {"retries": 0}
+
+        def call(target_model):
+            return lambda: self.retry_policy.run(
+                lambda: self.client.generate(target_model, query, generation_config), retry_state
+            )
+
+        if race:
+            primary_model = self.router.capped(model_name, "flash")
+            hedge_model = HEDGE_MODEL or model_name
+            api_call = asyncio.ensure_future(self.hedger.race(
+                primary_model, call(primary_model), hedge_model, call(hedge_model),
+                lambda text: self._valid_response(mode, text),
+            ))
+        else:
+            api_call = asyncio.ensure_future(self._tagged(model_name, call(model_name)))
+        # Let the call take its first step (admission, request dispatch) before the fallback competes for the loop
+        await asyncio.sleep(0)
+        fallback_text = asyncio.ensure_future(asyncio.to_thread(fallback))
         try:
-            if GEMINI_API_KEY:
-                image_template = f"""IMAGE GENERATION SPECIALIST
+            answered_by, text = await asyncio.wait_for(api_call, timeout=deadline)
+        except asyncio.TimeoutError:
+            breaker.record_failure()
+            logger.warning(f"⏱️ Gemini call for mode '{mode}' exceeded its {deadline}s budget; serving rule-based fallback")
+            return {"optimized_prompt": await fallback_text, "source": "deadline_fallback", "latency_ms": deadline * 1000, **retry_state}
+        except GeminiQueueFullError:
+            # Local backpressure says nothing about upstream health
+            breaker.record_neutral()
+            logger.warning(f"🚦 Gemini queue for '{model_name}' is full; serving rule-based fallback")
+            return {"optimized_prompt": await fallback_text, "source": "fallback", **retry_state}
+        except Exception:
+            breaker.record_failure()
+            logger.exception(f"Gemini API error in {mode} optimization; serving rule-based fallback")
+            return {"optimized_prompt": await fallback_text, "source": "fallback", **retry_state}
+        except BaseException:
+            breaker.record_neutral()
+            raise
+        breaker.record_success()
+        latency = loop.time() - started
+        if not race:
+            self.hedger.observe(model_name, latency)
+        return {
+            "optimized_prompt": format_output(text), "source": "gemini", "model": answered_by,
+            "latency_ms": round(latency * 1000, 1), **retry_state
+        }
+
+    @staticmethod
+    async def _tagged(model_name: str, factory) -> tuple:
+        """(model_name, result) of one unhedged call, the shape Hedger.race returns"""
+        return model_name, await factory()
+
+    def _valid_response(self, mode: str, text: str) -> bool:
+        """Whether a raced response is usable: structured modes need their numbered sections"""
+        if not text or not text.strip():
+            return False
+        if mode in ("image-generation", "image-mode", "ai-dev", "dev-mode"):
+            return STRUCTURED_SECTION_PATTERN.search(text) is not None
+        return True
+
+    def _breaker(self, model_name: str) -> CircuitBreaker:
+        """Circuit breaker guarding calls to the given model"""
+        breaker = self.breakers.get(model_name)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                model_name,
+                failure_threshold=CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+                window_seconds=CIRCUIT_BREAKER_WINDOW_SECONDS,
+                recovery_seconds=CIRCUIT_BREAKER_RECOVERY_SECONDS,
+                half_open_probes=CIRCUIT_BREAKER_HALF_OPEN_PROBES,
+            )
+            self.breakers[model_name] = breaker
+        return breaker
+
+    def _generation_config(self, mode: str, prompt: str = None) -> dict:
+        """
+        generation_config for a Gemini call in the given mode.
+
+        temperature and max_output_tokens come from mode_configs. With
+        GEMINI_ADAPTIVE_OUTPUT_BUDGET the output budget also scales with the
+        input size (capped at the mode's max_tokens), rounded up to
+        GEMINI_OUTPUT_BUDGET_STEP so only a handful of distinct configs - and
+        pre-built models in the client - exist per mode.
+        """
+        mode = self._config_mode(mode)
+        mode_config = self.mode_configs.get(mode, self.mode_configs[self.default_mode])
+        max_tokens = mode_config['max_tokens']
+        budget = max_tokens
+        if GEMINI_ADAPTIVE_OUTPUT_BUDGET and prompt:
+            input_tokens = len(prompt) // 4
+            wanted = GEMINI_OUTPUT_BUDGET_MIN + input_tokens * GEMINI_OUTPUT_BUDGET_PER_INPUT_TOKEN
+            step = max(1, GEMINI_OUTPUT_BUDGET_STEP)
+            budget = min(max_tokens, -(-wanted // step) * step)
+
+        key = (mode, budget)
+        config = self._generation_configs.get(key)
+        if config is None:
+            config = {"temperature": mode_config['temperature'], "max_output_tokens": budget}
+            self._generation_configs[key] = config
+        return config
+
+    def _config_mode(self, mode: str) -> str:
+        """Map mode aliases (dev-mode, image-mode) onto their mode_configs key"""
+        if mode == "image-mode":
+            return "image-generation"
+        if mode == "dev-mode":
+            return "ai-dev"
+        return mode
+
+    def _deadline_for_mode(self, mode: str) -> float:
+        """Deadline budget in seconds: env override, then mode_configs, then the global default"""
+        mode = self._config_mode(mode)
+        if mode in GEMINI_MODE_DEADLINES:
+            return float(GEMINI_MODE_DEADLINES[mode])
+        return float(self.mode_configs.get(mode, {}).get('deadline_seconds', GEMINI_DEADLINE_SECONDS))
+    
+    def _general_mode_query(self, original_prompt: str, mode: str, options: dict) -> str:
+        """Gemini query for the general implementation-guide optimization"""
+        return f"""TASK: Create a detailed implementation guide for: "{original_prompt}"
+MODE: {mode}
+OPTIONS: Tests={options.get('include_tests', False)}, Docs={options.get('add_documentation', False)}, Performance={options.get('performance_optimization', False)}, Security={options.get('security_features', False)}
+
+Provide a comprehensive, well-structured response that covers all aspects of implementing this request."""
+    
+    def _image_mode_query(self, prompt: str) -> str:
+        """Gemini query for the structured 10-point image generation prompt"""
+        return f"""IMAGE GENERATION SPECIALIST
 
 ORIGINAL REQUEST: {prompt}
 
@@ -1049,25 +1483,131 @@ GENERATE AN OPTIMIZED IMAGE GENERATION PROMPT using this EXACT 10-POINT STRUCTUR
 ---
 
 CRITICAL: Output the complete optimized prompt above following the exact 10-point structure. This will be the actual prompt used for image generation."""
+    
+    def _dev_mode_query(self, prompt: str) -> str:
+        """Gemini query for the structured 9-point AI development prompt"""
+        return f"""EXPERT SOFTWARE ARCHITECT & AI DEVELOPMENT SPECIALIST
 
-                model = genai.GenerativeModel(self.model_map.get('image-generation', self.default_model))
-                response = model.generate_content(image_template)
-                return self._format_structured_image_output(response.text.strip())
-                
-        except Exception as e:
-            logger = logging.getLogger(__name__)
-            logger.exception("Gemini API error in structured image mode optimization")
+ORIGINAL REQUEST: {prompt}
+
+GENERATE AN OPTIMIZED AI DEVELOPMENT PROMPT using this EXACT 9-POINT STRUCTURE:
+
+**IMPORTANT**: Your output should be a complete, optimized prompt that follows this format precisely. Do not just analyze - CREATE the actual prompt that will be used.
+
+---
+
+**OPTIMIZED PROMPT OUTPUT:**
+
+**1. Project Title**
+[Generate a clear, professional project title that captures the essence of the request]
+
+**2. High-Level Description**  
+[Provide a comprehensive 2-3 paragraph description of what needs to be built, including the problem it solves, target users, and main value proposition]
+
+**3. Architecture Requirements**
+[Specify the system architecture needs including:]
+• Scalability requirements (expected users, traffic)
+• Performance requirements (response times, throughput)
+• Security requirements (authentication, data protection)
+• Integration requirements (external APIs, services)
+• Platform requirements (web, mobile, desktop, cloud)
+
+**4. Tech Stack Recommendation**
+[Recommend specific technologies with justification:]
+• Frontend: [Framework/library with version]
+• Backend: [Language, framework, database]
+• Infrastructure: [Cloud platform, containerization]
+• Development tools: [IDE, version control, CI/CD]
+• Testing frameworks: [Unit, integration, E2E testing tools]
+
+**5. API Structure**
+[Define the API architecture:]
+• RESTful endpoints with HTTP methods
+• Request/response data formats
+• Authentication mechanisms
+• Rate limiting and security measures
+• API versioning strategy
+• Documentation standards (OpenAPI/Swagger)
+
+**6. Data Models**
+[Specify the data structure:]
+• Entity definitions with attributes
+• Relationships between entities
+• Database schema design
+• Data validation rules
+• Index strategies for performance
+• Data migration considerations
+
+**7. User Roles**
+[Define user types and permissions:]
+• Role hierarchy and access levels
+• Permission matrices
+• Authentication requirements per role
+• User journey flows
+• Admin capabilities and restrictions
+
+**8. Expected Output (code, design, APIs)**
+[Clearly specify deliverables:]
+• Code structure and organization
+• Design specifications (UI/UX wireframes)
+• API documentation and examples
+• Database setup scripts
+• Configuration files
+• Deployment instructions
+
+**9. Test Instructions**
+[Provide comprehensive testing approach:]
+• Unit testing strategy and coverage targets
+• Integration testing scenarios
+• End-to-end testing workflows
+• Performance testing benchmarks
+• Security testing requirements
+• Manual testing checklists
+
+---
+
+CRITICAL: Output the complete optimized prompt above, not just bullet points or analysis. This will be the actual prompt used for AI development assistance."""
+    
+    def _auto_detect_mode(self, features: PromptFeatures) -> str:
+        """Auto-detect the appropriate mode from the prompt's image / development keyword hits"""
+        image_score = features.image_keywords
+        dev_score = features.dev_keywords
+        
+        # Return mode with highest score, defaulting to ai-dev
+        if image_score > dev_score and image_score > 0:
+            return 'image-generation'
+        elif dev_score > 0:
+            return 'ai-dev'
+        else:
+            return 'ai-dev'
+    
+    async def _optimize_image_mode(self, prompt: str, options: dict, model_name: str = None) -> dict:
+        """
+        Specialized optimization for image generation mode using structured 10-point format
+        Outputs optimized prompts in the required image generation structure
+        """
+        if self.client.enabled:
+            return await self._generate_with_deadline(
+                'image-generation',
+                model_name or self.model_map.get('image-generation', self.default_model),
+                self._image_mode_query(prompt),
+                self._format_structured_image_output,
+                lambda: self._structured_image_fallback(prompt, options),
+                self._generation_config('image-generation', prompt),
+                race=options.get('race', False),
+            )
         
         # Fallback to structured image generation format
-        return self._structured_image_fallback(prompt, options)
+        return {"optimized_prompt": self._structured_image_fallback(prompt, options), "source": "fallback"}
     
     def _format_structured_image_output(self, text: str) -> str:
         """Format the structured image output with enhanced visual formatting"""
-        import re
-        
+        return IMAGE_OUTPUT_HEADER + self._format_structured_image_body(text) + IMAGE_OUTPUT_FOOTER
+    
+    def _format_structured_image_body(self, text: str) -> str:
+        """Section headers and bullet icons for image output (line-local, so streamed lines format the same way)"""
         # Enhance section headers with visual separators
-        text = re.sub(
-            r'\*\*(\d+\. [^*]+)\*\*',
+        text = STRUCTURED_SECTION_PATTERN.sub(
             lambda m: f'\n{"="*80}\n🖼️ {m.group(1)}\n{"="*80}\n',
             text
         )
@@ -1095,24 +1635,7 @@ CRITICAL: Output the complete optimized prompt above following the exact 10-poin
         for old, new in bullet_replacements.items():
             text = text.replace(old, new)
         
-        # Add header and footer
-        header = f"""
-{'='*80}
-🎨 IMAGE GENERATION MODE - STRUCTURED PROMPT SPECIFICATION
-{'='*80}
-"""
-        
-        footer = f"""
-{'='*80}
-✨ STRUCTURED IMAGE PROMPT COMPLETE
-{'='*80}
-📸 This optimized prompt follows the 10-point image generation structure
-🎯 Ready for use with AI image generation models
-⚡ Includes comprehensive visual specifications
-{'='*80}
-"""
-        
-        return header + text + footer
+        return text
     
     def _structured_image_fallback(self, prompt: str, options: dict) -> str:
         """Fallback for structured image generation mode with 10-point format"""
@@ -1188,113 +1711,33 @@ A carefully composed visual narrative that captures the essence of the request w
 ⚡ Includes comprehensive visual specifications
 {'='*80}
 """
-    def _optimize_dev_mode(self, prompt: str, options: dict) -> str:
+    async def _optimize_dev_mode(self, prompt: str, options: dict, model_name: str = None) -> dict:
         """
         Specialized optimization for development mode using structured 9-point format
         Outputs optimized prompts in the required AI development structure
         """
-        try:
-            if GEMINI_API_KEY:
-                dev_template = f"""EXPERT SOFTWARE ARCHITECT & AI DEVELOPMENT SPECIALIST
-
-ORIGINAL REQUEST: {prompt}
-
-GENERATE AN OPTIMIZED AI DEVELOPMENT PROMPT using this EXACT 9-POINT STRUCTURE:
-
-**IMPORTANT**: Your output should be a complete, optimized prompt that follows this format precisely. Do not just analyze - CREATE the actual prompt that will be used.
-
----
-
-**OPTIMIZED PROMPT OUTPUT:**
-
-**1. Project Title**
-[Generate a clear, professional project title that captures the essence of the request]
-
-**2. High-Level Description**  
-[Provide a comprehensive 2-3 paragraph description of what needs to be built, including the problem it solves, target users, and main value proposition]
-
-**3. Architecture Requirements**
-[Specify the system architecture needs including:]
-• Scalability requirements (expected users, traffic)
-• Performance requirements (response times, throughput)
-• Security requirements (authentication, data protection)
-• Integration requirements (external APIs, services)
-• Platform requirements (web, mobile, desktop, cloud)
-
-**4. Tech Stack Recommendation**
-[Recommend specific technologies with justification:]
-• Frontend: [Framework/library with version]
-• Backend: [Language, framework, database]
-• Infrastructure: [Cloud platform, containerization]
-• Development tools: [IDE, version control, CI/CD]
-• Testing frameworks: [Unit, integration, E2E testing tools]
-
-**5. API Structure**
-[Define the API architecture:]
-• RESTful endpoints with HTTP methods
-• Request/response data formats
-• Authentication mechanisms
-• Rate limiting and security measures
-• API versioning strategy
-• Documentation standards (OpenAPI/Swagger)
-
-**6. Data Models**
-[Specify the data structure:]
-• Entity definitions with attributes
-• Relationships between entities
-• Database schema design
-• Data validation rules
-• Index strategies for performance
-• Data migration considerations
-
-**7. User Roles**
-[Define user types and permissions:]
-• Role hierarchy and access levels
-• Permission matrices
-• Authentication requirements per role
-• User journey flows
-• Admin capabilities and restrictions
-
-**8. Expected Output (code, design, APIs)**
-[Clearly specify deliverables:]
-• Code structure and organization
-• Design specifications (UI/UX wireframes)
-• API documentation and examples
-• Database setup scripts
-• Configuration files
-• Deployment instructions
-
-**9. Test Instructions**
-[Provide comprehensive testing approach:]
-• Unit testing strategy and coverage targets
-• Integration testing scenarios
-• End-to-end testing workflows
-• Performance testing benchmarks
-• Security testing requirements
-• Manual testing checklists
-
----
-
-CRITICAL: Output the complete optimized prompt above, not just bullet points or analysis. This will be the actual prompt used for AI development assistance."""
-
-                model = genai.GenerativeModel(self.model_map.get('ai-dev', self.default_model))
-                response = model.generate_content(dev_template)
-                return self._format_structured_dev_output(response.text.strip())
-                
-        except Exception as e:
-            logger = logging.getLogger(__name__)
-            logger.exception("Gemini API error in structured dev mode optimization")
+        if self.client.enabled:
+            return await self._generate_with_deadline(
+                'ai-dev',
+                model_name or self.model_map.get('ai-dev', self.default_model),
+                self._dev_mode_query(prompt),
+                self._format_structured_dev_output,
+                lambda: self._structured_dev_fallback(prompt, options),
+                self._generation_config('ai-dev', prompt),
+                race=options.get('race', False),
+            )
         
         # Fallback to structured development format
-        return self._structured_dev_fallback(prompt, options)
+        return {"optimized_prompt": self._structured_dev_fallback(prompt, options), "source": "fallback"}
     
     def _format_structured_dev_output(self, text: str) -> str:
         """Format the structured development output with enhanced visual formatting"""
-        import re
-        
+        return DEV_OUTPUT_HEADER + self._format_structured_dev_body(text) + DEV_OUTPUT_FOOTER
+    
+    def _format_structured_dev_body(self, text: str) -> str:
+        """Section headers and bullet icons for dev output (line-local, so streamed lines format the same way)"""
         # Enhance section headers with visual separators
-        text = re.sub(
-            r'\*\*(\d+\. [^*]+)\*\*',
+        text = STRUCTURED_SECTION_PATTERN.sub(
             lambda m: f'\n{"="*80}\n🔹 {m.group(1)}\n{"="*80}\n',
             text
         )
@@ -1342,24 +1785,7 @@ CRITICAL: Output the complete optimized prompt above, not just bullet points or
         for old, new in bullet_replacements.items():
             text = text.replace(old, new)
         
-        # Add header and footer
-        header = f"""
-{'='*80}
-🚀 AI DEVELOPMENT MODE - STRUCTURED PROJECT SPECIFICATION
-{'='*80}
-"""
-        
-        footer = f"""
-{'='*80}
-✨ STRUCTURED DEVELOPMENT PROMPT COMPLETE
-{'='*80}
-📋 This optimized prompt follows the 9-point AI development structure
-🎯 Ready for use with AI development assistants
-⚡ Includes comprehensive technical specifications
-{'='*80}
-"""
-        
-        return header + text + footer
+        return text
     
     def _structured_dev_fallback(self, prompt: str, options: dict) -> str:
         """Fallback for structured development mode with 9-point format"""
@@ -1901,14 +2327,21 @@ Conduct comprehensive data analysis for: {prompt}
         Post-process Gemini output to add visual separators and improve readability.
         Adds dividers and enhanced spacing between major sections.
         """
-        import re
+        result = self._format_output_body(text)
+        
+        # Add footer
+        if '='*80 in result:  # Only add if we have separators
+            result = result.rstrip() + GUIDE_OUTPUT_FOOTER
         
+        return result
+    
+    def _format_output_body(self, text: str) -> str:
+        """Section separators and list spacing for general guides, without the footer"""
         result = text
         
         # Replace bold section headers with enhanced versions that include separators
         # Pattern: **emoji TEXT**
-        result = re.sub(
-            r'\*\*([🎯📋🏗️📝💻🧪🚀📊⚠️💡🛠️])\s*([^*]+)\*\*',
+        result = GUIDE_SECTION_PATTERN.sub(
             lambda m: f'\n{"="*80}\n{m.group(1)} {m.group(2).strip()}\n{"="*80}\n',
             result
         )
@@ -1921,11 +2354,7 @@ Conduct comprehensive data analysis for: {prompt}
         )
         
         # Add better spacing before numbered lists (implementation steps)
-        result = re.sub(r'\n(\d+\.)', r'\n\n\1', result)
-        
-        # Add footer
-        if '='*80 in result:  # Only add if we have separators
-            result = result.rstrip() + f'\n\n{"="*80}\n✨ END OF GUIDE\n{"="*80}\n'
+        result = LIST_ITEM_SPACING_PATTERN.sub(r'\n\n\1', result)
         
         return result
     
@@ -1933,126 +2362,26 @@ Conduct comprehensive data analysis for: {prompt}
         """
         Generate comprehensive quality scores for a prompt with enhanced metrics.
         Analyzes multiple dimensions of prompt quality including new advanced metrics.
+        All features are extracted in one pass by the quality_scoring engine;
+        repeat calls for the same text are served from the score memo.
         """
-        # Calculate text metrics
-        words = len(prompt.split())
-        sentences = len([s for s in prompt.split('.') if s.strip()])
-        paragraphs = len([p for p in prompt.split('\n\n') if p.strip()])
-        characters = len(prompt)
-        
-        # Count linguistic elements
-        action_verbs = len(re.findall(
-            r'\b(create|build|implement|design|develop|optimize|analyze|generate|process|handle|manage|define|structure|architect|deploy|monitor|test|validate|verify|ensure|provide|deliver|produce|make|establish)\b', 
-            prompt, re.I))
-        
-        specific_terms = len(re.findall(
-            r'\b(specific|detailed|comprehensive|professional|optimized|efficient|scalable|robust|secure|reliable|production-ready|enterprise-grade|high-performance)\b', 
-            prompt, re.I))
-        
-        technical_terms = len(re.findall(
-            r'\b(api|database|function|error|security|performance|architecture|schema|algorithm|framework|library|module|component|interface|protocol|encryption|authentication|cache|query|transaction)\b', 
-            prompt, re.I))
-        
-        # Count requirements indicators
-        must_haves = len(re.findall(r'\b(must|should|require|mandatory|essential|critical)\b', prompt, re.I))
-        nice_to_haves = len(re.findall(r'\b(could|might|consider|optionally|may|nice-to-have|future)\b', prompt, re.I))
-        constraints = len(re.findall(r'\b(limit|constraint|restrict|avoid|prevent|maximum|minimum|threshold)\b', prompt, re.I))
-        
-        # NEW: Context Richness - measures background information and domain context
-        context_indicators = len(re.findall(
-            r'\b(background|context|currently|existing|problem|challenge|goal|objective|use case|scenario|situation|environment)\b',
-            prompt, re.I))
-        examples_provided = len(re.findall(r'\b(example|such as|for instance|like|e\.g\.|i\.e\.)\b', prompt, re.I))
-        domain_terms = len(re.findall(
-            r'\b(user|customer|business|enterprise|industry|market|stakeholder|requirement|workflow|process)\b',
-            prompt, re.I))
-        context_richness = min(10, (context_indicators * 1.2) + (examples_provided * 1.5) + (domain_terms * 0.8))
-        
-        # NEW: Constraint Clarity - measures how well constraints/requirements are defined
-        quantitative_specs = len(re.findall(r'\b\d+\s*(users?|items?|records?|requests?|ms|seconds?|GB|MB|%)\b', prompt, re.I))
-        comparison_terms = len(re.findall(r'\b(better than|faster than|more than|less than|at least|up to|within)\b', prompt, re.I))
-        boundary_definitions = len(re.findall(r'\b(between|from|to|range|scope|include|exclude)\b', prompt, re.I))
-        constraint_clarity = min(10, (constraints * 1.0) + (quantitative_specs * 1.5) + (comparison_terms * 1.2) + (boundary_definitions * 0.8))
-        
-        # NEW: Output Specification - measures clarity of expected deliverables
-        deliverable_terms = len(re.findall(
-            r'\b(output|deliverable|result|artifact|document|code|design|report|dashboard|visualization|specification)\b',
-            prompt, re.I))
-        format_specs = len(re.findall(r'\b(format|structure|template|schema|layout|style|type)\b', prompt, re.I))
-        quality_criteria = len(re.findall(
-            r'\b(quality|standard|best practice|professional|production|complete|comprehensive)\b',
-            prompt, re.I))
-        output_specification = min(10, (deliverable_terms * 1.3) + (format_specs * 1.0) + (quality_criteria * 0.9))
-        
-        # Calculate original dimension scores (0-10)
-        # Clarity: based on action verbs, sentence structure, and length
-        clarity = min(10, (action_verbs * 1.5) + (3 if sentences > 0 else 0) + min(2, words / 50))
-        
-        # Specificity: based on specific terms, technical details, and constraints
-        specificity = min(10, (specific_terms * 1.2) + (technical_terms * 0.8) + (constraints * 0.5))
-        
-        # Completeness: based on requirements indicators and structure
-        completeness = min(10, (must_haves * 0.8) + (nice_to_haves * 0.4) + (paragraphs * 0.5) + min(3, words / 100))
-        
-        # Technical Depth: based on technical terminology and complexity indicators
-        technical = min(10, (technical_terms * 1.5) + (len(re.findall(r'[{}()\[\]]', prompt)) * 0.3))
-        
-        # Structure & Organization: based on formatting and structure
-        structure = min(10, (paragraphs * 0.5) + (len(re.findall(r'^[-•*]\s', prompt, re.M)) * 0.5) + (len(re.findall(r'\d+\.', prompt)) * 0.4))
-        
-        # Practicality: based on specific, actionable language
-        practicality = min(10, (action_verbs * 1.0) + (constraints * 0.6) + (must_haves * 0.5))
-        
-        # Calculate overall score (weighted average with new metrics)
-        overall = (
-            clarity * 0.15 +
-            specificity * 0.15 +
-            completeness * 0.10 +
-            technical * 0.10 +
-            structure * 0.08 +
-            practicality * 0.10 +
-            context_richness * 0.12 +
-            constraint_clarity * 0.10 +
-            output_specification * 0.10
-        )
-        
-        return {
-            # Original metrics
-            "clarity": round(clarity, 2),
-            "specificity": round(specificity, 2),
-            "completeness": round(completeness, 2),
-            "technical": round(technical, 2),
-            "structure": round(structure, 2),
-            "practicality": round(practicality, 2),
-            
-            # NEW: Enhanced metrics
-            "context_richness": round(context_richness, 2),
-            "constraint_clarity": round(constraint_clarity, 2),
-            "output_specification": round(output_specification, 2),
-            
-            "overall": round(overall, 2),
-            "metadata": {
-                "word_count": words,
-                "sentence_count": sentences,
-                "paragraph_count": paragraphs,
-                "action_verbs": action_verbs,
-                "specific_terms": specific_terms,
-                "technical_terms": technical_terms,
-                "requirements_indicators": must_haves + nice_to_haves,
-                # NEW metadata
-                "context_indicators": context_indicators,
-                "quantitative_specs": quantitative_specs,
-                "deliverable_terms": deliverable_terms
-            }
-        }
+        return self.prompt_features(prompt).score_dict()
+
+    def prompt_features(self, prompt: str) -> PromptFeatures:
+        """
+        The prompt's PromptFeatures record, extracted once per distinct text and
+        shared by /analyze, /quality-score, routing and mode auto-detection.
+        """
+        return self.score_memo.features(prompt)
     
     
-    def generate_assistant_response(self, user_message: str, prompt_context: str = None) -> str:
+    async def generate_assistant_response(self, user_message: str, prompt_context: str = None, mode: str = None) -> str:
         """
         Generate an intelligent AI assistant response with detailed guidance
+        `mode` is the caller's working mode (from the mode store); it picks the model
         """
         try:
-            if GEMINI_API_KEY:
+            if self.client.enabled:
                 context = f"User is working on a {prompt_context} prompt optimization project." if prompt_context else "User is optimizing prompts for AI projects."
                 
                 detailed_prompt = f"""{context}
@@ -2071,9 +2400,21 @@ Provide a DETAILED, HELPFUL response that includes:
 Keep response practical, actionable, and tailored to {prompt_context if prompt_context else 'general'} projects.
 Be encouraging and supportive."""
                 
-                model = genai.GenerativeModel(self.model)
-                response = model.generate_content(detailed_prompt)
-                return response.text.strip()
+                route = self.route(user_message, mode or self.default_mode)
+                breaker = self._breaker(route.model)
+                if breaker.allow_request():
+                    try:
+                        response = await self.retry_policy.run(lambda: self.client.generate(
+                            route.model, detailed_prompt, self._generation_config(route.mode)
+                        ))
+                    except GeminiQueueFullError:
+                        breaker.record_neutral()
+                        raise
+                    except Exception:
+                        breaker.record_failure()
+                        raise
+                    breaker.record_success()
+                    return response
         except Exception as e:
             print(f"Gemini API error: {e}. Using fallback response.")
         
@@ -2374,26 +2715,23 @@ Better data analysis prompt formula:
         import random
         return random.choice(generic_responses)
     
-    def set_mode(self, mode: str) -> dict:
+    def set_mode(self, mode: str, scope: str = None) -> dict:
         """
-        Set the current working mode and update configuration
-        Returns the current mode configuration
+        Set the working mode for a user/session scope (see ModeStore)
+        Returns the scope's mode configuration
         """
         if mode in self.mode_configs:
-            self.current_mode = mode
-            self.current_mode_config = self.mode_configs[mode]
-            
-            # Update model selection based on mode
-            self.model = self.model_map.get(mode, self.default_model)
+            self.mode_store.set(scope, mode)
+            model_name = self._model_for_mode(mode)
             
             logger = logging.getLogger(__name__)
-            logger.info(f"Mode switched to: {mode}, using model: {self.model}")
+            logger.info(f"Mode switched to: {mode} for {scope or 'default scope'}, using model: {model_name}")
             
             return {
                 "success": True,
-                "mode": self.current_mode,
-                "model": self.model,
-                "configuration": self.current_mode_config
+                "mode": mode,
+                "model": model_name,
+                "configuration": self.mode_configs[mode]
             }
         else:
             return {
@@ -2402,16 +2740,38 @@ Better data analysis prompt formula:
                 "available_modes": list(self.mode_configs.keys())
             }
     
-    def get_current_mode(self) -> dict:
+    def get_current_mode(self, scope: str = None) -> dict:
         """
-        Get current mode and its configuration
+        Get a user/session scope's working mode and its configuration
         """
+        mode = self.mode_store.get(scope)
         return {
-            "mode": self.current_mode,
-            "model": self.model,
-            "configuration": self.current_mode_config
+            "mode": mode,
+            "model": self._model_for_mode(mode),
+            "configuration": self.mode_configs[mode]
         }
     
+    def get_metrics(self) -> dict:
+        """
+        Runtime counters for the service's subsystems
+        """
+        return {
+            "optimization_cache": self.cache.get_stats(),
+            "quality_score_memo": self.score_memo.get_stats(),
+            "request_coalescing": self.coalescer.get_stats(),
+            "gemini_scheduler": self.scheduler.get_stats(),
+            "circuit_breakers": self.get_breaker_states(),
+            "model_router": self.router.get_stats(),
+            "hedging": self.hedger.get_stats(),
+            "retries": self.retry_policy.get_stats(),
+        }
+
+    def get_breaker_states(self) -> dict:
+        """
+        Circuit breaker state per model
+        """
+        return {name: breaker.get_state() for name, breaker in self.breakers.items()}
+    
     def get_available_modes(self) -> dict:
         """
         Get all available modes with their descriptions
@@ -2422,6 +2782,7 @@ Better data analysis prompt formula:
                 "model": self.model_map.get(mode, self.default_model),
                 "temperature": config['temperature'],
                 "max_tokens": config['max_tokens'],
+                "deadline_seconds": self._deadline_for_mode(mode),
                 "required_fields": config['prompt_structure']['required_fields'],
                 "optional_fields": config['prompt_structure']['optional_fields'],
                 "output_format": config['prompt_structure']['output_format'],
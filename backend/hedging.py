@@ -0,0 +1,95 @@
+from collections import deque
+import asyncio
+import logging
+
+
+class Hedger:
+    """
+    Hedged requests for latency-critical calls.
+
+    race() starts the primary call and, if it has not produced a valid answer
+    after the primary model's observed p90 latency, starts a second (hedge)
+    call. The first valid answer wins and the other call is cancelled. A
+    primary that fails or returns an invalid answer before the delay triggers
+    the hedge immediately.
+    """
+
+    def __init__(self, default_delay: float = 2.0, min_delay: float = 0.2, percentile: float = 90,
+                 min_samples: int = 20, window: int = 200):
+        self.default_delay = default_delay
+        self.min_delay = min_delay
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.window = window
+        self._latencies = {}
+        self._stats = {"races": 0, "hedged": 0, "primary_wins": 0, "hedge_wins": 0, "cancelled": 0, "failed": 0}
+
+    def observe(self, model_name: str, seconds: float):
+        """Record the latency of a successful call to a model"""
+        latencies = self._latencies.get(model_name)
+        if latencies is None:
+            latencies = self._latencies[model_name] = deque(maxlen=self.window)
+        latencies.append(seconds)
+
+    def delay_for(self, model_name: str) -> float:
+        """Hedge delay: the model's p90 latency once enough samples exist, else the default"""
+        latencies = self._latencies.get(model_name)
+        if not latencies or len(latencies) < self.min_samples:
+            return self.default_delay
+        ordered = sorted(latencies)
+        index = min(len(ordered) - 1, int(len(ordered) * self.percentile / 100))
+        return max(self.min_delay, ordered[index])
+
+    async def race(self, primary_model: str, primary, hedge_model: str, hedge, validate):
+        """
+        Run `primary()` and, if needed, `hedge()` (coroutine factories); return
+        (model name, result) of the first result that passes `validate`, or raise
+        the last error if neither does.
+        """
+        loop = asyncio.get_running_loop()
+        self._stats["races"] += 1
+        delay = self.delay_for(primary_model)
+        tasks = {}
+
+        def start(role: str, model_name: str, factory):
+            task = asyncio.ensure_future(factory())
+            tasks[task] = (role, model_name, loop.time())
+            return task
+
+        pending = {start("primary", primary_model, primary)}
+        hedged = False
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, timeout=None if hedged else delay, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    role, model_name, started = tasks[task]
+                    if task.exception() is None and validate(task.result()):
+                        self.observe(model_name, loop.time() - started)
+                        self._stats[f"{role}_wins"] += 1
+                        return model_name, task.result()
+                    error = task.exception() or ValueError(f"{role} response from '{model_name}' failed validation")
+                if not hedged:
+                    # Delay elapsed, or the primary already failed: start the hedge now
+                    hedged = True
+                    self._stats["hedged"] += 1
+                    logger = logging.getLogger(__name__)
+                    logger.info(f"🏁 Hedging '{primary_model}' with '{hedge_model}' after {delay:.2f}s")
+                    pending.add(start("hedge", hedge_model, hedge))
+            self._stats["failed"] += 1
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+                    self._stats["cancelled"] += 1
+
+    def get_stats(self) -> dict:
+        races = self._stats["races"]
+        return {
+            **self._stats,
+            "hedge_rate": round(self._stats["hedged"] / races, 4) if races else 0.0,
+            "delays": {model_name: round(self.delay_for(model_name), 3) for model_name in self._latencies},
+        }
@@ -0,0 +1,201 @@
+from bisect import bisect_right
+from itertools import accumulate
+
+from prompt_features import ELEMENT_KEYWORDS, PromptFeatures, count_analyze_verbs, detect_elements
+from quality_scoring import FEATURE_NAMES, LEADING_DIGITS, QUANTITY_UNITS, extract_features, is_word, tokenize
+
+def utf16_length(text: str) -> int:
+    return len(text.encode("utf-16-le", "surrogatepass")) // 2
+
+
+def utf16_to_index(text: str, units: int) -> int:
+    """String index of a UTF-16 code unit offset (what JavaScript string offsets count)"""
+    if utf16_length(text) == len(text):
+        return units
+    index = position = 0
+    while position < units:
+        position += 2 if ord(text[index]) > 0xFFFF else 1
+        index += 1
+    if position != units:
+        raise ValueError("Edit offset splits a surrogate pair")
+    return index
+
+
+class Line:
+    """One line of the text (with its '\\n') and everything analysis needs from it"""
+
+    __slots__ = ("text", "units", "token_count", "features", "action_verbs", "elements", "first", "last",
+                 "starts_with_unit", "ends_with_number")
+
+    def __init__(self, text: str):
+        tokens = tokenize(text)
+        self.text = text
+        self.units = utf16_length(text)
+        self.features = extract_features(text, tokens)
+        self.token_count = len(tokens)
+        self.action_verbs = count_analyze_verbs(tokens)
+        self.elements = detect_elements(text.lower())
+        # Token context for the counts that can cross a line break
+        self.first = tokens[0][1] if tokens else None
+        self.last = tokens[-1][1] if tokens else None
+        self.starts_with_unit = bool(tokens) and (
+            self.first in QUANTITY_UNITS
+            or (self.first == "%" and len(tokens) > 1 and tokens[1][0] == "" and is_word(tokens[1][1]))
+        )
+        self.ends_with_number = bool(tokens) and self.last[0].isdecimal() and LEADING_DIGITS.fullmatch(self.last) is not None
+
+
+def split_lines(text: str) -> list:
+    """Lines ending in '\\n', plus the unterminated tail if it is not empty"""
+    parts = text.split("\n")
+    lines = [part + "\n" for part in parts[:-1]]
+    if parts[-1]:
+        lines.append(parts[-1])
+    return lines
+
+
+class LiveAnalysis:
+    """
+    Incrementally maintained /analyze result for text that is edited in place.
+
+    The text is kept as lines, each with its own feature vector (tokens never
+    span a line break), and the feature totals are updated by subtracting
+    the vectors of replaced lines and adding those of new ones, so an edit
+    only re-tokenizes the lines it touches. Three counts can cross line
+    breaks - sentences (continued across lines until a '.'), paragraphs
+    (separated by an empty line) and quantities ("5" at the end of one line,
+    "users" at the start of the next) - and are corrected in a pass over
+    the per-line token context. The result always equals analyzing the full
+    text from scratch.
+
+    Text with more than `max_lines` lines (e.g. thousands of one-character
+    lines, where the per-line bookkeeping costs more than it saves) is kept
+    as a single Line and fully re-analyzed on every edit instead.
+
+    Offsets and lengths are UTF-16 code units, as JavaScript counts them.
+    """
+
+    def __init__(self, text: str = "", max_length: int = 200000, max_lines: int = 2000):
+        self.max_length = max_length
+        self.max_lines = max_lines
+        self.reset(text)
+
+    def reset(self, text: str):
+        if utf16_length(text) > self.max_length:
+            raise ValueError(f"Text too long (max {self.max_length} characters)")
+        lines = split_lines(text)
+        self._whole = Line(text) if len(lines) > self.max_lines else None
+        self._lines = []
+        self._starts = []
+        self._totals = dict.fromkeys(FEATURE_NAMES, 0)
+        self._token_count = 0
+        self._action_verbs = 0
+        self._elements = {label: 0 for label, _ in ELEMENT_KEYWORDS}
+        self.length = 0
+        if self._whole is not None:
+            self.length = self._whole.units
+            return
+        self._replace(0, 0, lines)
+
+    @property
+    def incremental(self) -> bool:
+        """False while the text has too many lines to be analyzed line by line"""
+        return self._whole is None
+
+    @property
+    def text(self) -> str:
+        if self._whole is not None:
+            return self._whole.text
+        return "".join(line.text for line in self._lines)
+
+    def apply_edit(self, offset: int, deleted: int, inserted: str):
+        """Replace `deleted` code units at `offset` with `inserted`"""
+        if offset < 0 or deleted < 0 or offset + deleted > self.length:
+            raise ValueError(f"Edit out of range: offset {offset}, deleted {deleted}, length {self.length}")
+        if self.length - deleted + utf16_length(inserted) > self.max_length:
+            raise ValueError(f"Text too long (max {self.max_length} characters)")
+        if self._whole is not None:
+            text = self._whole.text
+            self.reset(text[:utf16_to_index(text, offset)] + inserted + text[utf16_to_index(text, offset + deleted):])
+            return
+        if not self._lines:
+            self.reset(inserted)
+            return
+
+        end = offset + deleted
+        first = max(0, bisect_right(self._starts, offset) - 1)
+        last = max(first, bisect_right(self._starts, end) - 1)
+        head = self._lines[first].text[:utf16_to_index(self._lines[first].text, offset - self._starts[first])]
+        tail = self._lines[last].text[utf16_to_index(self._lines[last].text, end - self._starts[last]):]
+        window = head + inserted + tail
+        if not window.endswith("\n") and last + 1 < len(self._lines):
+            # The edit removed the line break: the following line joins this one
+            last += 1
+            window += self._lines[last].text
+        self._replace(first, last + 1, split_lines(window))
+        if len(self._lines) > self.max_lines:
+            self.reset(self.text)
+
+    def _replace(self, start: int, stop: int, texts: list):
+        lines = [Line(text) for text in texts]
+        for line, sign in [(line, -1) for line in self._lines[start:stop]] + [(line, 1) for line in lines]:
+            for name, value in line.features.items():
+                self._totals[name] += sign * value
+            self._token_count += sign * line.token_count
+            self._action_verbs += sign * line.action_verbs
+            for label in line.elements:
+                self._elements[label] += sign
+        self._lines[start:stop] = lines
+        origin = self._starts[start] if start < len(self._starts) else self.length
+        self._starts[start:] = accumulate((line.units for line in self._lines[start:-1]), initial=origin) if start < len(self._lines) else []
+        self.length = self._starts[-1] + self._lines[-1].units if self._lines else 0
+
+    def apply_message(self, message: dict) -> dict:
+        """
+        Apply one client message and return the analysis to push back:
+        {"type": "reset", "text": ...} or {"type": "edit", "offset": ..., "deleted": ..., "inserted": ...},
+        or {"type": "edit", "edits": [...]} for several edits in order.
+        """
+        if message.get("type") == "reset":
+            self.reset(str(message.get("text", "")))
+        elif message.get("type") == "edit":
+            for edit in message.get("edits") or [message]:
+                self.apply_edit(int(edit["offset"]), int(edit.get("deleted", 0)), str(edit.get("inserted", "")))
+        else:
+            raise ValueError(f"Unknown message type: {message.get('type')!r}")
+        return {"seq": message.get("seq"), **self.analysis()}
+
+    def features(self) -> dict:
+        """Feature vector of the whole text (equal to quality_scoring.extract_features(self.text))"""
+        if self._whole is not None:
+            return dict(self._whole.features)
+        features = dict(self._totals)
+        previous = None
+        empty_line_since = False
+        for line in self._lines:
+            if line.first is None:
+                empty_line_since = empty_line_since or line.text == "\n"
+                continue
+            if previous is not None:
+                # Counted per line as if each line started the text; undo where it does not
+                if line.first != "." and previous.last != ".":
+                    features["sentences"] -= 1
+                if not empty_line_since:
+                    features["paragraphs"] -= 1
+                if previous.ends_with_number and line.starts_with_unit:
+                    features["quantitative_specs"] += 1
+            previous = line
+            empty_line_since = False
+        return features
+
+    def prompt_features(self) -> PromptFeatures:
+        """PromptFeatures of the current text (mode auto-detection hits are not tracked)"""
+        if self._whole is not None:
+            return PromptFeatures.build(self.features(), self._whole.token_count, self._whole.action_verbs,
+                                        list(self._whole.elements))
+        elements = [label for label, _ in ELEMENT_KEYWORDS if self._elements[label]]
+        return PromptFeatures.build(self.features(), self._token_count, self._action_verbs, elements)
+
+    def analysis(self) -> dict:
+        """The /analyze payload for the current text, plus its length"""
+        return {"length": self.length, **self.prompt_features().analysis()}
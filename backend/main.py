@@ -1,12 +1,29 @@
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, Header, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 import database
+import live_analysis
 import models
+import schema_migrations
 import schemas
+import user_stats
+from activity_sink import ActivitySink
 from gemini_service import GeminiService
-from config import DEBUG
+from optimization_store import OptimizationUnitOfWork
+from config import (
+    DEBUG, OPTIMIZE_BATCH_MAX_ITEMS, OPTIMIZE_BATCH_MAX_CONCURRENCY, QUALITY_SCORE_BATCH_MAX_ITEMS,
+    LIVE_ANALYSIS_MAX_CHARS, LIVE_ANALYSIS_MAX_LINES, ACTIVITY_SINK_ENABLED, ACTIVITY_SINK_MAX_QUEUE,
+    ACTIVITY_SINK_BATCH_SIZE, ACTIVITY_SINK_FLUSH_INTERVAL_MS, ACTIVITY_SINK_PUT_TIMEOUT_SECONDS, HISTORY_PAGE_MAX_LIMIT, HISTORY_PREVIEW_CHARS,
+)
+from pagination import keyset_page
+from quality_scoring import score_many
 from datetime import datetime
+from typing import Optional
+import asyncio
+import json
 import logging
 import sys
 import re
@@ -37,10 +54,11 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],  # keyset pagination of /history and /user/history
 )
 
 # Import and include authentication router
-from auth import auth_router, get_current_user
+from auth import auth_router, get_current_user, get_optional_user
 app.include_router(auth_router)
 
 # Create tables on startup
@@ -53,6 +71,10 @@ def startup():
     try:
         database.Base.metadata.create_all(bind=database.engine)
         logger.info("✓ Database tables created/verified")
+        schema_migrations.upgrade()
+        logger.info(f"✓ Database schema at version {schema_migrations.current_version()}")
+        gemini_service.bandit.load()
+        logger.info("✓ Model bandit state loaded")
         logger.info("✓ CORS enabled for frontend communication")
         logger.info("✓ Gemini service initialized")
         logger.info("")
@@ -63,19 +85,127 @@ def startup():
         logger.error(f"❌ Startup error: {e}")
         raise
 
+@app.on_event("startup")
+async def start_history_backfill():
+    # Scores for history rows written before schema migration 2, in the background so startup does not wait
+    async def backfill():
+        try:
+            await asyncio.to_thread(schema_migrations.backfill_history_scores)
+        except Exception:
+            logger.exception("❌ History score backfill failed; rerun with: python schema_migrations.py --backfill")
+
+    app.state.history_backfill = asyncio.create_task(backfill())
+
+@app.on_event("startup")
+async def start_activity_sink():
+    await activity_sink.start()
+    if activity_sink.running:
+        logger.info("✓ Activity sink started")
+
+@app.on_event("shutdown")
+async def stop_activity_sink():
+    await activity_sink.stop()
+
 # Initialize Gemini service
 gemini_service = GeminiService()
 
+# Write-behind UserActivity logging
+activity_sink = ActivitySink(
+    max_queue=ACTIVITY_SINK_MAX_QUEUE,
+    batch_size=ACTIVITY_SINK_BATCH_SIZE,
+    flush_interval_ms=ACTIVITY_SINK_FLUSH_INTERVAL_MS,
+    put_timeout=ACTIVITY_SINK_PUT_TIMEOUT_SECONDS,
+    enabled=ACTIVITY_SINK_ENABLED
+)
+
 # ==================== ENDPOINTS ====================
 
 @app.get("/")
 def read_root():
     return {"message": "PromptEngine Backend API", "version": "1.0.0"}
 
+def _mode_scope(
+    request: Request,
+    x_session_id: Optional[str] = Header(None),
+    current_user: Optional[dict] = Depends(get_optional_user)
+) -> str:
+    """
+    Key under which the caller's working mode is stored: the user when a valid bearer
+    token is sent, else the X-Session-ID header (the frontend sends a per-tab id), else
+    the client address as a last resort for clients that send neither
+    """
+    if current_user:
+        return f"user:{current_user.get('id')}"
+    if x_session_id:
+        return f"session:{x_session_id}"
+    return f"client:{request.client.host if request.client else 'unknown'}"
+
+def _optimize_options(request: schemas.OptimizePromptRequest) -> dict:
+    return {
+        "include_tests": request.include_tests,
+        "add_documentation": request.add_documentation,
+        "performance_optimization": request.performance_optimization,
+        "security_features": request.security_features,
+        "race": request.race
+    }
+
+def _score_optimization(original_prompt: str, optimized_prompt: str):
+    """Quality scores of the optimized and original prompts and the improvement over the original"""
+    scores = gemini_service.generate_quality_scores(optimized_prompt)
+    original_scores = gemini_service.generate_quality_scores(original_prompt)
+    improvement_percentage = round(((scores["overall"] - original_scores["overall"]) / original_scores["overall"] * 100) if original_scores["overall"] > 0 else 20, 2)
+    return scores, original_scores, improvement_percentage
+
+def _save_optimizations(entries: list, user_id) -> list:
+    """
+    Score (request, optimized_prompt, model_name) entries and persist them as one
+    unit of work: all rows in a single transaction with one commit.
+    Called from the threadpool once the Gemini calls are done.
+    """
+    unit = OptimizationUnitOfWork(user_id)
+    for request, optimized_prompt, model_name in entries:
+        unit.add(request, optimized_prompt, model_name, *_score_optimization(request.original_prompt, optimized_prompt))
+    return unit.commit()
+
+def _save_assistant_message(user_id, request: schemas.AssistantMessageRequest, response_text: str) -> datetime:
+    """Persist one assistant exchange and return its created_at (called from the threadpool)"""
+    db = database.SessionLocal()
+    try:
+        message_record = models.AssistantMessage(
+            user_id=user_id,
+            user_message=request.user_message,
+            assistant_response=response_text,
+            prompt_context=request.prompt_context
+        )
+        db.add(message_record)
+        db.commit()
+        return message_record.created_at
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+async def _log_optimize_activity(user_id, request: schemas.OptimizePromptRequest, model_name: str, saved: dict, batch: bool = False):
+    """Queue the prompt_optimize activity of a signed-in user"""
+    if not user_id:
+        return
+    meta_data = {"model": model_name, "improvement": saved["improvement_percentage"], "overall_score": saved["scores"]["overall"]}
+    if batch:
+        meta_data["batch"] = True
+    await activity_sink.log(
+        user_id,
+        "prompt_optimize",
+        {"original_prompt": request.original_prompt[:200], "mode": request.mode},  # Truncate for storage
+        meta_data
+    )
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
 @app.post("/optimize", response_model=schemas.OptimizePromptResponse)
-def optimize_prompt(
+async def optimize_prompt(
     request: schemas.OptimizePromptRequest, 
-    db: Session = Depends(database.get_db),
     current_user: dict = Depends(lambda: None)  # Optional authentication
 ):
     """
@@ -87,82 +217,16 @@ def optimize_prompt(
         # Get user_id if authenticated
         user_id = current_user.get("id") if current_user else None
         
-        # Create prompt record
-        prompt_record = models.Prompt(
-            user_id=user_id,
-            original=request.original_prompt,
-            mode=request.mode
-        )
-        db.add(prompt_record)
-        db.commit()
-        db.refresh(prompt_record)
-        
         # Optimize using Gemini
-        options = {
-            "include_tests": request.include_tests,
-            "add_documentation": request.add_documentation,
-            "performance_optimization": request.performance_optimization,
-            "security_features": request.security_features
-        }
-        optimized_prompt = gemini_service.optimize_prompt_for_mode(request.original_prompt, request.mode, options)
-        logger.info(f"✓ Prompt optimized successfully")
-        
-        # Update prompt record
-        prompt_record.optimized = optimized_prompt
-        db.commit()
-        
-        # Generate quality scores
-        scores = gemini_service.generate_quality_scores(optimized_prompt)
-        
-        # Save quality scores
-        quality_record = models.QualityScore(
-            prompt_id=prompt_record.id,
-            clarity=scores["clarity"],
-            specificity=scores["specificity"],
-            completeness=scores["completeness"],
-            technical=scores["technical"],
-            structure=scores["structure"],
-            practicality=scores["practicality"],
-            overall=scores["overall"]
-        )
-        db.add(quality_record)
-        db.commit()
-        
-        # Calculate improvement
-        original_scores = gemini_service.generate_quality_scores(request.original_prompt)
-        improvement_percentage = round(((scores["overall"] - original_scores["overall"]) / original_scores["overall"] * 100) if original_scores["overall"] > 0 else 20, 2)
-        
-        # Save optimization history
-        history_record = models.OptimizationHistory(
-            user_id=user_id,
-            prompt_id=prompt_record.id,
-            original_prompt=request.original_prompt,
-            optimized_prompt=optimized_prompt,
-            mode=request.mode,
-            model=gemini_service.model,
-            improvement_percentage=improvement_percentage
-        )
-        db.add(history_record)
-        db.commit()
+        result = await gemini_service.optimize_prompt_for_mode(request.original_prompt, request.mode, _optimize_options(request))
+        optimized_prompt = result["optimized_prompt"]
+        logger.info(f"✓ Prompt optimized successfully (source: {result['source']})")
         
-        # Track user activity if authenticated
-        if user_id:
-            activity = models.UserActivity(
-                user_id=user_id,
-                activity_type="prompt_optimize",
-                activity_data={
-                    "original_prompt": request.original_prompt[:200],  # Truncate for storage
-                    "mode": request.mode
-                },
-                meta_data={
-                    "model": gemini_service.model,
-                    "improvement": improvement_percentage,
-                    "overall_score": scores["overall"]
-                }
-            )
-            db.add(activity)
-            db.commit()
-            logger.info(f"✓ Activity logged for user {user_id}")
+        saved = (await run_in_threadpool(_save_optimizations, [(request, optimized_prompt, result["model"])], user_id))[0]
+        await _log_optimize_activity(user_id, request, result["model"], saved)
+        scores = saved["scores"]
+        improvement_percentage = saved["improvement_percentage"]
+        await gemini_service.record_outcome(result, improvement_percentage)
         
         return schemas.OptimizePromptResponse(
             original_prompt=request.original_prompt,
@@ -170,55 +234,167 @@ def optimize_prompt(
             quality_scores=schemas.QualityScoreResponse(**scores),
             improvement_percentage=improvement_percentage,
             mode=request.mode,
-            model=gemini_service.model
+            model=result["model"],
+            served_by=result["source"],
+            retries=result.get("retries", 0)
         )
     except Exception as e:
-        db.rollback()
         raise HTTPException(status_code=500, detail=f"Error optimizing prompt: {str(e)}")
 
+@app.post("/optimize/stream")
+async def optimize_prompt_stream(
+    request: schemas.OptimizePromptRequest,
+    current_user: dict = Depends(lambda: None)  # Optional authentication
+):
+    """
+    Optimize a prompt and stream the formatted sections as server-sent events.
+    Events: 'start', one 'section' per formatted section, then 'complete' with scores and DB ids.
+    """
+    logger.info(f"📡 Streaming optimize request received - Mode: {request.mode}")
+    user_id = current_user.get("id") if current_user else None
+
+    async def event_stream():
+        try:
+            async for event, data in gemini_service.stream_optimize_prompt_for_mode(
+                request.original_prompt, request.mode, _optimize_options(request)
+            ):
+                if event != "result":
+                    yield _sse(event, data)
+                    continue
+
+                saved = (await run_in_threadpool(
+                    _save_optimizations, [(request, data["optimized_prompt"], data["model"])], user_id
+                ))[0]
+                await _log_optimize_activity(user_id, request, data["model"], saved)
+                await gemini_service.record_outcome(data, saved["improvement_percentage"])
+                yield _sse("complete", {
+                    "mode": request.mode,
+                    "model": data["model"],
+                    "source": data["source"],
+                    "quality_scores": schemas.QualityScoreResponse(**saved["scores"]).model_dump(),
+                    "improvement_percentage": saved["improvement_percentage"],
+                    "prompt_id": saved["prompt_id"],
+                    "history_id": saved["history_id"]
+                })
+        except Exception as e:
+            logger.exception("Error streaming optimization")
+            yield _sse("error", {"detail": f"Error optimizing prompt: {str(e)}"})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/optimize/batch", response_model=schemas.OptimizeBatchResponse)
+async def optimize_prompt_batch(
+    request: schemas.OptimizeBatchRequest,
+    current_user: dict = Depends(lambda: None)  # Optional authentication
+):
+    """
+    Optimize many prompts in one call.
+    Items run concurrently (bounded by the requested concurrency), successful results
+    are saved in one transaction, and results come back in request order with an
+    'error' entry for each item that failed.
+    """
+    if len(request.items) > OPTIMIZE_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Batch too large: {len(request.items)} items (max {OPTIMIZE_BATCH_MAX_ITEMS})")
+
+    concurrency = max(1, min(request.concurrency, OPTIMIZE_BATCH_MAX_CONCURRENCY))
+    logger.info(f"📦 Batch optimize request received - {len(request.items)} items, concurrency {concurrency}")
+    user_id = current_user.get("id") if current_user else None
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def optimize_item(item: schemas.OptimizePromptRequest) -> dict:
+        async with semaphore:
+            return await gemini_service.optimize_prompt_for_mode(item.original_prompt, item.mode, _optimize_options(item))
+
+    outcomes = await asyncio.gather(*[optimize_item(item) for item in request.items], return_exceptions=True)
+
+    succeeded = [i for i, outcome in enumerate(outcomes) if not isinstance(outcome, BaseException)]
+    try:
+        saved = await run_in_threadpool(
+            _save_optimizations,
+            [(request.items[i], outcomes[i]["optimized_prompt"], outcomes[i]["model"]) for i in succeeded],
+            user_id
+        )
+    except Exception as e:
+        logger.exception("Error saving batch optimization")
+        raise HTTPException(status_code=500, detail=f"Error saving batch optimization: {str(e)}")
+    saved_by_index = dict(zip(succeeded, saved))
+    for i in succeeded:
+        await _log_optimize_activity(user_id, request.items[i], outcomes[i]["model"], saved_by_index[i], batch=True)
+        await gemini_service.record_outcome(outcomes[i], saved_by_index[i]["improvement_percentage"])
+
+    results = []
+    for i, (item, outcome) in enumerate(zip(request.items, outcomes)):
+        if isinstance(outcome, BaseException):
+            logger.error(f"❌ Batch item {i} failed: {outcome}")
+            results.append(schemas.OptimizeBatchItemResult(
+                index=i, original_prompt=item.original_prompt, mode=item.mode, error=str(outcome)
+            ))
+            continue
+        record = saved_by_index[i]
+        results.append(schemas.OptimizeBatchItemResult(
+            index=i,
+            original_prompt=item.original_prompt,
+            optimized_prompt=outcome["optimized_prompt"],
+            quality_scores=schemas.QualityScoreResponse(**record["scores"]),
+            improvement_percentage=record["improvement_percentage"],
+            mode=item.mode,
+            model=outcome["model"],
+            served_by=outcome["source"],
+            retries=outcome.get("retries", 0),
+            prompt_id=record["prompt_id"],
+            history_id=record["history_id"]
+        ))
+
+    logger.info(f"✓ Batch optimized: {len(succeeded)} succeeded, {len(outcomes) - len(succeeded)} failed")
+    return schemas.OptimizeBatchResponse(
+        results=results, succeeded=len(succeeded), failed=len(outcomes) - len(succeeded)
+    )
+
 @app.post("/analyze", response_model=schemas.AnalyzePromptResponse)
 def analyze_prompt(request: schemas.AnalyzePromptRequest, db: Session = Depends(database.get_db)):
     """
     Analyze a prompt for quality and characteristics
     """
     try:
-        prompt = request.prompt
-        words = len(prompt.split())
-        sentences = len([s for s in prompt.split('.') if s.strip()])
-        action_verbs = len([v for v in re.findall(r'\b(create|build|implement|design|develop|optimize|analyze|generate)\b', prompt, re.I)])
-        
-        # Detect elements
-        elements = []
-        if any(word in prompt.lower() for word in ['function', 'method']):
-            elements.append('🔄 Function')
-        if any(word in prompt.lower() for word in ['api', 'endpoint']):
-            elements.append('🔌 API')
-        if any(word in prompt.lower() for word in ['database', 'schema']):
-            elements.append('🗄️ Database')
-        if any(word in prompt.lower() for word in ['test', 'validate']):
-            elements.append('🧪 Testing')
-        if any(word in prompt.lower() for word in ['security', 'authenticate']):
-            elements.append('🔒 Security')
-        if any(word in prompt.lower() for word in ['performance', 'optimize']):
-            elements.append('⚡ Performance')
-        
-        # Calculate readability
-        avg_words_per_sentence = words / max(sentences, 1)
-        readability = 'Complex' if avg_words_per_sentence > 20 else 'Moderate' if avg_words_per_sentence > 15 else 'Clear'
-        
-        # Generate scores
-        scores = gemini_service.generate_quality_scores(prompt)
-        
-        return schemas.AnalyzePromptResponse(
-            word_count=words,
-            readability=readability,
-            action_verbs=action_verbs,
-            elements=elements,
-            scores=schemas.QualityScoreResponse(**scores)
-        )
+        # One memoized PromptFeatures record; /quality-score and /optimize reuse it for the same text
+        return schemas.AnalyzePromptResponse(**gemini_service.prompt_features(request.prompt).analysis())
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error analyzing prompt: {str(e)}")
 
+@app.websocket("/ws/analyze")
+async def analyze_live(websocket: WebSocket):
+    """
+    Live prompt analysis while typing.
+    The client sends {"type": "reset", "text": ...} once, then one
+    {"type": "edit", "offset": ..., "deleted": ..., "inserted": ...} per change (offsets and
+    lengths in UTF-16 code units, as JavaScript counts them). Each message is answered with
+    {"type": "analysis", ...} (the /analyze payload plus "length" and the message's "seq"), or
+    {"type": "error", "detail": ...} after which the client should send a reset (binary frames
+    are answered with an error too). Only the lines an edit touches are re-analyzed.
+    """
+    await websocket.accept()
+    live = live_analysis.LiveAnalysis(max_length=LIVE_ANALYSIS_MAX_CHARS, max_lines=LIVE_ANALYSIS_MAX_LINES)
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            if message.get("text") is None:
+                await websocket.send_json({"type": "error", "detail": "Expected a JSON text frame"})
+                continue
+            try:
+                analysis = await run_in_threadpool(live.apply_message, json.loads(message["text"]))
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                await websocket.send_json({"type": "error", "detail": str(e)})
+                continue
+            await websocket.send_json({"type": "analysis", **analysis})
+    except WebSocketDisconnect:
+        pass
+
 @app.post("/quality-score", response_model=schemas.QualityScoreResponse)
 def calculate_quality_score(request: schemas.AnalyzePromptRequest):
     """
@@ -230,11 +406,25 @@ def calculate_quality_score(request: schemas.AnalyzePromptRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error calculating quality score: {str(e)}")
 
+@app.post("/quality-score/batch", response_model=schemas.QualityScoreBatchResponse)
+def calculate_quality_score_batch(request: schemas.QualityScoreBatchRequest):
+    """
+    Calculate quality scores for many prompts at once (e.g. rescoring history).
+    Scores come back in request order and equal what /quality-score returns per prompt.
+    """
+    if len(request.prompts) > QUALITY_SCORE_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Batch too large: {len(request.prompts)} prompts (max {QUALITY_SCORE_BATCH_MAX_ITEMS})")
+    try:
+        scores = score_many(request.prompts)
+        return {"scores": scores, "count": len(scores)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error calculating quality scores: {str(e)}")
+
 @app.post("/assistant", response_model=schemas.AssistantMessageResponse)
-def assistant_message(
+async def assistant_message(
     request: schemas.AssistantMessageRequest, 
-    db: Session = Depends(database.get_db),
-    current_user: dict = Depends(lambda: None)  # Optional authentication
+    current_user: dict = Depends(lambda: None),  # Optional authentication
+    mode_scope: str = Depends(_mode_scope)
 ):
     """
     Get AI assistant response
@@ -244,41 +434,33 @@ def assistant_message(
         user_id = current_user.get("id") if current_user else None
         
         # Generate response
-        response_text = gemini_service.generate_assistant_response(request.user_message, request.prompt_context)
-        
-        # Save message
-        message_record = models.AssistantMessage(
-            user_id=user_id,
-            user_message=request.user_message,
-            assistant_response=response_text,
-            prompt_context=request.prompt_context
+        response_text = await gemini_service.generate_assistant_response(
+            request.user_message, request.prompt_context, gemini_service.mode_store.get(mode_scope)
         )
-        db.add(message_record)
-        db.commit()
+        
+        # Save message (off the event loop)
+        created_at = await run_in_threadpool(_save_assistant_message, user_id, request, response_text)
         
         # Track user activity if authenticated
         if user_id:
-            activity = models.UserActivity(
-                user_id=user_id,
-                activity_type="chat",
-                activity_data={
+            await activity_sink.log(
+                user_id,
+                "chat",
+                {
                     "user_message": request.user_message[:200],
                     "context": request.prompt_context
                 },
-                meta_data={
+                {
                     "response_length": len(response_text)
                 }
             )
-            db.add(activity)
-            db.commit()
         
         return schemas.AssistantMessageResponse(
             user_message=request.user_message,
             assistant_response=response_text,
-            created_at=message_record.created_at
+            created_at=created_at
         )
     except Exception as e:
-        db.rollback()
         raise HTTPException(status_code=500, detail=f"Error generating response: {str(e)}")
 
 @app.post("/generate-image", response_model=schemas.ImageGenerateResponse)
@@ -326,30 +508,63 @@ def extract_keywords(
         raise HTTPException(status_code=500, detail=f"Error extracting keywords: {str(e)}")
 
 @app.get("/history")
-def get_optimization_history(db: Session = Depends(database.get_db)):
+def get_optimization_history(
+    response: Response,
+    limit: int = Query(50, ge=1, le=HISTORY_PAGE_MAX_LIMIT),
+    cursor: Optional[str] = None,
+    fields: str = Query("full", pattern="^(full|preview)$"),
+    db: Session = Depends(database.get_db)
+):
     """
-    Get optimization history
+    Get optimization history, newest first.
+    Pages are keyset-paginated: pass the X-Next-Cursor response header back as `cursor`
+    for the next page (no header on the last page). fields=preview returns the first
+    HISTORY_PREVIEW_CHARS characters of each prompt as original_preview / optimized_preview
+    instead of the full texts.
     """
+    history_model = models.OptimizationHistory
     try:
-        history = db.query(models.OptimizationHistory).order_by(models.OptimizationHistory.created_at.desc()).limit(50).all()
-        return [
-            {
-                "id": h.id,
-                "original_prompt": h.original_prompt,
-                "optimized_prompt": h.optimized_prompt,
-                "mode": h.mode,
-                "model": h.model,
-                "improvement_percentage": h.improvement_percentage,
-                "created_at": h.created_at.isoformat() if h.created_at else None
-            }
-            for h in history
-        ]
+        if fields == "preview":
+            query = db.query(
+                history_model.id,
+                func.substr(history_model.original_prompt, 1, HISTORY_PREVIEW_CHARS).label("original_preview"),
+                func.substr(history_model.optimized_prompt, 1, HISTORY_PREVIEW_CHARS).label("optimized_preview"),
+                history_model.mode,
+                history_model.model,
+                history_model.improvement_percentage,
+                history_model.original_overall,
+                history_model.optimized_overall,
+                history_model.created_at
+            )
+        else:
+            query = db.query(history_model)
+        history, next_cursor = keyset_page(query, history_model, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching history: {str(e)}")
 
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    texts = ("original_preview", "optimized_preview") if fields == "preview" else ("original_prompt", "optimized_prompt")
+    return [
+        {
+            "id": h.id,
+            texts[0]: getattr(h, texts[0]),
+            texts[1]: getattr(h, texts[1]),
+            "mode": h.mode,
+            "model": h.model,
+            "improvement_percentage": h.improvement_percentage,
+            "original_overall": h.original_overall,
+            "optimized_overall": h.optimized_overall,
+            "created_at": h.created_at.isoformat() if h.created_at else None
+        }
+        for h in history
+    ]
+
 @app.post("/set-mode")
-def set_mode(request: dict):
-    """Set the current working mode for the Gemini service"""
+def set_mode(request: dict, mode_scope: str = Depends(_mode_scope)):
+    """Set the caller's working mode (per user, or per X-Session-ID)"""
     try:
         mode = request.get('mode')
         config = request.get('config', {})
@@ -362,7 +577,7 @@ def set_mode(request: dict):
             logger.info(f"📋 Frontend mode config received: {config.get('title', mode)}")
             logger.info(f"🎯 Frontend prompt structure: {config.get('promptFormat', {}).get('structure', 'N/A')}")
         
-        result = gemini_service.set_mode(mode)
+        result = gemini_service.set_mode(mode, mode_scope)
         
         if result["success"]:
             logger.info(f"✅ Mode successfully set to: {mode} with model: {result['model']}")
@@ -382,10 +597,10 @@ def set_mode(request: dict):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/get-mode")
-def get_current_mode():
-    """Get the current working mode and configuration"""
+def get_current_mode(mode_scope: str = Depends(_mode_scope)):
+    """Get the caller's working mode and configuration"""
     try:
-        mode_info = gemini_service.get_current_mode()
+        mode_info = gemini_service.get_current_mode(mode_scope)
         return mode_info
     except Exception as e:
         logger.exception("Error getting current mode")
@@ -419,12 +634,17 @@ def get_user_profile(current_user: dict = Depends(get_current_user)):
 
 @app.get("/user/history")
 def get_user_history(
-    limit: int = 50,
+    response: Response,
+    limit: int = Query(50, ge=1, le=HISTORY_PAGE_MAX_LIMIT),
     activity_type: str = None,
+    cursor: Optional[str] = None,
     current_user: dict = Depends(get_current_user),
     db: Session = Depends(database.get_db)
 ):
-    """Get user's activity history"""
+    """
+    Get user's activity history, newest first.
+    Keyset-paginated like /history: the X-Next-Cursor response header is the `cursor` of the next page.
+    """
     try:
         query = db.query(models.UserActivity).filter(
             models.UserActivity.user_id == current_user["id"]
@@ -433,84 +653,38 @@ def get_user_history(
         if activity_type:
             query = query.filter(models.UserActivity.activity_type == activity_type)
         
-        activities = query.order_by(
-            models.UserActivity.created_at.desc()
-        ).limit(limit).all()
-        
-        return [
-            {
-                "id": a.id,
-                "activity_type": a.activity_type,
-                "activity_data": a.activity_data,
-                "metadata": a.meta_data,  # Return as 'metadata' for API consistency
-                "created_at": a.created_at.isoformat()
-            }
-            for a in activities
-        ]
+        activities, next_cursor = keyset_page(query, models.UserActivity, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching history: {str(e)}")
 
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return [
+        {
+            "id": a.id,
+            "activity_type": a.activity_type,
+            "activity_data": a.activity_data,
+            "metadata": a.meta_data,  # Return as 'metadata' for API consistency
+            "created_at": a.created_at.isoformat()
+        }
+        for a in activities
+    ]
+
 @app.get("/user/analytics")
 def get_user_analytics(
     current_user: dict = Depends(get_current_user),
     db: Session = Depends(database.get_db)
 ):
-    """Get user analytics and statistics"""
+    """
+    Get user analytics and statistics.
+    Read from the user's user_stats rollup row, which the write paths keep current,
+    so the cost does not grow with the user's history.
+    """
     try:
-        from sqlalchemy import func
-        from datetime import timedelta
-        
-        user_id = current_user["id"]
-        
-        # Total activities
-        total_activities = db.query(models.UserActivity).filter(
-            models.UserActivity.user_id == user_id
-        ).count()
-        
-        # Activity breakdown by type
-        activity_breakdown_query = db.query(
-            models.UserActivity.activity_type,
-            func.count(models.UserActivity.id)
-        ).filter(
-            models.UserActivity.user_id == user_id
-        ).group_by(models.UserActivity.activity_type).all()
-        
-        activity_breakdown = {activity_type: count for activity_type, count in activity_breakdown_query}
-        
-        # Recent activity (last 7 days)
-        seven_days_ago = datetime.utcnow() - timedelta(days=7)
-        recent_count = db.query(models.UserActivity).filter(
-            models.UserActivity.user_id == user_id,
-            models.UserActivity.created_at >= seven_days_ago
-        ).count()
-        
-        # Most used mode
-        mode_stats_query = db.query(
-            models.Prompt.mode,
-            func.count(models.Prompt.id)
-        ).filter(
-            models.Prompt.user_id == user_id
-        ).group_by(models.Prompt.mode).all()
-        
-        mode_usage = {mode: count for mode, count in mode_stats_query}
-        
-        # Total prompts optimized
-        total_prompts = db.query(models.Prompt).filter(
-            models.Prompt.user_id == user_id
-        ).count()
-        
-        # Average improvement percentage
-        avg_improvement = db.query(func.avg(models.OptimizationHistory.improvement_percentage)).filter(
-            models.OptimizationHistory.user_id == user_id
-        ).scalar() or 0.0
-        
         return {
-            "total_activities": total_activities,
-            "total_prompts": total_prompts,
-            "activity_breakdown": activity_breakdown,
-            "recent_activity_count": recent_count,
-            "mode_usage": mode_usage,
-            "average_improvement": round(avg_improvement, 2),
+            **user_stats.read(db.connection(), current_user["id"]),
             "member_since": current_user.get("createdAt").isoformat() if current_user.get("createdAt") else None,
             "last_login": current_user.get("lastLogin").isoformat() if current_user.get("lastLogin") else None
         }
@@ -518,12 +692,33 @@ def get_user_analytics(
         logger.error(f"Analytics error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error generating analytics: {str(e)}")
 
+@app.get("/metrics")
+def get_metrics():
+    """Runtime metrics for the optimization pipeline (cache hit/miss/eviction counters, ...)"""
+    return {**gemini_service.get_metrics(), "activity_sink": activity_sink.get_stats()}
+
+@app.get("/admin/bandit")
+def get_bandit_stats(current_user: dict = Depends(get_current_user)):
+    """Model bandit arm statistics per mode (admin only)"""
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return gemini_service.bandit.get_stats()
+
 @app.get("/health")
 def health_check():
     """
     Health check endpoint
+
+    Stays 200 while Gemini is down (the fallback still serves requests);
+    status is 'degraded' while any model's circuit breaker is not closed.
     """
-    return {"status": "ok", "timestamp": datetime.utcnow().isoformat()}
+    breakers = gemini_service.get_breaker_states()
+    degraded = any(state["state"] != "closed" for state in breakers.values())
+    return {
+        "status": "degraded" if degraded else "ok",
+        "timestamp": datetime.utcnow().isoformat(),
+        "circuit_breakers": breakers,
+    }
 
 # ==================== MAIN ====================
 
@@ -4,6 +4,7 @@ Run this after updating models.py
 """
 from database import engine, Base
 import models
+import schema_migrations
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -16,6 +17,9 @@ def migrate_database():
         
         # Create all tables
         Base.metadata.create_all(bind=engine)
+        # Columns and indexes of tables that already existed
+        applied = schema_migrations.upgrade(engine)
+        logger.info(f"✓ Schema migrations applied: {applied or 'none (up to date)'}")
         
         logger.info("✓ Database migration completed successfully")
         logger.info("✓ Created tables: users, user_activities")
@@ -0,0 +1,16 @@
+"""
+Superseded by schema_migrations.py (migration 2, add_history_score_columns,
+adds original_overall / optimized_overall; backfill_history_scores fills them).
+Kept so existing instructions keep working: runs every pending migration and the backfill.
+Run from backend/: PYTHONPATH=. python migrations/add_history_score_columns.py
+"""
+import schema_migrations
+
+
+def main():
+    print(f'Applied migrations: {schema_migrations.upgrade() or "none (up to date)"}')
+    print(f'Backfilled history scores for {schema_migrations.backfill_history_scores()} rows')
+    print('Migration complete')
+
+if __name__ == '__main__':
+    main()
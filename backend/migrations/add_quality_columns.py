@@ -1,37 +1,13 @@
-from sqlalchemy import inspect, text
-from database import engine
-
-TABLE_NAME = 'quality_scores'
-
-def column_exists(inspector, table, column_name):
-    cols = [c['name'] for c in inspector.get_columns(table)]
-    return column_name in cols
+"""
+Superseded by schema_migrations.py (migration 1, add_quality_score_columns).
+Kept so existing instructions keep working: runs every pending migration.
+Run from backend/: PYTHONPATH=. python migrations/add_quality_columns.py
+"""
+import schema_migrations
 
 
 def main():
-    inspector = inspect(engine)
-    with engine.connect() as conn:
-        # completeness
-        if not column_exists(inspector, TABLE_NAME, 'completeness'):
-            print('Adding column: completeness')
-            conn.execute(text(f"ALTER TABLE {TABLE_NAME} ADD COLUMN completeness FLOAT DEFAULT 0.0"))
-        else:
-            print('Column completeness already exists')
-
-        # structure
-        if not column_exists(inspector, TABLE_NAME, 'structure'):
-            print('Adding column: structure')
-            conn.execute(text(f"ALTER TABLE {TABLE_NAME} ADD COLUMN structure FLOAT DEFAULT 0.0"))
-        else:
-            print('Column structure already exists')
-
-        # practicality
-        if not column_exists(inspector, TABLE_NAME, 'practicality'):
-            print('Adding column: practicality')
-            conn.execute(text(f"ALTER TABLE {TABLE_NAME} ADD COLUMN practicality FLOAT DEFAULT 0.0"))
-        else:
-            print('Column practicality already exists')
-
+    print(f'Applied migrations: {schema_migrations.upgrade() or "none (up to date)"}')
     print('Migration complete')
 
 if __name__ == '__main__':
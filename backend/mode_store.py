@@ -0,0 +1,40 @@
+from collections import OrderedDict
+import threading
+
+
+class ModeStore:
+    """
+    Working mode per user or session (what /set-mode used to keep process-global).
+
+    Keys are scope strings such as "user:<id>" or "session:<X-Session-ID>".
+    Bounded LRU so abandoned sessions do not accumulate; sync endpoints run in
+    the threadpool, hence the lock around the OrderedDict.
+    """
+
+    def __init__(self, default_mode: str, max_entries: int = 10000):
+        self.default_mode = default_mode
+        self.max_entries = max_entries
+        self._modes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, scope: str = None) -> str:
+        if scope is None:
+            return self.default_mode
+        with self._lock:
+            mode = self._modes.get(scope)
+            if mode is None:
+                return self.default_mode
+            self._modes.move_to_end(scope)
+            return mode
+
+    def set(self, scope: str, mode: str):
+        if scope is None:
+            return
+        with self._lock:
+            self._modes[scope] = mode
+            self._modes.move_to_end(scope)
+            while len(self._modes) > self.max_entries:
+                self._modes.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._modes)
@@ -0,0 +1,160 @@
+from datetime import datetime
+import asyncio
+import logging
+import random
+
+from sqlalchemy import select
+
+import database
+import models
+
+
+class BanditArm:
+    """Running totals for one (mode, model) arm"""
+
+    def __init__(self, pulls: int = 0, reward_sum: float = 0.0, improvement_sum: float = 0.0, latency_ms_sum: float = 0.0):
+        self.pulls = pulls
+        self.reward_sum = reward_sum
+        self.improvement_sum = improvement_sum
+        self.latency_ms_sum = latency_ms_sum
+
+    @property
+    def mean_reward(self) -> float:
+        return self.reward_sum / self.pulls if self.pulls else 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "pulls": self.pulls,
+            "mean_reward": round(self.mean_reward, 4),
+            "mean_improvement": round(self.improvement_sum / self.pulls, 2) if self.pulls else 0.0,
+            "mean_latency_ms": round(self.latency_ms_sum / self.pulls, 1) if self.pulls else 0.0,
+        }
+
+
+class ModelBandit:
+    """
+    Epsilon-greedy bandit choosing among candidate models per mode.
+
+    The reward of a Gemini call is the improvement percentage /optimize
+    computed for it divided by the call's latency in seconds (floored at
+    `min_latency_seconds`), i.e. score improvement per second. Every arm is
+    tried `min_pulls` times first; afterwards the best mean reward is picked,
+    except for a random arm with probability `epsilon`.
+
+    Arm totals live in memory and are written through to the
+    model_bandit_arms table, so learning survives restarts. Writes add the
+    outcome to the stored totals in SQL and read back the mode's arms, so
+    several workers share what each of them learns instead of overwriting it.
+    """
+
+    def __init__(self, candidates: dict, epsilon: float = 0.1, min_pulls: int = 3,
+                 min_latency_seconds: float = 0.5, persistent: bool = True, enabled: bool = True, seed: int = None):
+        self.candidates = {mode: list(model_names) for mode, model_names in candidates.items() if model_names}
+        self.epsilon = epsilon
+        self.min_pulls = min_pulls
+        self.min_latency_seconds = min_latency_seconds
+        self.persistent = persistent
+        self.enabled = enabled
+        self._random = random.Random(seed)
+        self._arms = {
+            (mode, model_name): BanditArm()
+            for mode, model_names in self.candidates.items()
+            for model_name in model_names
+        }
+        self._stats = {"selections": 0, "explorations": 0, "rewards": 0, "persistent_errors": 0}
+
+    def handles(self, mode: str) -> bool:
+        return self.enabled and mode in self.candidates
+
+    def select(self, mode: str) -> str:
+        """Model to use for the next request in this mode"""
+        arms = [(model_name, self._arms[(mode, model_name)]) for model_name in self.candidates[mode]]
+        self._stats["selections"] += 1
+
+        untried = [(model_name, arm) for model_name, arm in arms if arm.pulls < self.min_pulls]
+        if untried:
+            self._stats["explorations"] += 1
+            return min(untried, key=lambda item: item[1].pulls)[0]
+        if self._random.random() < self.epsilon:
+            self._stats["explorations"] += 1
+            return self._random.choice(arms)[0]
+        return max(arms, key=lambda item: item[1].mean_reward)[0]
+
+    async def record(self, mode: str, model_name: str, improvement_percentage: float, latency_ms: float):
+        """Feed back the outcome of one Gemini call; calls outside the candidate set are ignored"""
+        arm = self._arms.get((mode, model_name))
+        if arm is None or not self.enabled:
+            return
+        latency_seconds = max(self.min_latency_seconds, latency_ms / 1000)
+        reward = improvement_percentage / latency_seconds
+        arm.pulls += 1
+        arm.reward_sum += reward
+        arm.improvement_sum += improvement_percentage
+        arm.latency_ms_sum += latency_ms
+        self._stats["rewards"] += 1
+        if self.persistent:
+            stored = await asyncio.to_thread(self._store, mode, model_name, reward, improvement_percentage, latency_ms)
+            self._arms.update(stored)
+
+    def load(self):
+        """Restore arm totals from the database (called once at startup)"""
+        if not self.persistent:
+            return
+        db = database.SessionLocal()
+        try:
+            for row in db.query(models.ModelBanditArm).all():
+                if (row.mode, row.model) in self._arms:
+                    self._arms[(row.mode, row.model)] = BanditArm(
+                        row.pulls or 0, row.reward_sum or 0.0, row.improvement_sum or 0.0, row.latency_ms_sum or 0.0
+                    )
+        except Exception:
+            self._stats["persistent_errors"] += 1
+            logger = logging.getLogger(__name__)
+            logger.exception("Could not load model bandit state; starting fresh")
+        finally:
+            db.close()
+
+    def _store(self, mode: str, model_name: str, reward: float, improvement_percentage: float, latency_ms: float) -> dict:
+        """Add one outcome to the stored arm; returns the mode's stored arms (all workers' pulls)"""
+        table = models.ModelBanditArm.__table__
+        db = database.SessionLocal()
+        try:
+            conn = db.connection()
+            database.insert_if_missing(conn, table, dict(
+                mode=mode, model=model_name, pulls=0, reward_sum=0.0, improvement_sum=0.0, latency_ms_sum=0.0
+            ))
+            conn.execute(table.update().where(table.c.mode == mode, table.c.model == model_name).values(
+                pulls=table.c.pulls + 1,
+                reward_sum=table.c.reward_sum + reward,
+                improvement_sum=table.c.improvement_sum + improvement_percentage,
+                latency_ms_sum=table.c.latency_ms_sum + latency_ms,
+                updated_at=datetime.utcnow(),
+            ))
+            rows = conn.execute(select(table).where(table.c.mode == mode)).all()
+            db.commit()
+        except Exception:
+            db.rollback()
+            self._stats["persistent_errors"] += 1
+            logger = logging.getLogger(__name__)
+            logger.exception("Model bandit state write failed")
+            return {}
+        finally:
+            db.close()
+        return {
+            (row.mode, row.model): BanditArm(row.pulls or 0, row.reward_sum or 0.0, row.improvement_sum or 0.0, row.latency_ms_sum or 0.0)
+            for row in rows
+            if (row.mode, row.model) in self._arms
+        }
+
+    def get_stats(self) -> dict:
+        """Arm statistics per mode for the admin endpoint"""
+        arms = {}
+        for (mode, model_name), arm in self._arms.items():
+            arms.setdefault(mode, {})[model_name] = arm.to_dict()
+        return {
+            "enabled": self.enabled,
+            "epsilon": self.epsilon,
+            "min_pulls": self.min_pulls,
+            **self._stats,
+            "arms": arms,
+        }
@@ -0,0 +1,93 @@
+from dataclasses import dataclass
+import logging
+
+
+@dataclass(frozen=True)
+class ModelRoute:
+    """
+    Routing decision for one request: the resolved mode and the Gemini model serving it.
+
+    Built per request and passed down the call chain instead of being stored
+    on the shared GeminiService, so concurrent requests cannot see each
+    other's model. `strategy` says what picked it ('static', 'complexity' or
+    'bandit'); `tier` and `complexity` are set by the complexity router.
+    """
+
+    mode: str
+    model: str
+    strategy: str = "static"
+    tier: str = None
+    complexity: float = None
+
+
+class ComplexityRouter:
+    """
+    Picks the smallest model tier (mini < flash < pro) likely to handle a prompt.
+
+    The complexity score is built from the cheap features the quality scorer
+    already extracts (word count, technical terms, constraints, requirement
+    words, quantities). Scores up to `mini_max_score` go to mini, scores from
+    `pro_min_score` go to pro, everything else to flash. The router only ever
+    downgrades: a mode mapped to flash is never sent to pro.
+    """
+
+    TIERS = ("mini", "flash", "pro")
+
+    def __init__(self, tier_models: dict, mini_max_score: float = 3.0, pro_min_score: float = 12.0, enabled: bool = True):
+        self.tier_models = tier_models
+        self.mini_max_score = mini_max_score
+        self.pro_min_score = pro_min_score
+        self.enabled = enabled
+        self._tier_of_model = {model: tier for tier, model in tier_models.items()}
+        self._stats = {tier: 0 for tier in self.TIERS}
+        self._stats["unrouted"] = 0
+
+    @staticmethod
+    def complexity_score(features: dict) -> float:
+        return (
+            features["words"] / 25
+            + features["technical_terms"] * 1.0
+            + features["constraints"] * 1.0
+            + features["must_haves"] * 0.5
+            + features["quantitative_specs"] * 0.5
+        )
+
+    def tier_for_score(self, score: float) -> str:
+        if score <= self.mini_max_score:
+            return "mini"
+        if score >= self.pro_min_score:
+            return "pro"
+        return "flash"
+
+    def route(self, mode: str, mode_model: str, features: dict) -> ModelRoute:
+        """Route for a prompt whose mode is statically mapped to `mode_model`"""
+        mode_tier = self._tier_of_model.get(mode_model)
+        if not self.enabled or mode_tier is None:
+            # Models outside the tier table (e.g. Raptor overrides) are left alone
+            self._stats["unrouted"] += 1
+            return ModelRoute(mode=mode, model=mode_model)
+
+        score = round(self.complexity_score(features), 2)
+        wanted = self.tier_for_score(score)
+        tier = min(wanted, mode_tier, key=self.TIERS.index)
+        model = self.tier_models[tier]
+        self._stats[tier] += 1
+
+        logger = logging.getLogger(__name__)
+        logger.info(f"🧭 Routed '{mode}' prompt (complexity {score}, {features['words']} words) to {tier}: {model}")
+        return ModelRoute(mode=mode, model=model, strategy="complexity", tier=tier, complexity=score)
+
+    def capped(self, model_name: str, tier: str) -> str:
+        """`model_name` if it is at or below `tier`, else the tier's model (used for the fast leg of hedged races)"""
+        model_tier = self._tier_of_model.get(model_name)
+        if tier not in self.tier_models or (model_tier is not None and self.TIERS.index(model_tier) <= self.TIERS.index(tier)):
+            return model_name
+        return self.tier_models[tier]
+
+    def get_stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "mini_max_score": self.mini_max_score,
+            "pro_min_score": self.pro_min_score,
+            "routes": dict(self._stats),
+        }
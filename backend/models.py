@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, Float, DateTime, JSON, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, Text, Float, DateTime, JSON, ForeignKey, Boolean, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from database import Base
@@ -36,6 +36,10 @@ class Prompt(Base):
     # Relationships
     user = relationship("User", back_populates="prompts")
 
+    __table_args__ = (
+        Index("ix_prompts_user_id_mode", "user_id", "mode"),
+    )
+
 class QualityScore(Base):
     __tablename__ = "quality_scores"
     
@@ -50,6 +54,10 @@ class QualityScore(Base):
     overall = Column(Float, default=0.0)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        Index("ix_quality_scores_prompt_id", "prompt_id"),
+    )
+
 class OptimizationHistory(Base):
     __tablename__ = "optimization_history"
     
@@ -61,11 +69,18 @@ class OptimizationHistory(Base):
     mode = Column(String(50))
     model = Column(String(50), default="gemini")
     improvement_percentage = Column(Float, default=0.0)
+    original_overall = Column(Float, nullable=True)  # overall quality score of original_prompt
+    optimized_overall = Column(Float, nullable=True)  # overall quality score of optimized_prompt
     created_at = Column(DateTime, default=datetime.utcnow)
     
     # Relationships
     user = relationship("User", back_populates="optimization_history")
 
+    __table_args__ = (
+        Index("ix_optimization_history_user_id_created_at", "user_id", "created_at"),
+        Index("ix_optimization_history_created_at_id", "created_at", "id"),  # /history keyset pages
+    )
+
 class UploadedDocument(Base):
     __tablename__ = "uploaded_documents"
     
@@ -101,3 +116,47 @@ class UserActivity(Base):
     
     # Relationships
     user = relationship("User", back_populates="activities")
+
+    __table_args__ = (
+        Index("ix_user_activities_user_id_created_at", "user_id", "created_at"),
+    )
+
+class OptimizationCacheEntry(Base):
+    __tablename__ = "optimization_cache"
+    
+    cache_key = Column(String(64), primary_key=True)  # sha256 of normalized prompt, mode, options and model
+    mode = Column(String(50))
+    model = Column(String(50))
+    optimized_prompt = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+class ModelBanditArm(Base):
+    __tablename__ = "model_bandit_arms"
+    
+    mode = Column(String(50), primary_key=True)
+    model = Column(String(50), primary_key=True)
+    pulls = Column(Integer, default=0)
+    reward_sum = Column(Float, default=0.0)  # sum of improvement-per-second rewards
+    improvement_sum = Column(Float, default=0.0)
+    latency_ms_sum = Column(Float, default=0.0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class UserStats(Base):
+    __tablename__ = "user_stats"
+    
+    # Rollup of a user's activities, prompts and history maintained by the write paths (see user_stats.py)
+    user_id = Column(String(50), ForeignKey("users.id"), primary_key=True)
+    activity_counts = Column(JSON, nullable=False, default=dict)  # activity_type -> count
+    daily_activity = Column(JSON, nullable=False, default=dict)  # "YYYY-MM-DD" -> count, recent days only
+    mode_counts = Column(JSON, nullable=False, default=dict)  # prompt mode -> count
+    improvement_sum = Column(Float, default=0.0)
+    improvement_count = Column(Integer, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class SchemaVersion(Base):
+    __tablename__ = "schema_version"
+    
+    version = Column(Integer, primary_key=True)  # one row per applied schema_migrations entry
+    name = Column(String(100), nullable=False)
+    applied_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,191 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import asyncio
+import hashlib
+import json
+import logging
+import time
+
+from sqlalchemy import delete
+
+import database
+import models
+
+OPTION_FLAGS = ("include_tests", "add_documentation", "performance_optimization", "security_features")
+
+
+class OptimizationCache:
+    """
+    Two-tier cache for optimized prompts.
+
+    Tier 1 is a bounded in-process LRU with a TTL, so repeated template and
+    demo prompts are answered without leaving the event loop. Tier 2 is the
+    `optimization_cache` table, which survives restarts and is shared by every
+    worker; rows found there are promoted back into the LRU. An expired row
+    is deleted when a lookup finds it, and all expired rows are purged (via the
+    expires_at index) on a write at most every `purge_interval_seconds`.
+    """
+
+    def __init__(self, max_entries: int = 512, ttl_seconds: int = 86400, persistent: bool = True,
+                 purge_interval_seconds: int = 3600, enabled: bool = True):
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.persistent = persistent
+        self.purge_interval_seconds = purge_interval_seconds
+        self._last_purge = time.time()
+        self._entries = OrderedDict()  # key -> (expires_at epoch seconds, optimized prompt)
+        self._stats = {
+            "memory_hits": 0,
+            "persistent_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "purged": 0,
+            "persistent_errors": 0,
+        }
+
+    @staticmethod
+    def make_key(prompt: str, mode: str, options: dict, model: str) -> str:
+        """Cache key from the whitespace-normalized prompt, resolved mode, option flags and model"""
+        payload = {
+            "prompt": " ".join(prompt.split()),
+            "mode": mode,
+            "options": {flag: bool((options or {}).get(flag, False)) for flag in OPTION_FLAGS},
+            "model": model,
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, value: str, expires_at: float):
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def get_memory(self, key: str):
+        """Return the in-memory value for key, or None if absent or expired"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            self._stats["expirations"] += 1
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def get(self, key: str):
+        """Look the key up in memory, then in the persistent table"""
+        if not self.enabled:
+            return None
+
+        value = self.get_memory(key)
+        if value is not None:
+            self._stats["memory_hits"] += 1
+            return value
+
+        if self.persistent:
+            row = await asyncio.to_thread(self._load, key)
+            if row is not None:
+                value, expires_at = row
+                self._remember(key, value, expires_at)
+                self._stats["persistent_hits"] += 1
+                return value
+
+        self._stats["misses"] += 1
+        return None
+
+    async def put(self, key: str, value: str, mode: str = None, model: str = None):
+        """Store a value in both tiers"""
+        if not self.enabled:
+            return
+        expires_at = time.time() + self.ttl_seconds
+        self._remember(key, value, expires_at)
+        self._stats["stores"] += 1
+        if self.persistent:
+            await asyncio.to_thread(self._store, key, value, mode, model, expires_at)
+
+    def clear(self):
+        """Drop the in-memory tier (the persistent table is left alone)"""
+        self._entries.clear()
+
+    def _load(self, key: str):
+        db = database.SessionLocal()
+        try:
+            entry = db.get(models.OptimizationCacheEntry, key)
+            if entry is None:
+                return None
+            if entry.expires_at <= datetime.utcnow():
+                self._stats["expirations"] += 1
+                db.delete(entry)
+                db.commit()
+                return None
+            remaining = (entry.expires_at - datetime.utcnow()).total_seconds()
+            return entry.optimized_prompt, time.time() + remaining
+        except Exception:
+            db.rollback()
+            self._stats["persistent_errors"] += 1
+            logger = logging.getLogger(__name__)
+            logger.exception("Optimization cache lookup failed; treating as a miss")
+            return None
+        finally:
+            db.close()
+
+    def _store(self, key: str, value: str, mode: str, model: str, expires_at: float):
+        db = database.SessionLocal()
+        try:
+            db.merge(models.OptimizationCacheEntry(
+                cache_key=key,
+                mode=mode,
+                model=model,
+                optimized_prompt=value,
+                created_at=datetime.utcnow(),
+                expires_at=datetime.utcnow() + timedelta(seconds=max(0, expires_at - time.time())),
+            ))
+            db.commit()
+        except Exception:
+            db.rollback()
+            self._stats["persistent_errors"] += 1
+            logger = logging.getLogger(__name__)
+            logger.exception("Optimization cache write failed")
+        finally:
+            db.close()
+        if time.time() - self._last_purge >= self.purge_interval_seconds:
+            self.purge_expired()
+
+    def purge_expired(self) -> int:
+        """Delete every expired row of the persistent table; returns the rows deleted"""
+        self._last_purge = time.time()
+        table = models.OptimizationCacheEntry.__table__
+        db = database.SessionLocal()
+        try:
+            deleted = db.execute(delete(table).where(table.c.expires_at < datetime.utcnow())).rowcount
+            db.commit()
+        except Exception:
+            db.rollback()
+            self._stats["persistent_errors"] += 1
+            logger = logging.getLogger(__name__)
+            logger.exception("Optimization cache purge failed")
+            return 0
+        finally:
+            db.close()
+        self._stats["purged"] += deleted
+        return deleted
+
+    def get_stats(self) -> dict:
+        """Hit/miss/eviction counters for the metrics endpoint"""
+        hits = self._stats["memory_hits"] + self._stats["persistent_hits"]
+        lookups = hits + self._stats["misses"]
+        return {
+            "enabled": self.enabled,
+            "persistent": self.persistent,
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            **self._stats,
+            "hits": hits,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,95 @@
+import database
+import models
+import user_stats
+
+
+class OptimizationUnitOfWork:
+    """
+    The rows of one or more optimizations (Prompt, QualityScore and
+    OptimizationHistory), collected in memory and written in a single
+    transaction by commit(), together with the user's analytics rollup.
+    Activity rows go through the ActivitySink.
+
+    A session is only opened inside commit(), so no connection or row lock
+    is held while Gemini is generating; build the unit after the Gemini call
+    and commit it from the threadpool.
+    """
+
+    def __init__(self, user_id=None):
+        self.user_id = user_id
+        self._entries = []
+
+    def add(self, request, optimized_prompt: str, model_name: str, scores: dict, original_scores: dict,
+            improvement_percentage: float):
+        """Queue one optimization of request (an OptimizePromptRequest) with its already computed scores"""
+        self._entries.append((request, optimized_prompt, model_name, scores, original_scores, improvement_percentage))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def commit(self) -> list:
+        """
+        Insert every queued row and commit once. Returns one
+        {"prompt_id", "history_id", "scores", "improvement_percentage"} dict per
+        add() call, in order. Nothing is written if any insert fails.
+        """
+        if not self._entries:
+            return []
+
+        db = database.SessionLocal()
+        try:
+            prompt_records = [
+                models.Prompt(user_id=self.user_id, original=request.original_prompt, optimized=optimized_prompt, mode=request.mode)
+                for request, optimized_prompt, *_ in self._entries
+            ]
+            db.add_all(prompt_records)
+            db.flush()  # assigns prompt ids
+
+            history_records = []
+            for (request, optimized_prompt, model_name, scores, original_scores, improvement_percentage), prompt_record in zip(self._entries, prompt_records):
+                db.add(models.QualityScore(
+                    prompt_id=prompt_record.id,
+                    clarity=scores["clarity"],
+                    specificity=scores["specificity"],
+                    completeness=scores["completeness"],
+                    technical=scores["technical"],
+                    structure=scores["structure"],
+                    practicality=scores["practicality"],
+                    overall=scores["overall"]
+                ))
+                history_records.append(models.OptimizationHistory(
+                    user_id=self.user_id,
+                    prompt_id=prompt_record.id,
+                    original_prompt=request.original_prompt,
+                    optimized_prompt=optimized_prompt,
+                    mode=request.mode,
+                    model=model_name,
+                    improvement_percentage=improvement_percentage,
+                    original_overall=original_scores["overall"],
+                    optimized_overall=scores["overall"]
+                ))
+            db.add_all(history_records)
+            db.flush()  # assigns history ids; read them now so commit() does not expire and reload every row
+
+            saved = [
+                {
+                    "prompt_id": prompt_record.id,
+                    "history_id": history_record.id,
+                    "scores": entry[3],
+                    "improvement_percentage": entry[5]
+                }
+                for entry, prompt_record, history_record in zip(self._entries, prompt_records, history_records)
+            ]
+            if self.user_id:
+                delta = user_stats.StatsDelta()
+                for request, _, _, _, _, improvement_percentage in self._entries:
+                    delta.add_optimization(request.mode, improvement_percentage)
+                user_stats.apply_deltas(db.connection(), {self.user_id: delta})
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        return saved
@@ -0,0 +1,46 @@
+from datetime import datetime
+import base64
+import json
+
+from sqlalchemy import and_, tuple_
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """Opaque cursor for the position just after a row (newest-first order)"""
+    payload = json.dumps([created_at.isoformat(), row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    """(created_at, id) from encode_cursor(); ValueError for anything else"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (TypeError, ValueError, UnicodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+
+def keyset_page(query, model, limit: int, cursor: str = None):
+    """
+    One page of `query` in newest-first (created_at, id) order.
+
+    Continues strictly after the cursor's row, so pages neither skip nor repeat
+    rows when new ones are inserted, and a deep page is an index range scan
+    just like the first one (no OFFSET). Returns (rows, next_cursor), where
+    next_cursor is None on the last page. `query` selects `model` (or columns
+    that include its created_at and id).
+    """
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        # The row-value comparison alone is exact; the plain bound lets planners that do not
+        # use row values for index ranges still seek straight to the cursor
+        query = query.filter(and_(
+            model.created_at <= created_at,
+            tuple_(model.created_at, model.id) < tuple_(created_at, row_id)
+        ))
+    rows = query.order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1].created_at, rows[-1].id)
@@ -0,0 +1,155 @@
+"""
+Offline performance harness
+
+Drives main.app in-process (httpx ASGI transport) against the fake Gemini
+backend, so the full pipeline - routing, caching, admission control, scoring
+and persistence - can be benchmarked without a server or an API key.
+Reports p50/p95/p99 latency and requests per second per endpoint.
+
+Usage:
+    python perf_harness.py --requests 200 --concurrency 20
+    python perf_harness.py --endpoints optimize,optimize-stream --latency lognormal:1.2:0.6 --error-rate 0.02
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+
+SAMPLE_PROMPTS = [
+    ("Build a todo app with user accounts and reminders", "ai-dev"),
+    ("A red fox in a snowy forest at dawn", "image-generation"),
+    ("Write a blog post about remote work productivity", "content-writing"),
+    ("Analyze quarterly churn for a SaaS product", "business-analysis"),
+    ("Train a support chatbot for an online bookstore", "chatbot-training"),
+    ("Literature review on transformer efficiency", "research-academic"),
+]
+
+
+def _prompt(i: int, distinct: int) -> tuple:
+    prompt, mode = SAMPLE_PROMPTS[i % len(SAMPLE_PROMPTS)]
+    variant = i % distinct if distinct else i
+    return f"{prompt} (variant {variant})", mode
+
+
+def _optimize_payload(i: int, distinct: int) -> dict:
+    prompt, mode = _prompt(i, distinct)
+    return {"original_prompt": prompt, "mode": mode}
+
+
+ENDPOINTS = {
+    "optimize": ("POST", "/optimize", _optimize_payload),
+    "optimize-stream": ("POST", "/optimize/stream", _optimize_payload),
+    "optimize-batch": ("POST", "/optimize/batch", lambda i, distinct: {
+        "items": [_optimize_payload(i * 10 + j, distinct) for j in range(10)], "concurrency": 10
+    }),
+    "analyze": ("POST", "/analyze", lambda i, distinct: {"prompt": _prompt(i, distinct)[0]}),
+    "quality-score": ("POST", "/quality-score", lambda i, distinct: {"prompt": _prompt(i, distinct)[0]}),
+    "health": ("GET", "/health", None),
+}
+
+
+def configure_environment(args):
+    """Must run before main (and config) are imported"""
+    os.environ["GEMINI_BACKEND"] = "fake"
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ["GEMINI_FAKE_LATENCY"] = args.latency
+    os.environ["GEMINI_FAKE_ERROR_RATE"] = str(args.error_rate)
+    os.environ["GEMINI_FAKE_BURST_RATE"] = str(args.burst_rate)
+    os.environ["GEMINI_FAKE_SEED"] = str(args.seed)
+    os.environ["OPTIMIZATION_CACHE_ENABLED"] = str(args.cache)
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+async def run_endpoint(client, name: str, requests: int, concurrency: int, distinct: int) -> dict:
+    method, path, payload = ENDPOINTS[name]
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async def one(i: int):
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.request(method, path, json=payload(i, distinct) if payload else None)
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code >= 400 or "event: error" in response.text:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*[one(i) for i in range(requests)])
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "endpoint": name,
+        "requests": requests,
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 50), 1),
+        "p95_ms": round(percentile(latencies, 95), 1),
+        "p99_ms": round(percentile(latencies, 99), 1),
+        "rps": round(requests / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+async def run(args) -> list:
+    import httpx
+    import database
+    import main
+
+    database.Base.metadata.create_all(bind=database.engine)
+    transport = httpx.ASGITransport(app=main.app)
+    results = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://harness", timeout=None) as client:
+        for name in args.endpoints.split(","):
+            results.append(await run_endpoint(client, name.strip(), args.requests, args.concurrency, args.distinct))
+    results.append({"endpoint": "_service_metrics", **main.gemini_service.get_metrics()})
+    return results
+
+
+def print_report(results: list):
+    print("\n" + "="*80)
+    print(f"  {'endpoint':<18}{'requests':>9}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}")
+    print("="*80)
+    for row in results:
+        if row["endpoint"].startswith("_"):
+            continue
+        print(f"  {row['endpoint']:<18}{row['requests']:>9}{row['errors']:>8}"
+              f"{row['p50_ms']:>10}{row['p95_ms']:>10}{row['p99_ms']:>10}{row['rps']:>10}")
+    print("="*80 + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline latency/throughput harness for the PromptEngine backend")
+    parser.add_argument("--endpoints", default="optimize,optimize-stream,optimize-batch,analyze,quality-score,health",
+                        help=f"comma-separated subset of: {', '.join(ENDPOINTS)}")
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=20, help="requests in flight per endpoint")
+    parser.add_argument("--distinct", type=int, default=0, help="distinct prompts to cycle through (0 = all unique)")
+    parser.add_argument("--latency", default="lognormal:0.8:0.5", help="fake Gemini latency spec, see fake_gemini.py")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--burst-rate", type=float, default=0.0, help="chance per call that a 429 burst starts")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--cache", action=argparse.BooleanOptionalAction, default=True, help="enable the optimization cache")
+    parser.add_argument("--database-url", default="sqlite:///./perf_harness.db")
+    parser.add_argument("--json", dest="json_path", help="also write the results to this file")
+    args = parser.parse_args()
+
+    configure_environment(args)
+    results = asyncio.run(run(args))
+    print_report(results)
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(results, f, indent=2, default=str)
+        print(f"✅ Results written to {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+from dataclasses import dataclass
+from types import MappingProxyType
+
+from quality_scoring import extract_features, score_features, tokenize
+
+# /analyze extras on top of the quality scores
+ANALYZE_VERBS = frozenset(["create", "build", "implement", "design", "develop", "optimize", "analyze", "generate"])
+ELEMENT_KEYWORDS = [
+    ('🔄 Function', ('function', 'method')),
+    ('🔌 API', ('api', 'endpoint')),
+    ('🗄️ Database', ('database', 'schema')),
+    ('🧪 Testing', ('test', 'validate')),
+    ('🔒 Security', ('security', 'authenticate')),
+    ('⚡ Performance', ('performance', 'optimize')),
+]
+
+# Substrings that vote for a mode when the mode is auto-detected
+IMAGE_MODE_KEYWORDS = ['image', 'picture', 'photo', 'visual', 'design', 'artwork', 'illustration',
+                       'drawing', 'render', 'graphic', 'logo', 'icon', 'banner', 'poster']
+DEV_MODE_KEYWORDS = ['code', 'function', 'class', 'method', 'api', 'database', 'algorithm',
+                     'programming', 'develop', 'implement', 'build', 'create app', 'software']
+
+
+def detect_elements(lowered: str) -> tuple:
+    """Element labels whose keywords occur anywhere in the lower-cased text (substring match)"""
+    return tuple(label for label, keywords in ELEMENT_KEYWORDS if any(keyword in lowered for keyword in keywords))
+
+
+def count_analyze_verbs(tokens: list) -> int:
+    """Whole-word, case-insensitive occurrences of ANALYZE_VERBS in tokenize() output"""
+    return sum(1 for _, token in tokens if token in ANALYZE_VERBS)
+
+
+def readability(words: int, sentences: int) -> str:
+    avg_words_per_sentence = words / max(sentences, 1)
+    return 'Complex' if avg_words_per_sentence > 20 else 'Moderate' if avg_words_per_sentence > 15 else 'Clear'
+
+
+@dataclass(frozen=True)
+class PromptFeatures:
+    """
+    Everything the API derives from a prompt's text, extracted in one pass.
+
+    `counts` is the quality_scoring feature vector (the score inputs) and
+    `scores` the quality scores computed from it; both are read-only views,
+    so one record can be memoized and shared by /analyze, /quality-score,
+    /optimize and mode auto-detection. The text and its tokens are not
+    kept, which keeps memoized records small.
+    """
+
+    counts: MappingProxyType
+    token_count: int
+    action_verbs: int
+    elements: tuple
+    readability: str
+    scores: MappingProxyType
+    image_keywords: int = 0
+    dev_keywords: int = 0
+
+    @classmethod
+    def build(cls, counts: dict, token_count: int, action_verbs: int, elements, image_keywords: int = 0,
+              dev_keywords: int = 0) -> "PromptFeatures":
+        scores = score_features(counts)
+        scores["metadata"] = MappingProxyType(scores["metadata"])
+        return cls(
+            counts=MappingProxyType(dict(counts)),
+            token_count=token_count,
+            action_verbs=action_verbs,
+            elements=tuple(elements),
+            readability=readability(counts["words"], counts["sentences"]),
+            scores=MappingProxyType(scores),
+            image_keywords=image_keywords,
+            dev_keywords=dev_keywords,
+        )
+
+    @property
+    def word_count(self) -> int:
+        return self.counts["words"]
+
+    def score_dict(self) -> dict:
+        """A mutable copy of the quality scores (the generate_quality_scores format)"""
+        return {**self.scores, "metadata": dict(self.scores["metadata"])}
+
+    def analysis(self) -> dict:
+        """The /analyze payload"""
+        return {
+            "word_count": self.word_count,
+            "readability": self.readability,
+            "action_verbs": self.action_verbs,
+            "elements": list(self.elements),
+            "scores": self.score_dict(),
+        }
+
+
+def extract_prompt_features(prompt: str) -> PromptFeatures:
+    """Analyze a prompt once: one lower() and one tokenizer pass feed every derived value"""
+    lowered = prompt.lower()
+    tokens = tokenize(prompt, lowered)
+    return PromptFeatures.build(
+        extract_features(prompt, tokens),
+        len(tokens),
+        count_analyze_verbs(tokens),
+        detect_elements(lowered),
+        image_keywords=sum(1 for keyword in IMAGE_MODE_KEYWORDS if keyword in lowered),
+        dev_keywords=sum(1 for keyword in DEV_MODE_KEYWORDS if keyword in lowered),
+    )
@@ -0,0 +1,301 @@
+import itertools
+import operator
+import re
+
+import numpy as np
+
+# Every lexicon the quality score counts, in the alternation order of the original
+# per-dimension regexes. Entries are matched case-insensitively as whole words;
+# multi-word entries need exactly the spacing/punctuation written here.
+LEXICONS = {
+    "action_verbs": [
+        "create", "build", "implement", "design", "develop", "optimize", "analyze", "generate", "process",
+        "handle", "manage", "define", "structure", "architect", "deploy", "monitor", "test", "validate",
+        "verify", "ensure", "provide", "deliver", "produce", "make", "establish",
+    ],
+    "specific_terms": [
+        "specific", "detailed", "comprehensive", "professional", "optimized", "efficient", "scalable", "robust",
+        "secure", "reliable", "production-ready", "enterprise-grade", "high-performance",
+    ],
+    "technical_terms": [
+        "api", "database", "function", "error", "security", "performance", "architecture", "schema", "algorithm",
+        "framework", "library", "module", "component", "interface", "protocol", "encryption", "authentication",
+        "cache", "query", "transaction",
+    ],
+    "must_haves": ["must", "should", "require", "mandatory", "essential", "critical"],
+    "nice_to_haves": ["could", "might", "consider", "optionally", "may", "nice-to-have", "future"],
+    "constraints": ["limit", "constraint", "restrict", "avoid", "prevent", "maximum", "minimum", "threshold"],
+    "context_indicators": [
+        "background", "context", "currently", "existing", "problem", "challenge", "goal", "objective", "use case",
+        "scenario", "situation", "environment",
+    ],
+    "examples_provided": ["example", "such as", "for instance", "like", "e.g.", "i.e."],
+    "domain_terms": [
+        "user", "customer", "business", "enterprise", "industry", "market", "stakeholder", "requirement",
+        "workflow", "process",
+    ],
+    "comparison_terms": ["better than", "faster than", "more than", "less than", "at least", "up to", "within"],
+    "boundary_definitions": ["between", "from", "to", "range", "scope", "include", "exclude"],
+    "deliverable_terms": [
+        "output", "deliverable", "result", "artifact", "document", "code", "design", "report", "dashboard",
+        "visualization", "specification",
+    ],
+    "format_specs": ["format", "structure", "template", "schema", "layout", "style", "type"],
+    "quality_criteria": [
+        "quality", "standard", "best practice", "professional", "production", "complete", "comprehensive",
+    ],
+}
+
+# Units that turn a number into a quantitative spec ("100 users", "50ms", "2 GB", "99%x")
+QUANTITY_UNITS = frozenset([
+    "user", "users", "item", "items", "record", "records", "request", "requests", "ms",
+    "second", "seconds", "gb", "mb",
+])
+
+# One token per word (\w run) or punctuation character, with the whitespace before it
+TOKEN_PATTERN = re.compile(r'(\s*)(\w+|[^\w\s])')
+LEADING_DIGITS = re.compile(r'\d+')
+FEATURE_NAMES = tuple(LEXICONS) + (
+    "words", "sentences", "paragraphs", "quantitative_specs", "brackets", "bullets", "numbered_items",
+)
+FEATURE_COLUMNS = {name: column for column, name in enumerate(FEATURE_NAMES)}
+
+# Weights of the nine dimensions in the overall score
+DIMENSION_WEIGHTS = {
+    "clarity": 0.15,
+    "specificity": 0.15,
+    "completeness": 0.10,
+    "technical": 0.10,
+    "structure": 0.08,
+    "practicality": 0.10,
+    "context_richness": 0.12,
+    "constraint_clarity": 0.10,
+    "output_specification": 0.10,
+}
+
+BRACKETS = frozenset('{}()[]')
+BULLETS = frozenset('-•*')
+
+
+def _compile_lexicons():
+    """
+    Index every lexicon entry by its first token.
+
+    Each entry becomes a tuple of (whitespace, token) pairs in the same shape
+    the tokenizer produces, so matching a phrase is a tuple comparison against
+    the token stream. The whitespace before the first token is not part of
+    the entry (None), and entries ending in punctuation ("e.g.") carry the
+    trailing word boundary of the original regex as a flag.
+    """
+    index = {}
+    words = set(QUANTITY_UNITS)
+    for feature, entries in LEXICONS.items():
+        for entry in entries:
+            pairs = TOKEN_PATTERN.findall(entry)
+            words.update(token for _, token in pairs if token[0].isalnum())
+            phrase = ((None, pairs[0][1]),) + tuple(pairs[1:])
+            needs_word_after = not pairs[-1][1][0].isalnum()
+            index.setdefault(pairs[0][1], []).append((feature, phrase, needs_word_after))
+    # re.IGNORECASE folds a few non-ASCII letters onto ASCII ones (e.g. 'ſ' matches 's',
+    # the Kelvin sign matches 'k'); the fold pattern maps such tokens to the lexicon word
+    ordered = sorted(words)
+    fold = re.compile('|'.join(f'({re.escape(word)})' for word in ordered), re.I)
+    return index, ordered, fold
+
+
+LEXICON_INDEX, _FOLD_WORDS, _FOLD_PATTERN = _compile_lexicons()
+
+
+def _fold(token: str) -> str:
+    """Case-fold a token the way re.IGNORECASE compares it against the lexicons"""
+    if token.isascii():
+        return token.lower()
+    match = _FOLD_PATTERN.fullmatch(token)
+    return _FOLD_WORDS[match.lastindex - 1] if match else token
+
+
+def is_word(token: str) -> bool:
+    return token[0].isalnum() or token[0] == '_'
+
+
+def tokenize(prompt: str, lowered: str = None) -> list:
+    """
+    (whitespace, case-folded token) pairs covering every non-whitespace character of the prompt.
+    Pass `lowered` when prompt.lower() has already been computed.
+    """
+    if prompt.isascii():
+        return TOKEN_PATTERN.findall(prompt.lower() if lowered is None else lowered)
+    return [(space, _fold(token)) for space, token in TOKEN_PATTERN.findall(prompt)]
+
+
+def extract_features(prompt: str, tokens: list = None) -> dict:
+    """
+    Feature vector of a prompt in a single pass over its tokens.
+
+    Counts match what the original per-feature regexes (and the split()-based
+    word/sentence/paragraph counts) produced: lexicon entries are whole-word,
+    case-insensitive and non-overlapping within a lexicon. Pass `tokens` when
+    the prompt has already been tokenized.
+    """
+    if tokens is None:
+        tokens = tokenize(prompt)
+    count = len(tokens)
+    features = dict.fromkeys(LEXICONS, 0)
+    # Token index before which a lexicon may not match again (regex matches don't overlap)
+    resume_at = dict.fromkeys(LEXICONS, 0)
+    words = sentences = paragraphs = 0
+    quantitative_specs = brackets = bullets = numbered_items = 0
+    previous = "."
+    ends_with_space = prompt[-1:].isspace()
+
+    for i, (space, token) in enumerate(tokens):
+        # split() words, '.'-separated sentences and '\n\n'-separated paragraphs with content
+        if space or i == 0:
+            words += 1
+        if token != "." and previous == ".":
+            sentences += 1
+        if i == 0 or "\n\n" in space:
+            paragraphs += 1
+
+        entries = LEXICON_INDEX.get(token)
+        if entries is not None:
+            for feature, phrase, needs_word_after in entries:
+                if resume_at[feature] > i:
+                    continue
+                end = i + len(phrase)
+                if end > count:
+                    continue
+                if len(phrase) > 1 and tuple(tokens[i + 1:end]) != phrase[1:]:
+                    continue
+                if needs_word_after and not (end < count and tokens[end][0] == "" and is_word(tokens[end][1])):
+                    continue
+                features[feature] += 1
+                resume_at[feature] = end
+
+        if len(token) == 1 and not is_word(token):
+            if token in BRACKETS:
+                brackets += 1
+            elif token in BULLETS:
+                at_line_start = (i == 0 and not space) or space.endswith("\n")
+                space_after = tokens[i + 1][0] != "" if i + 1 < count else ends_with_space
+                if at_line_start and space_after:
+                    bullets += 1
+            elif token == "." and not space and i > 0 and previous[-1].isdecimal():
+                numbered_items += 1
+        elif token[0].isdecimal():
+            digits = LEADING_DIGITS.match(token).end()
+            if digits < len(token):
+                # Unit glued to the number: "50ms"
+                if _fold(token[digits:]) in QUANTITY_UNITS:
+                    quantitative_specs += 1
+            elif i + 1 < count:
+                following = tokens[i + 1][1]
+                if following in QUANTITY_UNITS:
+                    quantitative_specs += 1
+                elif following == "%" and i + 2 < count and tokens[i + 2][0] == "" and is_word(tokens[i + 2][1]):
+                    # The original pattern ends in \b, so a percent sign only counts before a word character
+                    quantitative_specs += 1
+        previous = token
+
+    features.update({
+        "words": words,
+        "sentences": sentences,
+        "paragraphs": paragraphs,
+        "quantitative_specs": quantitative_specs,
+        "brackets": brackets,
+        "bullets": bullets,
+        "numbered_items": numbered_items,
+    })
+    return features
+
+
+def _dimensions(feature, minimum) -> dict:
+    """
+    The nine quality dimensions and the weighted overall score.
+
+    `feature(name)` returns a feature count - a number for one prompt or a
+    column for many - and `minimum` is min or numpy.minimum, so single and
+    batch scoring share the exact same arithmetic.
+    """
+    words = feature("words")
+    paragraphs = feature("paragraphs")
+    action_verbs = feature("action_verbs")
+    technical_terms = feature("technical_terms")
+    must_haves = feature("must_haves")
+    constraints = feature("constraints")
+
+    dimensions = {
+        "clarity": minimum(10, (action_verbs * 1.5) + ((feature("sentences") > 0) * 3) + minimum(2, words / 50)),
+        "specificity": minimum(10, (feature("specific_terms") * 1.2) + (technical_terms * 0.8) + (constraints * 0.5)),
+        "completeness": minimum(10, (must_haves * 0.8) + (feature("nice_to_haves") * 0.4) + (paragraphs * 0.5) + minimum(3, words / 100)),
+        "technical": minimum(10, (technical_terms * 1.5) + (feature("brackets") * 0.3)),
+        "structure": minimum(10, (paragraphs * 0.5) + (feature("bullets") * 0.5) + (feature("numbered_items") * 0.4)),
+        "practicality": minimum(10, (action_verbs * 1.0) + (constraints * 0.6) + (must_haves * 0.5)),
+        "context_richness": minimum(10, (feature("context_indicators") * 1.2) + (feature("examples_provided") * 1.5) + (feature("domain_terms") * 0.8)),
+        "constraint_clarity": minimum(10, (constraints * 1.0) + (feature("quantitative_specs") * 1.5) + (feature("comparison_terms") * 1.2) + (feature("boundary_definitions") * 0.8)),
+        "output_specification": minimum(10, (feature("deliverable_terms") * 1.3) + (feature("format_specs") * 1.0) + (feature("quality_criteria") * 0.9)),
+    }
+    overall = 0
+    for name, weight in DIMENSION_WEIGHTS.items():
+        overall = overall + dimensions[name] * weight
+    dimensions["overall"] = overall
+    return dimensions
+
+
+def _metadata(feature) -> dict:
+    return {
+        "word_count": feature("words"),
+        "sentence_count": feature("sentences"),
+        "paragraph_count": feature("paragraphs"),
+        "action_verbs": feature("action_verbs"),
+        "specific_terms": feature("specific_terms"),
+        "technical_terms": feature("technical_terms"),
+        "requirements_indicators": feature("must_haves") + feature("nice_to_haves"),
+        "context_indicators": feature("context_indicators"),
+        "quantitative_specs": feature("quantitative_specs"),
+        "deliverable_terms": feature("deliverable_terms"),
+    }
+
+
+def score_features(features: dict) -> dict:
+    """Quality dimensions (0-10), overall score and metadata from a feature vector"""
+    scores = {name: round(value, 2) for name, value in _dimensions(features.__getitem__, min).items()}
+    scores["metadata"] = _metadata(features.__getitem__)
+    return scores
+
+
+def score_prompt(prompt: str) -> dict:
+    """Quality scores for a prompt (what GeminiService.generate_quality_scores returns)"""
+    return score_features(extract_features(prompt))
+
+
+def feature_matrix(prompts) -> np.ndarray:
+    """Feature vectors of many prompts as an int64 matrix with FEATURE_NAMES as columns"""
+    prompts = list(prompts)
+    row = operator.itemgetter(*FEATURE_NAMES)
+    values = itertools.chain.from_iterable(row(extract_features(prompt)) for prompt in prompts)
+    matrix = np.fromiter(values, dtype=np.int64, count=len(prompts) * len(FEATURE_NAMES))
+    return matrix.reshape(len(prompts), len(FEATURE_NAMES))
+
+
+def score_matrix(matrix: np.ndarray) -> dict:
+    """Unrounded dimension and overall score columns (float64 arrays) for a feature matrix"""
+    return _dimensions(lambda name: matrix[:, FEATURE_COLUMNS[name]], np.minimum)
+
+
+def score_many(prompts) -> list:
+    """
+    Quality scores for many prompts; element i equals score_prompt(prompts[i]).
+
+    Features are extracted into one matrix and every dimension is computed
+    column-wise with NumPy. Rounding uses Python's round() on the final
+    columns so results are identical to the single-prompt path.
+    """
+    matrix = feature_matrix(prompts)
+    scores = {name: [round(value, 2) for value in values.tolist()] for name, values in score_matrix(matrix).items()}
+    metadata = {name: values.tolist() for name, values in _metadata(lambda name: matrix[:, FEATURE_COLUMNS[name]]).items()}
+    score_names, metadata_names = list(scores), list(metadata)
+    return [
+        {**dict(zip(score_names, score_row)), "metadata": dict(zip(metadata_names, metadata_row))}
+        for score_row, metadata_row in zip(zip(*scores.values()), zip(*metadata.values()))
+    ]
@@ -0,0 +1,47 @@
+import asyncio
+
+
+class RequestCoalescer:
+    """
+    Single-flight request coalescing.
+
+    Concurrent callers that ask for the same key share one in-flight task and
+    all receive its result (or its exception). The work runs as its own task,
+    so a caller that disconnects does not cancel it for the others. Shared
+    results must be treated as read-only.
+    """
+
+    def __init__(self):
+        self._inflight = {}
+        self._stats = {
+            "executed": 0,
+            "collapsed": 0,
+        }
+
+    async def run(self, key, factory):
+        """Await factory() for this key, joining an identical in-flight call if there is one"""
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done, key=key: self._finish(key, done))
+            self._stats["executed"] += 1
+        else:
+            self._stats["collapsed"] += 1
+        return await asyncio.shield(task)
+
+    def _finish(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception as retrieved even if every waiter went away
+        if not task.cancelled():
+            task.exception()
+
+    def get_stats(self) -> dict:
+        """Counters for the metrics endpoint"""
+        total = self._stats["executed"] + self._stats["collapsed"]
+        return {
+            **self._stats,
+            "in_flight": len(self._inflight),
+            "collapse_rate": round(self._stats["collapsed"] / total, 4) if total else 0.0,
+        }
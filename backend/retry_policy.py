@@ -0,0 +1,110 @@
+from google.api_core import exceptions as google_exceptions
+import asyncio
+import logging
+import random
+
+# Transient upstream failures worth another attempt; anything else (bad request,
+# permission denied, safety blocks, local queue full) fails straight through
+RETRYABLE_ERRORS = (
+    google_exceptions.ResourceExhausted,     # 429
+    google_exceptions.TooManyRequests,
+    google_exceptions.InternalServerError,   # 500
+    google_exceptions.ServiceUnavailable,    # 503
+    google_exceptions.GatewayTimeout,        # 504
+    google_exceptions.DeadlineExceeded,
+    ConnectionError,
+)
+
+
+class RetryBudget:
+    """
+    Process-wide cap on retries as a fraction of traffic.
+
+    Every first attempt deposits `ratio` tokens and every retry withdraws one,
+    so retries stay at or below `ratio` of calls over time. The balance is
+    capped at `capacity`, which is also the allowance for the first calls
+    after startup.
+    """
+
+    def __init__(self, ratio: float = 0.1, capacity: float = 10.0):
+        self.ratio = ratio
+        self.capacity = capacity
+        self.balance = capacity
+
+    def deposit(self):
+        self.balance = min(self.capacity, self.balance + self.ratio)
+
+    def withdraw(self) -> bool:
+        if self.balance < 1:
+            return False
+        self.balance -= 1
+        return True
+
+
+class RetryPolicy:
+    """
+    Retries for Gemini calls: exponential backoff with full jitter, limited
+    to `max_attempts` per call and by the shared RetryBudget.
+    """
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.25, max_delay: float = 4.0,
+                 budget: RetryBudget = None):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget or RetryBudget()
+        self._stats = {"calls": 0, "retries": 0, "recovered": 0, "non_retryable": 0, "budget_exhausted": 0, "gave_up": 0}
+
+    @staticmethod
+    def is_retryable(error: BaseException) -> bool:
+        return isinstance(error, RETRYABLE_ERRORS)
+
+    def backoff(self, retry: int) -> float:
+        """Full jitter: uniform between 0 and the capped exponential delay"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** retry)))
+
+    async def run(self, factory, state: dict = None):
+        """
+        Await `factory()` until it succeeds or retrying is not allowed.
+        The number of retries made is kept in state["retries"].
+        """
+        if state is None:
+            state = {}
+        state.setdefault("retries", 0)
+        self._stats["calls"] += 1
+        self.budget.deposit()
+        attempt = 0
+        while True:
+            try:
+                result = await factory()
+            except Exception as e:
+                attempt += 1
+                if not self.is_retryable(e):
+                    self._stats["non_retryable"] += 1
+                    raise
+                if attempt >= self.max_attempts:
+                    self._stats["gave_up"] += 1
+                    raise
+                if not self.budget.withdraw():
+                    self._stats["budget_exhausted"] += 1
+                    raise
+                delay = self.backoff(attempt - 1)
+                state["retries"] += 1
+                self._stats["retries"] += 1
+                logger = logging.getLogger(__name__)
+                logger.warning(f"🔁 Retrying Gemini call in {delay:.2f}s (retry {attempt} of {self.max_attempts - 1}): {e}")
+                await asyncio.sleep(delay)
+                continue
+            if attempt:
+                self._stats["recovered"] += 1
+            return result
+
+    def get_stats(self) -> dict:
+        calls = self._stats["calls"]
+        return {
+            "max_attempts": self.max_attempts,
+            **self._stats,
+            "retry_rate": round(self._stats["retries"] / calls, 4) if calls else 0.0,
+            "budget_ratio": self.budget.ratio,
+            "budget_balance": round(self.budget.balance, 2),
+        }
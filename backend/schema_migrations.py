@@ -0,0 +1,221 @@
+"""
+Versioned schema migrations.
+
+MIGRATIONS lists (version, name, function) in order. upgrade() applies every
+version newer than the highest one recorded in the schema_version table,
+each in its own transaction together with its schema_version row. Every
+migration checks the live schema before changing it, so it is safe on a
+database that already has the change (e.g. tables created by create_all,
+or columns added by the old one-off scripts) and on SQLite, MySQL and
+PostgreSQL alike.
+
+upgrade() holds a database-wide lock while it runs (GET_LOCK on MySQL,
+pg_advisory_lock on PostgreSQL, a process lock on SQLite), so workers that
+start together apply each migration once, one after the other.
+
+Migrations are not atomic on MySQL: every DDL statement commits
+implicitly, so a migration that fails part-way keeps the changes it made
+before the failure and its version is not recorded. Because each migration
+checks the live schema first, running upgrade() again completes it.
+
+Data backfills are not migrations: backfill_history_scores() fills the
+columns added by migration 2 in batches, one commit each, after upgrade()
+(the backend starts it in the background, so startup does not wait for it).
+
+New schema changes: declare them in models.py (for fresh databases) and
+append a migration here (for existing ones).
+
+Run from backend/: python schema_migrations.py [--status | --backfill]
+"""
+from contextlib import contextmanager
+import logging
+import sys
+import threading
+
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import IntegrityError
+
+import database
+import models
+import user_stats
+from quality_scoring import score_many
+
+BACKFILL_BATCH_SIZE = 1000
+
+# Name (MySQL GET_LOCK) and key (PostgreSQL advisory lock) of the lock upgrade() holds
+MIGRATION_LOCK_NAME = "promptengine_schema_migrations"
+MIGRATION_LOCK_KEY = 72615401
+MIGRATION_LOCK_TIMEOUT_SECONDS = 600
+
+_process_lock = threading.Lock()
+
+
+def add_column_if_missing(conn, table: str, column: str, ddl: str) -> bool:
+    """ALTER TABLE ... ADD COLUMN unless the column exists; ddl is the type and default clause"""
+    if column in {c["name"] for c in inspect(conn).get_columns(table)}:
+        return False
+    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+    return True
+
+
+def create_index_if_missing(conn, table, index_name: str) -> bool:
+    """Create an index declared on a models.py table unless an index of that name exists"""
+    if index_name in {index["name"] for index in inspect(conn).get_indexes(table.name)}:
+        return False
+    index = next(index for index in table.indexes if index.name == index_name)
+    index.create(bind=conn)
+    return True
+
+
+def add_quality_score_columns(conn):
+    """Dimension columns added after quality_scores was first created (was migrations/add_quality_columns.py)"""
+    for column in ("completeness", "structure", "practicality"):
+        add_column_if_missing(conn, "quality_scores", column, "FLOAT DEFAULT 0.0")
+
+
+def add_history_score_columns(conn):
+    """
+    original_overall / optimized_overall on optimization_history (was
+    migrations/add_history_score_columns.py); backfill_history_scores() fills them
+    """
+    for column in ("original_overall", "optimized_overall"):
+        add_column_if_missing(conn, "optimization_history", column, "FLOAT NULL")
+
+
+def add_hot_path_indexes(conn):
+    """Indexes behind /user/history, /user/analytics and the quality score lookups"""
+    create_index_if_missing(conn, models.UserActivity.__table__, "ix_user_activities_user_id_created_at")
+    create_index_if_missing(conn, models.OptimizationHistory.__table__, "ix_optimization_history_user_id_created_at")
+    create_index_if_missing(conn, models.Prompt.__table__, "ix_prompts_user_id_mode")
+    create_index_if_missing(conn, models.QualityScore.__table__, "ix_quality_scores_prompt_id")
+
+
+def add_history_keyset_index(conn):
+    """(created_at, id) index for keyset pages of /history over all users"""
+    create_index_if_missing(conn, models.OptimizationHistory.__table__, "ix_optimization_history_created_at_id")
+
+
+def build_user_stats(conn):
+    """user_stats rollup table, built from the existing activities, prompts and history"""
+    models.UserStats.__table__.create(bind=conn, checkfirst=True)
+    logger = logging.getLogger(__name__)
+    logger.info(f"✓ Built analytics rollups for {user_stats.rebuild(conn)} users")
+
+
+MIGRATIONS = [
+    (1, "add_quality_score_columns", add_quality_score_columns),
+    (2, "add_history_score_columns", add_history_score_columns),
+    (3, "add_hot_path_indexes", add_hot_path_indexes),
+    (4, "add_history_keyset_index", add_history_keyset_index),
+    (5, "build_user_stats", build_user_stats),
+]
+
+
+def current_version(engine=None) -> int:
+    """Highest applied migration version (0 for a database that has never been migrated)"""
+    engine = engine or database.engine
+    models.SchemaVersion.__table__.create(bind=engine, checkfirst=True)
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT MAX(version) FROM schema_version")).scalar() or 0
+
+
+@contextmanager
+def migration_lock(engine):
+    """Hold the database-wide migration lock (waits for a concurrent upgrade() to finish)"""
+    dialect = engine.dialect.name
+    if dialect not in ("mysql", "postgresql"):
+        # SQLite has no advisory locks; it only serves single-process deployments
+        with _process_lock:
+            yield
+        return
+
+    with engine.connect() as conn:
+        if dialect == "mysql":
+            acquired = conn.execute(
+                text("SELECT GET_LOCK(:name, :timeout)"),
+                {"name": MIGRATION_LOCK_NAME, "timeout": MIGRATION_LOCK_TIMEOUT_SECONDS}
+            ).scalar()
+            if acquired != 1:
+                raise RuntimeError(f"Timed out after {MIGRATION_LOCK_TIMEOUT_SECONDS}s waiting for the schema migration lock")
+        else:
+            conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+        conn.commit()  # the lock belongs to the session; do not keep a transaction open while migrating
+        try:
+            yield
+        finally:
+            if dialect == "mysql":
+                conn.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": MIGRATION_LOCK_NAME})
+            else:
+                conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_KEY})
+            conn.commit()
+
+
+def upgrade(engine=None) -> list:
+    """Apply pending migrations in order; returns the versions applied by this call"""
+    engine = engine or database.engine
+    logger = logging.getLogger(__name__)
+    applied = []
+    with migration_lock(engine):
+        version = current_version(engine)
+        for number, name, migrate in MIGRATIONS:
+            if number <= version:
+                continue
+            try:
+                with engine.begin() as conn:
+                    migrate(conn)
+                    conn.execute(models.SchemaVersion.__table__.insert().values(version=number, name=name))
+            except IntegrityError:
+                # Another process recorded this version first (SQLite has no cross-process lock)
+                logger.info(f"Schema migration {number} ({name}) already applied by another process")
+                continue
+            applied.append(number)
+            logger.info(f"✓ Applied schema migration {number}: {name}")
+    return applied
+
+
+def backfill_history_scores(engine=None, batch_size: int = BACKFILL_BATCH_SIZE) -> int:
+    """
+    Score optimization_history rows that have no original_overall / optimized_overall
+    yet (quality_scoring.score_many), committing every batch; returns the rows updated.
+    Safe to interrupt and to run again: it only picks rows that are still unscored.
+    """
+    engine = engine or database.engine
+    total = 0
+    last_id = 0
+    while True:
+        with engine.connect() as conn:
+            rows = conn.execute(text(
+                "SELECT id, original_prompt, optimized_prompt FROM optimization_history "
+                "WHERE id > :last_id AND (original_overall IS NULL OR optimized_overall IS NULL) "
+                f"ORDER BY id LIMIT {int(batch_size)}"
+            ), {"last_id": last_id}).fetchall()
+        if not rows:
+            break
+        original_scores = score_many([row.original_prompt or "" for row in rows])
+        optimized_scores = score_many([row.optimized_prompt or "" for row in rows])
+        with engine.begin() as conn:
+            conn.execute(
+                text("UPDATE optimization_history SET original_overall = :original, optimized_overall = :optimized WHERE id = :id"),
+                [
+                    {"id": row.id, "original": original["overall"], "optimized": optimized["overall"]}
+                    for row, original, optimized in zip(rows, original_scores, optimized_scores)
+                ]
+            )
+        total += len(rows)
+        last_id = rows[-1].id
+    if total:
+        logger = logging.getLogger(__name__)
+        logger.info(f"✓ Backfilled history scores for {total} rows")
+    return total
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    if "--status" in sys.argv:
+        latest = MIGRATIONS[-1][0]
+        print(f"Schema version {current_version()} (latest {latest})")
+    else:
+        database.Base.metadata.create_all(bind=database.engine)  # tables added since the database was created
+        if "--backfill" not in sys.argv:
+            print(f"Applied migrations: {upgrade() or 'none (up to date)'}")
+        print(f"Backfilled history scores for {backfill_history_scores()} rows")
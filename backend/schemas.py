@@ -33,6 +33,7 @@ class OptimizePromptRequest(BaseModel):
     add_documentation: bool = False
     performance_optimization: bool = False
     security_features: bool = False
+    race: bool = False  # Hedge the Gemini call for lower tail latency (may cost a second call)
 
 class OptimizePromptResponse(BaseModel):
     original_prompt: str
@@ -41,10 +42,47 @@ class OptimizePromptResponse(BaseModel):
     improvement_percentage: float
     mode: str
     model: str = "gemini"
+    served_by: str  # gemini, cache, fallback, deadline_fallback or circuit_open; set by every path
+    retries: int = 0  # Gemini retries made for this request
+
+class OptimizeBatchRequest(BaseModel):
+    items: List[OptimizePromptRequest]
+    concurrency: int = 8  # Capped by OPTIMIZE_BATCH_MAX_CONCURRENCY
+
+class OptimizeBatchItemResult(BaseModel):
+    index: int
+    original_prompt: str
+    optimized_prompt: Optional[str] = None
+    quality_scores: Optional[QualityScoreResponse] = None
+    improvement_percentage: Optional[float] = None
+    mode: str
+    model: Optional[str] = None
+    served_by: Optional[str] = None
+    retries: int = 0
+    prompt_id: Optional[int] = None
+    history_id: Optional[int] = None
+    error: Optional[str] = None
+
+class OptimizeBatchResponse(BaseModel):
+    results: List[OptimizeBatchItemResult]
+    succeeded: int
+    failed: int
 
 class AnalyzePromptRequest(BaseModel):
     prompt: str
 
+class QualityScoreBatchRequest(BaseModel):
+    prompts: List[str]
+
+class QualityScoreBatchItem(QualityScoreResponse):
+    context_richness: float
+    constraint_clarity: float
+    output_specification: float
+
+class QualityScoreBatchResponse(BaseModel):
+    scores: List[QualityScoreBatchItem]
+    count: int
+
 class AnalyzePromptResponse(BaseModel):
     word_count: int
     readability: str
@@ -0,0 +1,69 @@
+from collections import OrderedDict
+import hashlib
+import threading
+
+from prompt_features import PromptFeatures, extract_prompt_features
+
+
+class ScoreMemo:
+    """
+    Memo of prompt analyses (PromptFeatures, which carry the quality scores)
+    keyed by a content hash of the exact text.
+
+    /optimize scores the original prompt that /analyze and /quality-score
+    have usually just scored while the user typed it, so repeat scoring is a
+    dictionary lookup. Bounded LRU; sync endpoints score from the threadpool,
+    hence the lock. Records are immutable and a pure function of the text,
+    so they are shared without copying and never expire.
+    """
+
+    def __init__(self, max_entries: int = 4096, enabled: bool = True):
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._features = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    @staticmethod
+    def make_key(text: str) -> str:
+        # surrogatepass: JSON bodies can carry lone surrogates that strict UTF-8 rejects
+        return hashlib.sha256(text.encode("utf-8", "surrogatepass")).hexdigest()
+
+    def features(self, text: str) -> PromptFeatures:
+        """PromptFeatures for text, extracted at most once per distinct text while it stays in the LRU"""
+        if not self.enabled:
+            return extract_prompt_features(text)
+        key = self.make_key(text)
+        with self._lock:
+            features = self._features.get(key)
+            if features is not None:
+                self._features.move_to_end(key)
+                self._stats["hits"] += 1
+                return features
+            self._stats["misses"] += 1
+
+        features = extract_prompt_features(text)
+        with self._lock:
+            self._features[key] = features
+            self._features.move_to_end(key)
+            while len(self._features) > self.max_entries:
+                self._features.popitem(last=False)
+                self._stats["evictions"] += 1
+        return features
+
+    def score(self, text: str) -> dict:
+        """Quality scores for text as a fresh dict"""
+        return self.features(text).score_dict()
+
+    def __len__(self) -> int:
+        return len(self._features)
+
+    def get_stats(self) -> dict:
+        lookups = self._stats["hits"] + self._stats["misses"]
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._features),
+            "max_entries": self.max_entries,
+            **self._stats,
+            "hit_rate": round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,95 @@
+import re
+
+LIST_ITEM_START = re.compile(r'\d+\.')
+
+
+class IncrementalFormatter:
+    """
+    Applies a line-local output formatter to text that arrives in chunks.
+
+    Gemini streams arbitrary fragments, so a section header such as
+    `**3. Architecture Requirements**` can be split across two chunks. Text is
+    buffered until a full line is available, formatted with the same body
+    formatter the non-streaming path uses, and grouped into sections that
+    start at each header line. Joining the text of every returned section
+    gives the same string as `header + body(text.strip()) + footer`.
+    """
+
+    def __init__(self, format_body, section_pattern, header: str = "", footer: str = "",
+                 footer_marker: str = None, list_spacing: bool = False):
+        self.format_body = format_body
+        self.section_pattern = section_pattern
+        self.header = header
+        self.footer = footer
+        # When set, the footer is only added (after an rstrip) if this marker appears in the output
+        self.footer_marker = footer_marker
+        # Mirror the "blank line before numbered list items" rule of the general formatter
+        self.list_spacing = list_spacing
+
+        self._buffer = ""
+        self._started = False
+        self._pending = ""
+        self._marker_seen = False
+        self._section_title = None
+        self._section_parts = [header] if header else []
+
+    def feed(self, chunk: str) -> list:
+        """Add a chunk of raw model output; returns sections completed by it as (title, text) pairs"""
+        self._buffer += chunk
+        completed = []
+        while "\n" in self._buffer:
+            line, self._buffer = self._buffer.split("\n", 1)
+            completed.extend(self._add_line(line, final=False))
+        return completed
+
+    def finish(self) -> list:
+        """Flush the trailing partial line, footer and last section"""
+        completed = []
+        if self._buffer:
+            completed.extend(self._add_line(self._buffer, final=True))
+            self._buffer = ""
+
+        text = "".join(self._section_parts)
+        if self.footer_marker is None:
+            text += self.footer
+        elif self._marker_seen:
+            text = text.rstrip() + self.footer
+        if text:
+            completed.append((self._section_title, text))
+        self._section_parts = []
+        return completed
+
+    def _add_line(self, line: str, final: bool) -> list:
+        core = line.strip()
+        if not core:
+            # Whitespace-only lines are held back: they are dropped if nothing follows (text.strip())
+            if self._started:
+                self._pending += line + "\n"
+            return []
+
+        lead = line[:len(line) - len(line.lstrip())]
+        trail = line[len(line.rstrip()):]
+        if self._started:
+            joiner = self._pending
+            if self.list_spacing and not lead and LIST_ITEM_START.match(core):
+                joiner += "\n"
+        else:
+            # Leading whitespace of the whole output is stripped
+            joiner, lead = "", ""
+            self._started = True
+
+        formatted = self.format_body(core)
+        if self.footer_marker and self.footer_marker in formatted:
+            self._marker_seen = True
+
+        completed = []
+        match = self.section_pattern.search(core)
+        if match and self._section_parts:
+            completed.append((self._section_title, "".join(self._section_parts)))
+            self._section_parts = []
+        if match:
+            self._section_title = " ".join(g.strip() for g in match.groups() if g)
+
+        self._section_parts.append(joiner + lead + formatted)
+        self._pending = "" if final else trail + "\n"
+        return completed
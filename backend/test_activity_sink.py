@@ -0,0 +1,61 @@
+"""
+Tests for the write-behind activity sink
+"""
+
+import asyncio
+
+import database
+import models
+from activity_sink import ActivitySink
+
+
+def count_activities() -> int:
+    db = database.SessionLocal()
+    try:
+        return db.query(models.UserActivity).count()
+    finally:
+        db.close()
+
+
+def test_events_are_bulk_inserted_and_drained_on_stop(memory_db):
+    sink = ActivitySink(batch_size=100, flush_interval_ms=50)
+
+    async def scenario():
+        await sink.start()
+        for i in range(250):
+            assert await sink.log("user-1", "chat", {"i": i}, {"response_length": i})
+        await asyncio.sleep(0.2)
+        written_before_stop = count_activities()
+        for i in range(5):
+            await sink.log("user-1", "chat", {"i": i})
+        await sink.stop()
+        return written_before_stop
+
+    assert asyncio.run(scenario()) == 250
+    assert count_activities() == 255
+    assert len(memory_db.commits) <= 5
+    stats = sink.get_stats()
+    assert stats["written"] == 255 and stats["max_batch"] == 100 and not stats["running"]
+
+
+def test_full_queue_applies_backpressure_then_drops(memory_db):
+    sink = ActivitySink(max_queue=2, batch_size=10, flush_interval_ms=10000, put_timeout=0.05)
+
+    async def scenario():
+        await sink.start()
+        await asyncio.sleep(0)
+        results = [await sink.log("user-1", "chat") for _ in range(4)]
+        await sink.stop()
+        return results
+
+    # The third event waits until the flusher has taken the first; the fourth finds the queue full again
+    assert asyncio.run(scenario()) == [True, True, True, False]
+    stats = sink.get_stats()
+    assert stats["dropped"] == 1 and stats["backpressure_waits"] == 2
+    assert count_activities() == 3
+
+
+def test_logs_directly_when_not_started(memory_db):
+    sink = ActivitySink()
+    assert asyncio.run(sink.log("user-1", "prompt_optimize", {"mode": "ai-dev"}))
+    assert count_activities() == 1
@@ -0,0 +1,51 @@
+"""
+Tests for the offline Gemini stand-in
+"""
+
+import asyncio
+import re
+
+import pytest
+from google.api_core import exceptions as google_exceptions
+
+from fake_gemini import FakeGeminiClient, LatencyDistribution
+
+
+def test_canned_responses_follow_the_templates(make_service):
+    """Dev and image queries get 9 and 10 numbered sections"""
+    service = make_service(fake_gemini={"latency": "constant:0", "seed": 1, "error_rate": 0.0, "burst_rate": 0.0})
+
+    async def scenario():
+        dev = await service.optimize_prompt_for_mode("Build a todo app", "ai-dev")
+        image = await service.optimize_prompt_for_mode("A red fox", "image-generation")
+        return dev, image
+
+    dev, image = asyncio.run(scenario())
+
+    assert dev["source"] == image["source"] == "gemini"
+    assert len(re.findall(r"🔹 \d+\.", dev["optimized_prompt"])) == 9
+    assert len(re.findall(r"🖼️ \d+\.", image["optimized_prompt"])) == 10
+
+
+def test_rate_limit_bursts_raise_resource_exhausted():
+    """A 429 burst fails the configured number of consecutive calls"""
+    client = FakeGeminiClient(latency="constant:0", error_rate=0.0, burst_rate=1.0, burst_length=3, seed=1)
+
+    async def call():
+        try:
+            await client.generate("gemini-2.0-flash", "hello")
+        except google_exceptions.ResourceExhausted:
+            return "429"
+        return "ok"
+
+    async def scenario():
+        return [await call() for _ in range(3)]
+
+    assert asyncio.run(scenario()) == ["429"] * 3
+    assert client.get_stats()["rate_limited"] == 3
+
+
+def test_latency_spec_validation():
+    assert LatencyDistribution("constant:0.25").sample(None) == 0.25
+    with pytest.raises(ValueError):
+        LatencyDistribution("uniform:1")
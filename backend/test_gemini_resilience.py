@@ -0,0 +1,177 @@
+"""
+Tests for deadline budgets and fallback paths around Gemini calls
+"""
+
+import asyncio
+import time
+
+import pytest
+from google.api_core import exceptions as google_exceptions
+
+from circuit_breaker import CircuitBreaker
+from retry_policy import RetryBudget, RetryPolicy
+
+
+def test_deadline_serves_fallback(make_service):
+    """A Gemini call slower than the mode's budget is replaced by the fallback"""
+    async def hanging_generate(model_name, prompt, generation_config=None):
+        await asyncio.sleep(10)
+
+    service = make_service(generate=hanging_generate)
+    service.mode_configs['ai-dev']['deadline_seconds'] = 0.05
+
+    started = time.monotonic()
+    result = asyncio.run(service.optimize_prompt_for_mode("Build a todo app", "ai-dev"))
+
+    assert time.monotonic() - started < 1
+    assert result["source"] == "deadline_fallback"
+    assert result["optimized_prompt"] == service._structured_dev_fallback("Build a todo app", {})
+
+
+def test_call_is_dispatched_before_fallback_is_built(make_service):
+    """The fallback is prepared while the Gemini call is already in flight"""
+    events = []
+
+    async def slow_generate(model_name, prompt, generation_config=None):
+        events.append("dispatched")
+        await asyncio.sleep(10)
+
+    service = make_service(generate=slow_generate)
+    service.mode_configs['ai-dev']['deadline_seconds'] = 0.05
+    build_fallback = service._structured_dev_fallback
+
+    def recording_fallback(prompt, options):
+        events.append("fallback")
+        return build_fallback(prompt, options)
+
+    service._structured_dev_fallback = recording_fallback
+    result = asyncio.run(service.optimize_prompt_for_mode("Build a todo app", "ai-dev"))
+
+    assert events == ["dispatched", "fallback"]
+    assert result["source"] == "deadline_fallback"
+    assert result["optimized_prompt"] == build_fallback("Build a todo app", {})
+
+
+def test_api_error_serves_fallback(make_service):
+    """A failing Gemini call is reported as served by the fallback"""
+    async def failing_generate(model_name, prompt, generation_config=None):
+        raise RuntimeError("upstream unavailable")
+
+    service = make_service(generate=failing_generate)
+    result = asyncio.run(service.optimize_prompt_for_mode("Write a blog post", "content-writing"))
+
+    assert result["source"] == "fallback"
+
+
+def test_stream_deadline_before_first_section(make_service):
+    """A stream that stalls before sending anything falls back within the budget"""
+    async def stalled_stream(model_name, prompt, generation_config=None):
+        await asyncio.sleep(10)
+        yield "never"
+
+    service = make_service(stream=stalled_stream)
+    service.mode_configs['image-generation']['deadline_seconds'] = 0.05
+
+    async def collect():
+        return [event async for event in service.stream_optimize_prompt_for_mode("A red fox", "image-generation")]
+
+    events = asyncio.run(collect())
+
+    assert events[-1][1]["source"] == "deadline_fallback"
+    assert events[-1][1]["optimized_prompt"] == service._structured_image_fallback("A red fox", {})
+
+
+def test_breaker_opens_and_short_circuits(make_service):
+    """After the failure threshold, requests skip Gemini and use the fallback"""
+    calls = []
+
+    async def failing_generate(model_name, prompt, generation_config=None):
+        calls.append(model_name)
+        raise RuntimeError("upstream unavailable")
+
+    service = make_service(generate=failing_generate)
+    model_name = service.route("Write post number 0", "content-writing").model
+    service.breakers[model_name] = CircuitBreaker(model_name, failure_threshold=3, recovery_seconds=60)
+
+    async def scenario():
+        return [
+            await service.optimize_prompt_for_mode(f"Write post number {i}", "content-writing")
+            for i in range(5)
+        ]
+
+    results = asyncio.run(scenario())
+
+    assert len(calls) == 3
+    assert [r["source"] for r in results] == ["fallback"] * 3 + ["circuit_open"] * 2
+    state = service.get_breaker_states()[model_name]
+    assert state["state"] == "open"
+    assert state["short_circuited"] == 2
+
+
+def test_breaker_half_open_probes_close_it():
+    """Once the recovery time passes, limited probes go through and successes close the breaker"""
+    breaker = CircuitBreaker("gemini-2.0-flash", failure_threshold=1, recovery_seconds=0,
+                             half_open_probes=1, success_threshold=2)
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    assert breaker.allow_request()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow_request()  # probe slot taken
+    breaker.record_success()
+    assert breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    breaker.record_failure()
+    assert breaker.allow_request()  # recovery_seconds=0: straight to half-open
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_transient_errors_are_retried(make_service):
+    """429s are retried with backoff and the retry count is reported"""
+    attempts = []
+
+    async def flaky_generate(model_name, prompt, generation_config=None):
+        attempts.append(model_name)
+        if len(attempts) < 3:
+            raise google_exceptions.ResourceExhausted("quota")
+        return "**🎯 Objective**\nShip it"
+
+    service = make_service(generate=flaky_generate)
+    service.retry_policy = RetryPolicy(max_attempts=3, base_delay=0.001)
+    result = asyncio.run(service.optimize_prompt_for_mode("Write a launch post", "content-writing"))
+
+    assert result["source"] == "gemini"
+    assert result["retries"] == 2
+    assert service.get_metrics()["retries"]["recovered"] == 1
+
+
+def test_retry_budget_limits_amplification():
+    """Once the shared budget is spent, errors fail through without retrying"""
+    policy = RetryPolicy(max_attempts=5, base_delay=0, budget=RetryBudget(ratio=0.0, capacity=1))
+    attempts = []
+
+    async def unavailable():
+        attempts.append(1)
+        raise google_exceptions.ServiceUnavailable("down")
+
+    with pytest.raises(google_exceptions.ServiceUnavailable):
+        asyncio.run(policy.run(unavailable))
+
+    assert len(attempts) == 2  # one retry, then the budget is empty
+    assert policy.get_stats()["budget_exhausted"] == 1
+
+
+def test_non_retryable_errors_fail_fast():
+    policy = RetryPolicy(max_attempts=5, base_delay=0)
+    attempts = []
+
+    async def bad_request():
+        attempts.append(1)
+        raise google_exceptions.InvalidArgument("bad prompt")
+
+    with pytest.raises(google_exceptions.InvalidArgument):
+        asyncio.run(policy.run(bad_request))
+    assert len(attempts) == 1
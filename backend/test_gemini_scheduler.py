@@ -0,0 +1,70 @@
+"""
+Tests for per-model Gemini admission control
+"""
+
+import asyncio
+
+import pytest
+
+from gemini_scheduler import GeminiQueueFullError, GeminiScheduler, TokenBucket
+
+
+def test_concurrency_cap_is_respected():
+    """No more than max_concurrency calls run at once for a model"""
+    scheduler = GeminiScheduler(["gemini-2.0-flash"], max_concurrency=2, rpm=0, tpm=0, max_queue=10)
+    running, peak = 0, 0
+
+    async def call():
+        nonlocal running, peak
+        async with scheduler.slot("gemini-2.0-flash", "prompt"):
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+    async def scenario():
+        await asyncio.gather(*[call() for _ in range(8)])
+
+    asyncio.run(scenario())
+
+    stats = scheduler.get_stats()["gemini-2.0-flash"]
+    assert peak == 2
+    assert stats["admitted"] == 8
+    assert stats["queue_depth"] == 0
+    assert stats["max_wait_ms"] > 0
+
+
+def test_full_queue_rejects_excess_work():
+    """Callers beyond the queue bound are rejected instead of waiting"""
+    scheduler = GeminiScheduler(["gemini-2.0-pro"], max_concurrency=1, rpm=0, tpm=0, max_queue=1)
+
+    async def call():
+        async with scheduler.slot("gemini-2.0-pro", "prompt"):
+            await asyncio.sleep(0.02)
+
+    async def scenario():
+        return await asyncio.gather(*[call() for _ in range(3)], return_exceptions=True)
+
+    results = asyncio.run(scenario())
+
+    assert sum(isinstance(r, GeminiQueueFullError) for r in results) == 1
+    assert scheduler.get_stats()["gemini-2.0-pro"]["rejected"] == 1
+
+
+def test_token_bucket_wait_time():
+    """An empty bucket reports how long until enough tokens refill"""
+    bucket = TokenBucket(per_minute=60)
+    assert bucket.wait_time(60) == 0.0
+    bucket.take(60)
+    assert bucket.wait_time(1) == pytest.approx(1.0, abs=0.05)
+
+
+def test_per_model_overrides():
+    """Overrides replace the defaults for the named model only"""
+    scheduler = GeminiScheduler(
+        ["gemini-2.0-flash", "gemini-2.0-pro"], max_concurrency=16,
+        overrides={"gemini-2.0-pro": {"max_concurrency": 4}},
+    )
+    stats = scheduler.get_stats()
+    assert stats["gemini-2.0-pro"]["max_concurrency"] == 4
+    assert stats["gemini-2.0-flash"]["max_concurrency"] == 16
@@ -0,0 +1,48 @@
+"""
+Tests for per-mode generation configs
+"""
+
+import asyncio
+
+import gemini_service
+from gemini_service import GeminiService
+from optimization_cache import OptimizationCache
+
+
+def test_calls_use_the_mode_generation_config():
+    """temperature and max_output_tokens come from mode_configs"""
+    service = GeminiService()
+    service.cache = OptimizationCache(persistent=False)
+    service.client.enabled = True
+    seen = []
+
+    async def fake_generate(model_name, prompt, generation_config=None):
+        seen.append(generation_config)
+        return "**1. Image Title**\nFox"
+
+    service.client.generate = fake_generate
+    asyncio.run(service.optimize_prompt_for_mode("A red fox", "image-generation"))
+    asyncio.run(service.optimize_prompt_for_mode("Analyze churn", "business-analysis"))
+
+    assert seen == [
+        {"temperature": 0.8, "max_output_tokens": 1024},
+        {"temperature": 0.2, "max_output_tokens": 2560},
+    ]
+
+
+def test_adaptive_budget_is_bucketed_and_capped(monkeypatch):
+    """The adaptive budget grows with input size in fixed steps up to the mode's max_tokens"""
+    monkeypatch.setattr(gemini_service, "GEMINI_ADAPTIVE_OUTPUT_BUDGET", True)
+    monkeypatch.setattr(gemini_service, "GEMINI_OUTPUT_BUDGET_MIN", 1000)
+    monkeypatch.setattr(gemini_service, "GEMINI_OUTPUT_BUDGET_PER_INPUT_TOKEN", 4)
+    monkeypatch.setattr(gemini_service, "GEMINI_OUTPUT_BUDGET_STEP", 256)
+    service = GeminiService()
+
+    short = service._generation_config("content-writing", "Write a post")
+    medium = service._generation_config("content-writing", "x" * 400)
+    huge = service._generation_config("content-writing", "x" * 40000)
+
+    assert short["max_output_tokens"] == 1024
+    assert medium["max_output_tokens"] == 1536
+    assert huge["max_output_tokens"] == 3072
+    assert service._generation_config("content-writing", "Write a blog") is short
@@ -0,0 +1,139 @@
+"""
+Tests for hedged (raced) Gemini calls
+"""
+
+import asyncio
+import time
+
+from hedging import Hedger
+
+
+def test_slow_primary_is_hedged_and_cancelled():
+    """The hedge starts after the delay, wins, and the primary is cancelled"""
+    hedger = Hedger(default_delay=0.02)
+    cancelled = []
+
+    async def slow():
+        try:
+            await asyncio.sleep(1)
+            return "slow"
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def fast():
+        return "fast"
+
+    started = time.monotonic()
+    result = asyncio.run(hedger.race("primary-model", slow, "hedge-model", fast, bool))
+
+    assert result == ("hedge-model", "fast")
+    assert time.monotonic() - started < 0.5
+    assert cancelled == [True]
+    stats = hedger.get_stats()
+    assert (stats["hedged"], stats["hedge_wins"], stats["cancelled"]) == (1, 1, 1)
+
+
+def test_fast_primary_is_not_hedged():
+    hedger = Hedger(default_delay=0.5)
+    calls = []
+
+    async def primary():
+        return "ok"
+
+    async def hedge():
+        calls.append("hedge")
+        return "hedge"
+
+    assert asyncio.run(hedger.race("m", primary, "m", hedge, bool)) == ("m", "ok")
+    assert calls == []
+    assert hedger.get_stats()["hedge_rate"] == 0.0
+
+
+def test_invalid_primary_triggers_hedge_immediately():
+    """A primary answer that fails validation does not win; the hedge starts right away"""
+    hedger = Hedger(default_delay=5)
+
+    async def primary():
+        return ""
+
+    async def hedge():
+        return "**1. Project Title**\nTodo"
+
+    started = time.monotonic()
+    assert asyncio.run(hedger.race("m", primary, "m", hedge, bool)) == ("m", "**1. Project Title**\nTodo")
+    assert time.monotonic() - started < 1
+
+
+def test_delay_follows_observed_p90():
+    hedger = Hedger(default_delay=2.0, min_samples=10)
+    for i in range(1, 11):
+        hedger.observe("gemini-2.0-flash", i / 10)
+    assert hedger.delay_for("gemini-2.0-flash") == 1.0
+    assert hedger.delay_for("gemini-2.0-pro") == 2.0
+
+
+def test_race_option_through_service(make_service):
+    """optimize_prompt_for_mode with race=True returns the hedged answer"""
+    service = make_service()
+    service.hedger.default_delay = 0.02
+    calls = []
+
+    async def fake_generate(model_name, prompt, generation_config=None):
+        calls.append(model_name)
+        if len(calls) == 1:
+            await asyncio.sleep(1)
+        return "**1. Project Title**\nTodo App"
+
+    service.client.generate = fake_generate
+    result = asyncio.run(service.optimize_prompt_for_mode("Build a todo app", "ai-dev", {"race": True}))
+
+    assert result["source"] == "gemini"
+    assert len(calls) == 2
+    assert service.get_metrics()["hedging"]["hedge_wins"] == 1
+
+
+def test_race_starts_on_the_fast_tier_and_hedges_with_the_routed_model(make_service):
+    """A race routed to pro sends the primary to flash and only then hedges with pro"""
+    service = make_service()
+    service.hedger.default_delay = 0.02
+    calls = []
+
+    async def fake_generate(model_name, prompt, generation_config=None):
+        calls.append(model_name)
+        if len(calls) == 1:
+            await asyncio.sleep(1)
+        return "Optimized answer"
+
+    service.client.generate = fake_generate
+    result = asyncio.run(service._generate_with_deadline(
+        "research-academic", "gemini-2.0-pro", "query", str, lambda: "fallback", race=True
+    ))
+
+    assert result["source"] == "gemini"
+    assert calls == ["gemini-2.0-flash", "gemini-2.0-pro"]
+    assert service.router.capped("gemini-2.0-mini", "flash") == "gemini-2.0-mini"
+
+
+def test_raced_result_reports_and_caches_the_winning_model(make_service):
+    """A pro-routed race answered by flash is tagged and cached as flash, not served to pro requests"""
+    service = make_service()
+    service.router.mini_max_score, service.router.pro_min_score = -1, 0  # route every prompt to pro
+    calls = []
+
+    async def fake_generate(model_name, prompt, generation_config=None):
+        calls.append(model_name)
+        return f"Optimized by {model_name}"
+
+    service.client.generate = fake_generate
+
+    async def scenario():
+        raced = await service.optimize_prompt_for_mode("Write a blog post", "research-academic", {"race": True})
+        unraced = await service.optimize_prompt_for_mode("Write a blog post", "research-academic")
+        return raced, unraced
+
+    raced, unraced = asyncio.run(scenario())
+
+    assert raced["model"] == "gemini-2.0-flash" and "gemini-2.0-flash" in raced["optimized_prompt"]
+    assert unraced["model"] == "gemini-2.0-pro" and unraced["source"] == "gemini"
+    assert calls == ["gemini-2.0-flash", "gemini-2.0-pro"]
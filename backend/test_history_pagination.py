@@ -0,0 +1,70 @@
+"""
+Tests for keyset pagination of /history and /user/history
+"""
+
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+
+import database
+import main
+import models
+from auth import get_current_user
+from pagination import decode_cursor, encode_cursor
+
+
+def fetch_all(client, url: str) -> list:
+    rows, cursor = [], None
+    while True:
+        response = client.get(url + (f"&cursor={cursor}" if cursor else ""))
+        assert response.status_code == 200
+        rows += response.json()
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return rows
+
+
+def test_history_pages_are_complete_and_stable(memory_db):
+    start = datetime(2025, 1, 1)
+    db = database.SessionLocal()
+    # Three rows per timestamp: the id breaks ties
+    db.add_all([
+        models.OptimizationHistory(
+            prompt_id=i, original_prompt="x" * 500, optimized_prompt=f"optimized {i}", created_at=start + timedelta(minutes=i // 3)
+        )
+        for i in range(25)
+    ])
+    db.commit()
+    db.close()
+    client = TestClient(main.app)
+
+    rows = fetch_all(client, "/history?limit=10")
+    assert len(rows) == 25
+    assert [row["id"] for row in rows] == sorted((row["id"] for row in rows), reverse=True)
+
+    previews = fetch_all(client, "/history?limit=7&fields=preview")
+    assert [row["id"] for row in previews] == [row["id"] for row in rows]
+    assert len(previews[0]["original_preview"]) == main.HISTORY_PREVIEW_CHARS
+    assert "original_prompt" not in previews[0]
+
+    assert client.get("/history?cursor=not-a-cursor").status_code == 400
+    assert client.get("/history?limit=100000").status_code == 422
+
+
+def test_user_history_pages(memory_db):
+    db = database.SessionLocal()
+    db.add_all([models.UserActivity(user_id="user-1", activity_type="chat", created_at=datetime(2025, 1, 1)) for _ in range(12)])
+    db.add(models.UserActivity(user_id="user-2", activity_type="chat"))
+    db.commit()
+    db.close()
+    main.app.dependency_overrides[get_current_user] = lambda: {"id": "user-1"}
+    try:
+        rows = fetch_all(TestClient(main.app), "/user/history?limit=5")
+    finally:
+        main.app.dependency_overrides.clear()
+    assert len(rows) == 12 and len({row["id"] for row in rows}) == 12
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2025, 3, 4, 5, 6, 7, 890)
+    assert decode_cursor(encode_cursor(created_at, 42)) == (created_at, 42)
@@ -0,0 +1,104 @@
+"""
+Tests for incremental live analysis (/ws/analyze)
+"""
+
+import random
+
+from fastapi.testclient import TestClient
+
+import main
+from live_analysis import LiveAnalysis, utf16_length
+from prompt_features import extract_prompt_features
+from quality_scoring import extract_features, score_prompt
+
+PIECES = ["5", "users", "%", "x", ".", "\n", "\n\n", " ", "-", "* ", "1.", "e.g.", "use case", "API", "Build",
+          "😀", "ſeconds", "\n \n", "function"]
+
+
+def check_random_edits(max_lines: int):
+    for seed in range(150):
+        rng = random.Random(seed)
+        text = "".join(rng.choice(PIECES) for _ in range(rng.randint(0, 20)))
+        live = LiveAnalysis(text, max_lines=max_lines)
+        for _ in range(30):
+            start = rng.randint(0, len(text))
+            stop = rng.randint(start, min(len(text), start + 6))
+            inserted = "".join(rng.choice(PIECES) for _ in range(rng.randint(0, 3)))
+            live.apply_edit(utf16_length(text[:start]), utf16_length(text[start:stop]), inserted)
+            text = text[:start] + inserted + text[stop:]
+
+            assert live.text == text
+            assert live.features() == extract_features(text)
+            analysis = live.analysis()
+            assert analysis.pop("length") == utf16_length(text)
+            assert analysis == extract_prompt_features(text).analysis()
+
+
+def test_random_edits_match_full_analysis():
+    check_random_edits(max_lines=2000)
+
+
+def test_random_edits_across_the_line_limit():
+    """Texts switching between line-by-line and whole-text analysis still match a full analysis"""
+    check_random_edits(max_lines=3)
+
+
+def test_many_tiny_lines_are_analyzed_as_one_text():
+    text = "a\n" * 50000
+    live = LiveAnalysis(text)
+    assert not live.incremental
+    assert live.features() == extract_features(text)
+
+    live.apply_edit(0, utf16_length(text) - 2, "Build an API")  # back under the limit
+    assert live.incremental
+    assert live.text == "Build an APIa\n"
+    assert live.features() == extract_features(live.text)
+
+
+def test_cross_line_counts():
+    live = LiveAnalysis("Handle 5\nusers\n\nnext paragraph")
+    features = live.features()
+    assert features["quantitative_specs"] == 1
+    assert features["paragraphs"] == 2
+    assert features["sentences"] == 1
+
+    live.apply_edit(15, 1, "")  # drop the empty line: one paragraph
+    assert live.features()["paragraphs"] == 1
+
+
+def test_edit_offsets_are_utf16_units():
+    live = LiveAnalysis("😀 api")
+    assert live.length == 6
+    live.apply_edit(3, 3, "database")
+    assert live.text == "😀 database"
+
+    try:
+        live.apply_edit(1, 0, "x")  # inside the surrogate pair
+        assert False, "expected ValueError"
+    except ValueError:
+        pass
+    assert live.text == "😀 database"
+
+
+def test_websocket_analysis():
+    client = TestClient(main.app)
+    with client.websocket_connect("/ws/analyze") as websocket:
+        websocket.send_json({"type": "reset", "text": "Build an API", "seq": 1})
+        first = websocket.receive_json()
+        assert first["type"] == "analysis" and first["seq"] == 1
+        assert first["elements"] == ["🔌 API"]
+
+        websocket.send_json({"type": "edit", "offset": 12, "deleted": 0, "inserted": " with a database schema", "seq": 2})
+        second = websocket.receive_json()
+        text = "Build an API with a database schema"
+        assert second["length"] == len(text)
+        assert second["scores"]["overall"] == score_prompt(text)["overall"]
+        assert second["elements"] == ["🔌 API", "🗄️ Database"]
+
+        websocket.send_json({"type": "edit", "offset": 999, "deleted": 0, "inserted": "x"})
+        assert websocket.receive_json()["type"] == "error"
+
+        websocket.send_bytes(b"\x00\x01")  # binary frames are answered with an error, not a dropped connection
+        assert websocket.receive_json()["type"] == "error"
+        websocket.send_json({"type": "reset", "text": "Build an API", "seq": 3})
+        assert websocket.receive_json()["seq"] == 3
@@ -0,0 +1,61 @@
+"""
+Tests for the per-mode model bandit
+"""
+
+import asyncio
+
+from model_bandit import ModelBandit
+
+
+def test_bandit_prefers_improvement_per_second():
+    """After exploring, the arm with the best improvement per second wins"""
+    bandit = ModelBandit({"ai-dev": ["slow-model", "fast-model"]}, epsilon=0.0, min_pulls=2, persistent=False, seed=1)
+    outcomes = {"slow-model": (40.0, 4000), "fast-model": (30.0, 1000)}
+
+    async def scenario():
+        picks = []
+        for _ in range(10):
+            model_name = bandit.select("ai-dev")
+            picks.append(model_name)
+            await bandit.record("ai-dev", model_name, *outcomes[model_name])
+        return picks
+
+    picks = asyncio.run(scenario())
+
+    assert sorted(picks[:4]) == ["fast-model", "fast-model", "slow-model", "slow-model"]
+    assert set(picks[4:]) == {"fast-model"}
+    arms = bandit.get_stats()["arms"]["ai-dev"]
+    assert arms["fast-model"]["mean_reward"] == 30.0
+    assert arms["slow-model"]["mean_reward"] == 10.0
+
+
+def test_bandit_state_survives_restart(memory_db):
+    """Arm totals are written through and restored by load()"""
+    first = ModelBandit({"content-writing": ["gemini-2.0-mini", "gemini-2.0-flash"]})
+    asyncio.run(first.record("content-writing", "gemini-2.0-mini", 25.0, 800))
+    asyncio.run(first.record("content-writing", "unknown-model", 99.0, 100))
+
+    second = ModelBandit({"content-writing": ["gemini-2.0-mini", "gemini-2.0-flash"]})
+    second.load()
+
+    arms = second.get_stats()["arms"]["content-writing"]
+    assert arms["gemini-2.0-mini"]["pulls"] == 1
+    assert arms["gemini-2.0-mini"]["mean_improvement"] == 25.0
+    assert arms["gemini-2.0-flash"]["pulls"] == 0
+
+
+def test_workers_do_not_overwrite_each_others_pulls(memory_db):
+    """Two workers recording on the same arm add to the stored totals and see each other's pulls"""
+    candidates = {"content-writing": ["gemini-2.0-mini", "gemini-2.0-flash"]}
+    first, second = ModelBandit(candidates), ModelBandit(candidates)
+    first.load()
+    second.load()
+
+    asyncio.run(first.record("content-writing", "gemini-2.0-mini", 20.0, 1000))
+    asyncio.run(second.record("content-writing", "gemini-2.0-mini", 40.0, 1000))
+
+    assert second.get_stats()["arms"]["content-writing"]["gemini-2.0-mini"]["pulls"] == 2
+    restarted = ModelBandit(candidates)
+    restarted.load()
+    arm = restarted.get_stats()["arms"]["content-writing"]["gemini-2.0-mini"]
+    assert arm["pulls"] == 2 and arm["mean_improvement"] == 30.0
@@ -0,0 +1,162 @@
+"""
+Tests for optimization result caching and request coalescing
+"""
+
+from datetime import datetime, timedelta
+import asyncio
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from pydantic import ValidationError
+
+import database
+import main
+import models
+import schemas
+from gemini_service import GeminiService
+from optimization_cache import OptimizationCache
+
+
+def test_key_normalizes_whitespace_and_options():
+    """Whitespace differences and missing option flags map to the same key"""
+    base = OptimizationCache.make_key("Build a  todo\napp", "ai-dev", {}, "gemini-2.0-flash")
+    same = OptimizationCache.make_key("  Build a todo app ", "ai-dev", {"include_tests": False}, "gemini-2.0-flash")
+    other_mode = OptimizationCache.make_key("Build a todo app", "content-writing", {}, "gemini-2.0-flash")
+    other_flag = OptimizationCache.make_key("Build a todo app", "ai-dev", {"include_tests": True}, "gemini-2.0-flash")
+
+    assert base == same
+    assert base != other_mode
+    assert base != other_flag
+
+
+def test_lru_eviction_and_ttl():
+    """The in-memory tier is bounded and entries expire"""
+    cache = OptimizationCache(max_entries=2, ttl_seconds=60, persistent=False)
+
+    async def scenario():
+        await cache.put("a", "A")
+        await cache.put("b", "B")
+        assert await cache.get("a") == "A"  # 'a' becomes most recently used
+        await cache.put("c", "C")           # evicts 'b'
+        assert await cache.get("b") is None
+        assert await cache.get("c") == "C"
+
+        cache._entries["a"] = (time.time() - 1, "A")
+        assert await cache.get("a") is None
+
+    asyncio.run(scenario())
+
+    stats = cache.get_stats()
+    assert stats["evictions"] == 1
+    assert stats["expirations"] == 1
+    assert stats["memory_hits"] == 2
+    assert stats["misses"] == 2
+
+
+def test_service_serves_repeat_requests_from_cache():
+    """A repeated optimize request does not call Gemini again"""
+    service = GeminiService()
+    service.cache = OptimizationCache(persistent=False)
+    service.client.enabled = True
+    calls = []
+
+    async def fake_generate(model_name, prompt, generation_config=None):
+        calls.append(model_name)
+        return "**1. Project Title**\nTodo App"
+
+    service.client.generate = fake_generate
+
+    async def scenario():
+        first = await service.optimize_prompt_for_mode("Build a todo app", "ai-dev")
+        second = await service.optimize_prompt_for_mode("Build a  todo app", "ai-dev")
+        return first, second
+
+    first, second = asyncio.run(scenario())
+
+    assert len(calls) == 1
+    assert first["source"] == "gemini"
+    assert second["source"] == "cache"
+    assert second["optimized_prompt"] == first["optimized_prompt"]
+
+
+def test_concurrent_identical_requests_share_one_call():
+    """Identical in-flight requests are coalesced into a single Gemini call"""
+    service = GeminiService()
+    service.cache = OptimizationCache(persistent=False)
+    service.client.enabled = True
+    calls = []
+
+    async def slow_generate(model_name, prompt, generation_config=None):
+        calls.append(model_name)
+        await asyncio.sleep(0.05)
+        return "**1. Project Title**\nTodo App"
+
+    service.client.generate = slow_generate
+
+    async def scenario():
+        return await asyncio.gather(*[
+            service.optimize_prompt_for_mode("Build a todo app", "ai-dev") for _ in range(10)
+        ])
+
+    results = asyncio.run(scenario())
+
+    assert len(calls) == 1
+    assert len({r["optimized_prompt"] for r in results}) == 1
+    assert service.coalescer.get_stats()["collapsed"] == 9
+
+
+def test_expired_rows_are_deleted(memory_db):
+    """A lookup deletes the expired row it finds, and writes purge the other expired rows"""
+    cache = OptimizationCache(ttl_seconds=60, purge_interval_seconds=0)
+
+    def stored_keys() -> set:
+        db = database.SessionLocal()
+        try:
+            return {entry.cache_key for entry in db.query(models.OptimizationCacheEntry)}
+        finally:
+            db.close()
+
+    def expire(key: str):
+        db = database.SessionLocal()
+        try:
+            db.get(models.OptimizationCacheEntry, key).expires_at = datetime.utcnow() - timedelta(seconds=1)
+            db.commit()
+        finally:
+            db.close()
+
+    async def scenario():
+        await cache.put("a", "A")
+        await cache.put("b", "B")
+        expire("a")
+        expire("b")
+        cache.clear()
+        assert await cache.get("a") is None
+        assert stored_keys() == {"b"}
+        await cache.put("c", "C")  # the write purges 'b'
+
+    asyncio.run(scenario())
+    assert stored_keys() == {"c"}
+    assert cache.get_stats()["purged"] == 1
+
+
+def test_optimize_reports_the_path_that_served_it(monkeypatch, memory_db):
+    """/optimize says 'gemini' for a fresh answer and 'cache' for the repeat, never a default"""
+    async def fake_generate(model_name, prompt, generation_config=None):
+        return "Optimized content plan"
+
+    monkeypatch.setattr(main.gemini_service, "cache", OptimizationCache(persistent=False))
+    monkeypatch.setattr(main.gemini_service.client, "enabled", True)
+    monkeypatch.setattr(main.gemini_service.client, "generate", fake_generate)
+    client = TestClient(main.app)
+    request = {"original_prompt": "Write a launch blog post", "mode": "content-writing"}
+
+    first = client.post("/optimize", json=request).json()
+    second = client.post("/optimize", json=request).json()
+
+    assert (first["served_by"], second["served_by"]) == ("gemini", "cache")
+    with pytest.raises(ValidationError):
+        schemas.OptimizePromptResponse(
+            original_prompt="x", optimized_prompt="y", quality_scores=first["quality_scores"],
+            improvement_percentage=0.0, mode="ai-dev"
+        )
@@ -0,0 +1,62 @@
+"""
+Tests for the single-transaction optimization write path
+"""
+
+from fastapi.testclient import TestClient
+
+import database
+import main
+import models
+import optimization_store
+import schemas
+from optimization_cache import OptimizationCache
+from optimization_store import OptimizationUnitOfWork
+
+
+def test_optimize_commits_once(monkeypatch, memory_db):
+
+    async def fake_optimize(original_prompt, mode="ai-dev", options=None):
+        return {"optimized_prompt": f"Optimized: {original_prompt}", "mode": mode, "model": "gemini-2.0-flash", "source": "gemini"}
+
+    monkeypatch.setattr(main.gemini_service, "cache", OptimizationCache(persistent=False))
+    monkeypatch.setattr(main.gemini_service, "optimize_prompt_for_mode", fake_optimize)
+
+    response = TestClient(main.app).post("/optimize", json={"original_prompt": "Build an API", "mode": "ai-dev"})
+
+    assert response.status_code == 200
+    assert len(memory_db.commits) == 1
+    db = database.SessionLocal()
+    try:
+        prompt = db.query(models.Prompt).one()
+        assert db.query(models.QualityScore).one().prompt_id == prompt.id
+        assert db.query(models.OptimizationHistory).one().prompt_id == prompt.id
+    finally:
+        db.close()
+
+
+def test_unit_of_work_is_atomic(monkeypatch, memory_db):
+    scores = main.gemini_service.generate_quality_scores("Build an API")
+
+    unit = OptimizationUnitOfWork("user-1")
+    unit.add(schemas.OptimizePromptRequest(original_prompt="Build an API"), "Optimized", "gemini-2.0-flash", scores, scores, 0.0)
+    saved = unit.commit()
+    assert len(memory_db.commits) == 1 and saved[0]["prompt_id"] is not None
+
+    def broken_history(**kwargs):
+        raise RuntimeError("insert failed")
+
+    monkeypatch.setattr(optimization_store.models, "OptimizationHistory", broken_history)
+    unit = OptimizationUnitOfWork("user-1")
+    unit.add(schemas.OptimizePromptRequest(original_prompt="Another"), "Optimized", "gemini-2.0-flash", scores, scores, 0.0)
+    try:
+        unit.commit()
+        assert False, "expected RuntimeError"
+    except RuntimeError:
+        pass
+
+    db = database.SessionLocal()
+    try:
+        assert db.query(models.Prompt).count() == 1
+        assert db.query(models.QualityScore).count() == 1
+    finally:
+        db.close()
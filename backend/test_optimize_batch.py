@@ -0,0 +1,55 @@
+"""
+Tests for the batch optimization endpoint
+"""
+
+import asyncio
+
+from fastapi.testclient import TestClient
+
+import database
+import main
+import models
+from optimization_cache import OptimizationCache
+
+
+def test_batch_results_in_order_with_bulk_save(monkeypatch, memory_db):
+    """Items come back in request order, failures become error entries, successes are saved"""
+    running, peak = 0, 0
+
+    async def fake_optimize(original_prompt, mode="ai-dev", options=None):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        if "fail" in original_prompt:
+            raise RuntimeError("boom")
+        return {"optimized_prompt": f"Optimized: {original_prompt}", "mode": mode, "model": "gemini-2.0-flash", "source": "gemini"}
+
+    monkeypatch.setattr(main.gemini_service, "cache", OptimizationCache(persistent=False))
+    monkeypatch.setattr(main.gemini_service, "optimize_prompt_for_mode", fake_optimize)
+
+    items = [{"original_prompt": f"prompt {i}", "mode": "content-writing"} for i in range(6)]
+    items[3]["original_prompt"] = "please fail"
+
+    response = TestClient(main.app).post("/optimize/batch", json={"items": items, "concurrency": 2})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert [r["index"] for r in body["results"]] == list(range(6))
+    assert body["succeeded"] == 5 and body["failed"] == 1
+    assert body["results"][3]["error"] == "boom"
+    assert body["results"][0]["optimized_prompt"] == "Optimized: prompt 0"
+    assert body["results"][5]["history_id"] is not None
+    assert peak == 2
+
+    db = database.SessionLocal()
+    try:
+        assert db.query(models.Prompt).count() == 5
+        assert db.query(models.QualityScore).count() == 5
+        assert db.query(models.OptimizationHistory).count() == 5
+        history = db.query(models.OptimizationHistory).first()
+        assert history.original_overall == main.gemini_service.generate_quality_scores(history.original_prompt)["overall"]
+        assert history.optimized_overall == main.gemini_service.generate_quality_scores(history.optimized_prompt)["overall"]
+    finally:
+        db.close()
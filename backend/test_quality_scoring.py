@@ -0,0 +1,117 @@
+"""
+Tests for the single-pass quality scoring engine
+"""
+
+import dataclasses
+import random
+
+from benchmark_quality_scoring import SAMPLE_TEXT, legacy_quality_scores, make_prompt
+from prompt_features import extract_prompt_features
+from quality_scoring import LEXICONS, extract_features, score_many, score_prompt
+from score_memo import ScoreMemo
+
+EDGE_CASES = [
+    "",
+    "   \n\n  ",
+    "...",
+    "Use e.g. caching, e.g.redis, i.e.x and E.G.",
+    "50% of 10 users, 5%x, 3 %done, 20ms, 20 msx, 2gb and 7\nseconds",
+    "nice-to-have production-ready up to 5 use  case best practice",
+    "- item\n* item\n•item\n -x\n-\n1. one\n2.two 3.5",
+    "Process ſeconds 5ſeconds Kelvin İnclude ١٢ users",
+    "a\n\n\n\nb\n\n.c.\n\n",
+]
+
+
+def test_scores_match_reference_on_edge_cases():
+    for prompt in EDGE_CASES:
+        assert score_prompt(prompt) == legacy_quality_scores(prompt), prompt
+
+
+def test_scores_match_reference_on_random_prompts():
+    rng = random.Random(7)
+    vocabulary = [entry for entries in LEXICONS.values() for entry in entries] + [
+        "5", "12", "users", "ms", "%", "GB", ".", "-", "*", "(", "]", "\n", "\n\n", "x", "e.g.", "i.e.",
+    ]
+    for _ in range(2000):
+        prompt = "".join(
+            rng.choice(vocabulary) + rng.choice(["", " ", " ", "-", ".", "\n"]) for _ in range(rng.randint(0, 40))
+        )
+        assert score_prompt(prompt) == legacy_quality_scores(prompt), repr(prompt)
+
+
+def test_large_prompt_matches_reference():
+    prompt = make_prompt(20000, seed=3)
+    assert score_prompt(prompt) == legacy_quality_scores(prompt)
+
+
+def test_feature_vector_counts():
+    features = extract_features(SAMPLE_TEXT)
+    assert features["quantitative_specs"] == 4  # 10000 users, 200ms, 2 seconds, 5 MB ("95% of" has no word after the %)
+    assert features["examples_provided"] == 4  # e.g.checkout, i.e.orders, such as, for instance
+    assert features["bullets"] == 3
+    assert features["numbered_items"] == 3
+
+
+def test_score_many_matches_single_scoring():
+    prompts = EDGE_CASES + [make_prompt(size, seed=size) for size in (10, 300, 5000)]
+    assert score_many(prompts) == [score_prompt(prompt) for prompt in prompts]
+    assert score_many([]) == []
+
+
+def test_quality_score_batch_endpoint():
+    from fastapi.testclient import TestClient
+    import main
+
+    prompts = ["Build a secure API with 100 users", "", SAMPLE_TEXT]
+    response = TestClient(main.app).post("/quality-score/batch", json={"prompts": prompts})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["count"] == 3
+    for prompt, scores in zip(prompts, body["scores"]):
+        expected = score_prompt(prompt)
+        assert scores["overall"] == expected["overall"]
+        assert scores["context_richness"] == expected["context_richness"]
+
+
+def test_score_memo_hits_and_evicts():
+    memo = ScoreMemo(max_entries=2)
+
+    first = memo.score("Build a secure API")
+    first["overall"] = -1  # callers get copies
+    assert memo.score("Build a secure API") == score_prompt("Build a secure API")
+    memo.score("Design a database schema")
+    memo.score("Write tests")
+
+    stats = memo.get_stats()
+    assert stats["hits"] == 1 and stats["misses"] == 3
+    assert stats["evictions"] == 1 and len(memo) == 2
+
+
+def test_prompt_features_are_immutable_and_shared():
+    features = extract_prompt_features("Design a logo image for the API")
+    assert features.scores == score_prompt("Design a logo image for the API")
+    assert features.elements == ("🔌 API",)
+    try:
+        features.counts["words"] = 0
+        assert False, "expected TypeError"
+    except TypeError:
+        pass
+    try:
+        features.token_count = 0
+        assert False, "expected FrozenInstanceError"
+    except dataclasses.FrozenInstanceError:
+        pass
+
+    memo = ScoreMemo()
+    assert memo.features("Write tests") is memo.features("Write tests")
+
+
+def test_auto_detect_mode_uses_prompt_features():
+    import main
+
+    service = main.gemini_service
+    assert service._auto_detect_mode(service.prompt_features("Design a logo image for the banner")) == "image-generation"
+    assert service._auto_detect_mode(service.prompt_features("Implement a database API")) == "ai-dev"
+    assert service._auto_detect_mode(service.prompt_features("Hello there")) == "ai-dev"
@@ -0,0 +1,113 @@
+"""
+Tests for request-scoped model routing and per-session modes
+"""
+
+import asyncio
+import threading
+
+from fastapi.testclient import TestClient
+
+import main
+from auth import create_access_token
+from gemini_service import GeminiService
+from optimization_cache import OptimizationCache
+
+
+def test_concurrent_requests_keep_their_own_model():
+    """Interleaved requests for different modes each report the model that served them"""
+    service = GeminiService()
+    service.cache = OptimizationCache(persistent=False)
+    service.client.enabled = True
+    service.model_map['content-writing'] = "writer-model"
+    service.model_map['business-analysis'] = "analyst-model"
+    served = {}
+
+    async def fake_generate(model_name, prompt, generation_config=None):
+        await asyncio.sleep(0.01)
+        served.setdefault(model_name, 0)
+        served[model_name] += 1
+        return "**🎯 Objective**\nDone"
+
+    service.client.generate = fake_generate
+
+    async def scenario():
+        return await asyncio.gather(*[
+            service.optimize_prompt_for_mode(f"Task {i}", "content-writing" if i % 2 else "business-analysis")
+            for i in range(10)
+        ])
+
+    results = asyncio.run(scenario())
+
+    for result in results:
+        expected = "writer-model" if result["mode"] == "content-writing" else "analyst-model"
+        assert result["model"] == expected
+    assert served == {"writer-model": 5, "analyst-model": 5}
+    assert not hasattr(service, "model")
+
+
+def test_set_mode_is_per_session():
+    """/set-mode only changes the mode of the calling session"""
+    client = TestClient(main.app)
+
+    response = client.post("/set-mode", json={"mode": "image-generation"}, headers={"X-Session-ID": "alice"})
+    assert response.status_code == 200
+
+    assert client.get("/get-mode", headers={"X-Session-ID": "alice"}).json()["mode"] == "image-generation"
+    assert client.get("/get-mode", headers={"X-Session-ID": "bob"}).json()["mode"] == "ai-dev"
+
+
+def test_set_mode_follows_the_signed_in_user():
+    """A valid bearer token scopes the mode to the user across sessions; a bad token falls back to the session"""
+    client = TestClient(main.app)
+    token = create_access_token({"sub": "user@demo.com"})
+
+    client.post("/set-mode", json={"mode": "content-writing"}, headers={"Authorization": f"Bearer {token}", "X-Session-ID": "tab-1"})
+
+    assert client.get("/get-mode", headers={"Authorization": f"Bearer {token}", "X-Session-ID": "tab-2"}).json()["mode"] == "content-writing"
+    assert client.get("/get-mode", headers={"X-Session-ID": "tab-1"}).json()["mode"] == "ai-dev"
+    assert client.get("/get-mode", headers={"Authorization": "Bearer invalid", "X-Session-ID": "tab-1"}).json()["mode"] == "ai-dev"
+
+
+def test_complexity_router_downgrades_simple_prompts():
+    """Trivial prompts go to the mini tier; complex ones keep the mode's model"""
+    service = GeminiService()
+
+    trivial = service.route("Summarize transformers", "research-academic")
+    complex_prompt = (
+        "Design a secure API with authentication, caching and database schema migrations. "
+        "It must handle 5000 requests per second, must avoid data loss, and should limit "
+        "query latency to a maximum of 50 ms under a strict memory constraint. " * 3
+    )
+    heavy = service.route(complex_prompt, "research-academic")
+    capped = service.route(complex_prompt, "content-writing")
+
+    assert (trivial.tier, trivial.model) == ("mini", "gemini-2.0-mini")
+    assert (heavy.tier, heavy.model) == ("pro", "gemini-2.0-pro")
+    assert capped.tier == "flash"  # never above the mode's own model
+
+
+def test_assistant_persists_off_the_event_loop(monkeypatch, memory_db):
+    """/assistant saves the exchange from the threadpool and returns the stored created_at"""
+    threads = []
+    save = main._save_assistant_message
+
+    def recording_save(*args):
+        threads.append(threading.current_thread())
+        return save(*args)
+
+    async def fake_response(user_message, prompt_context=None, mode=None):
+        threads.append(threading.current_thread())  # the event loop's thread
+        return f"Answer to {user_message}"
+
+    monkeypatch.setattr(main, "_save_assistant_message", recording_save)
+    monkeypatch.setattr(main.gemini_service, "generate_assistant_response", fake_response)
+    response = TestClient(main.app).post("/assistant", json={"user_message": "Hi", "prompt_context": "ai-dev"})
+
+    assert response.status_code == 200 and response.json()["created_at"] is not None
+    loop_thread, save_thread = threads
+    assert save_thread is not loop_thread
+    db = main.database.SessionLocal()
+    try:
+        assert db.query(main.models.AssistantMessage).one().assistant_response == "Answer to Hi"
+    finally:
+        db.close()
@@ -0,0 +1,98 @@
+"""
+Tests for the versioned schema migrations
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import create_engine, event, inspect, text
+
+import database
+import schema_migrations
+from quality_scoring import score_prompt
+
+LEGACY_TABLES = [
+    "CREATE TABLE prompts (id INTEGER PRIMARY KEY, user_id VARCHAR(50), original TEXT NOT NULL, optimized TEXT, "
+    "mode VARCHAR(50), created_at DATETIME, updated_at DATETIME)",
+    "CREATE TABLE quality_scores (id INTEGER PRIMARY KEY, prompt_id INTEGER NOT NULL, clarity FLOAT, specificity FLOAT, "
+    "technical FLOAT, overall FLOAT, created_at DATETIME)",
+    "CREATE TABLE optimization_history (id INTEGER PRIMARY KEY, user_id VARCHAR(50), prompt_id INTEGER NOT NULL, "
+    "original_prompt TEXT NOT NULL, optimized_prompt TEXT NOT NULL, mode VARCHAR(50), model VARCHAR(50), "
+    "improvement_percentage FLOAT, created_at DATETIME)",
+    "CREATE TABLE user_activities (id INTEGER PRIMARY KEY, user_id VARCHAR(50) NOT NULL, activity_type VARCHAR(50) NOT NULL, "
+    "activity_data JSON, meta_data JSON, created_at DATETIME)",
+    "INSERT INTO optimization_history (user_id, prompt_id, original_prompt, optimized_prompt) "
+    "VALUES ('user-1', 1, 'Build an API', 'Build a REST API with 3 endpoints')",
+]
+
+
+def index_names(engine, table: str) -> set:
+    return {index["name"] for index in inspect(engine).get_indexes(table)}
+
+
+def test_upgrade_legacy_database(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as conn:
+        for statement in LEGACY_TABLES:
+            conn.execute(text(statement))
+
+    assert schema_migrations.current_version(engine) == 0
+    assert schema_migrations.upgrade(engine) == [1, 2, 3, 4, 5]
+    assert schema_migrations.current_version(engine) == schema_migrations.MIGRATIONS[-1][0]
+
+    assert {"completeness", "structure", "practicality"} <= {c["name"] for c in inspect(engine).get_columns("quality_scores")}
+    assert "ix_user_activities_user_id_created_at" in index_names(engine, "user_activities")
+    assert "ix_optimization_history_user_id_created_at" in index_names(engine, "optimization_history")
+    assert "ix_optimization_history_created_at_id" in index_names(engine, "optimization_history")
+    assert "ix_prompts_user_id_mode" in index_names(engine, "prompts")
+    assert "ix_quality_scores_prompt_id" in index_names(engine, "quality_scores")
+    with engine.connect() as conn:
+        row = conn.execute(text("SELECT original_overall, optimized_overall FROM optimization_history")).one()
+    assert row.original_overall is None  # scored by the backfill, not inside the migration
+
+    assert schema_migrations.upgrade(engine) == []
+
+
+def test_history_backfill_commits_per_batch(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as conn:
+        for statement in LEGACY_TABLES:
+            conn.execute(text(statement))
+        for i in range(4):
+            conn.execute(text(
+                "INSERT INTO optimization_history (prompt_id, original_prompt, optimized_prompt) VALUES (:i, 'x', 'y')"
+            ), {"i": i})
+    schema_migrations.upgrade(engine)
+    commits = []
+    event.listen(engine, "commit", lambda connection: commits.append(connection))
+
+    assert schema_migrations.backfill_history_scores(engine, batch_size=2) == 5
+    assert len(commits) == 3
+    with engine.connect() as conn:
+        row = conn.execute(text("SELECT original_overall, optimized_overall FROM optimization_history ORDER BY id")).first()
+    assert row.original_overall == score_prompt("Build an API")["overall"]
+    assert row.optimized_overall == score_prompt("Build a REST API with 3 endpoints")["overall"]
+    assert schema_migrations.backfill_history_scores(engine) == 0
+
+
+def test_upgrade_fresh_database_records_versions(tmp_path):
+    """create_all already has every column and index; migrations only record their versions"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'fresh.db'}")
+    database.Base.metadata.create_all(bind=engine)
+    assert schema_migrations.upgrade(engine) == [1, 2, 3, 4, 5]
+    assert "ix_quality_scores_prompt_id" in index_names(engine, "quality_scores")
+    assert schema_migrations.upgrade(engine) == []
+
+
+def test_concurrent_upgrades_apply_each_migration_once(tmp_path):
+    """Workers starting together wait for the migration lock instead of repeating DDL"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as conn:
+        for statement in LEGACY_TABLES:
+            conn.execute(text(statement))
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(lambda _: schema_migrations.upgrade(engine), range(4)))
+
+    assert sorted(version for applied in results for version in applied) == [1, 2, 3, 4, 5]
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM schema_version")).scalar() == 5
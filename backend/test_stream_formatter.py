@@ -0,0 +1,108 @@
+"""
+Tests for the incremental (streaming) output formatter
+"""
+
+import asyncio
+import random
+
+from gemini_service import GeminiService
+from optimization_cache import OptimizationCache
+
+DEV_OUTPUT = """
+
+**1. Project Title**
+Task Tracker API
+
+**2. High-Level Description**
+A service for teams.
+• Scalability requirements: 10k users
+• Rate limiting per key
+
+**3. Architecture Requirements**
+• Security requirements: OAuth2
+
+
+"""
+
+GUIDE_OUTPUT = """**📋 PROJECT OVERVIEW**
+Overview text.
+**Functional Requirements:**
+1. First step
+2. Second step
+  3. Indented step
+
+**🧪 TESTING**
+Write tests.
+"""
+
+
+def chunked(text, seed):
+    """Split text at random points, including inside section headers"""
+    rng = random.Random(seed)
+    chunks, i = [], 0
+    while i < len(text):
+        step = rng.randint(1, 12)
+        chunks.append(text[i:i + step])
+        i += step
+    return chunks
+
+
+def stream_through(formatter, chunks):
+    sections = []
+    for chunk in chunks:
+        sections.extend(formatter.feed(chunk))
+    sections.extend(formatter.finish())
+    return sections
+
+
+def test_streamed_sections_match_non_streaming_output():
+    """Concatenated sections equal the non-streaming formatter output for any chunking"""
+    service = GeminiService()
+    cases = [
+        ("ai-dev", DEV_OUTPUT, lambda t: service._format_structured_dev_output(t.strip())),
+        ("image-generation", DEV_OUTPUT, lambda t: service._format_structured_image_output(t.strip())),
+        ("content-writing", GUIDE_OUTPUT, lambda t: service._format_output(t.strip())),
+        ("content-writing", "No headers here.\n1. one\n", lambda t: service._format_output(t.strip())),
+    ]
+    for mode, raw, expected in cases:
+        for seed in range(25):
+            sections = stream_through(service._incremental_formatter(mode), chunked(raw, seed))
+            assert "".join(text for _, text in sections) == expected(raw), (mode, seed)
+
+
+def test_sections_split_on_headers():
+    """Each numbered header starts a new section, even when split across chunks"""
+    service = GeminiService()
+    chunks = ["**1. Project", " Title**\nTodo\n**2", ". High-Level Description**\nText"]
+    sections = stream_through(service._incremental_formatter("ai-dev"), chunks)
+
+    titles = [title for title, _ in sections]
+    assert titles == [None, "1. Project Title", "2. High-Level Description"]
+
+
+def test_stream_events_and_cache():
+    """The service streams start/section/result events and caches the full result"""
+    service = GeminiService()
+    service.cache = OptimizationCache(persistent=False)
+    service.client.enabled = True
+
+    async def fake_stream(model_name, prompt, generation_config=None):
+        for chunk in chunked(DEV_OUTPUT, 7):
+            yield chunk
+
+    service.client.stream = fake_stream
+
+    async def collect():
+        return [event async for event in service.stream_optimize_prompt_for_mode("Build a tracker", "ai-dev")]
+
+    events = asyncio.run(collect())
+    names = [name for name, _ in events]
+    result = events[-1][1]
+
+    assert names[0] == "start" and names[-1] == "result"
+    assert result["source"] == "gemini"
+    assert result["optimized_prompt"] == service._format_structured_dev_output(DEV_OUTPUT.strip())
+
+    replay = asyncio.run(collect())
+    assert replay[-1][1]["source"] == "cache"
+    assert replay[-1][1]["optimized_prompt"] == result["optimized_prompt"]
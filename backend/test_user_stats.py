@@ -0,0 +1,162 @@
+"""
+Tests for the per-user analytics rollups
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, func, select
+
+import database
+import main
+import models
+import schemas
+import user_stats
+from activity_sink import ActivitySink
+from auth import get_current_user
+from optimization_store import OptimizationUnitOfWork
+
+
+def aggregate(db, user_id: str) -> dict:
+    """The statistics the way /user/analytics used to compute them, from the raw tables"""
+    activities = db.query(models.UserActivity.activity_type, func.count()).filter(
+        models.UserActivity.user_id == user_id
+    ).group_by(models.UserActivity.activity_type).all()
+    modes = db.query(models.Prompt.mode, func.count()).filter(models.Prompt.user_id == user_id).group_by(models.Prompt.mode).all()
+    average = db.query(func.avg(models.OptimizationHistory.improvement_percentage)).filter(
+        models.OptimizationHistory.user_id == user_id
+    ).scalar() or 0.0
+    return {
+        "total_activities": sum(count for _, count in activities),
+        "total_prompts": sum(count for _, count in modes),
+        "activity_breakdown": dict(activities),
+        "mode_usage": dict(modes),
+        "average_improvement": round(average, 2),
+    }
+
+
+def record_traffic():
+    scores = main.gemini_service.generate_quality_scores("Build an API")
+    for user_id, modes in [("user-1", ["ai-dev", "ai-dev", "image-generation"]), ("user-2", ["content-writing"])]:
+        unit = OptimizationUnitOfWork(user_id)
+        for i, mode in enumerate(modes):
+            unit.add(schemas.OptimizePromptRequest(original_prompt="Build an API", mode=mode), "Optimized", "gemini-2.0-flash",
+                     scores, scores, 10.0 * i + 2.5)
+        unit.commit()
+
+    sink = ActivitySink(batch_size=3, flush_interval_ms=10)
+
+    async def log_activities():
+        await sink.start()
+        for activity_type in ["prompt_optimize", "chat", "chat", "prompt_optimize", "chat"]:
+            await sink.log("user-1", activity_type)
+        await sink.log("user-2", "chat")
+        await sink.stop()
+
+    asyncio.run(log_activities())
+
+
+def test_rollups_match_raw_aggregates_and_rebuild(memory_db):
+    record_traffic()
+
+    db = database.SessionLocal()
+    try:
+        for user_id in ("user-1", "user-2"):
+            stats = user_stats.read(db.connection(), user_id)
+            assert stats.pop("recent_activity_count") == stats["total_activities"]
+            assert stats == aggregate(db, user_id)
+    finally:
+        db.close()
+
+    with memory_db.engine.begin() as conn:
+        incremental = {user_id: user_stats.read(conn, user_id) for user_id in ("user-1", "user-2")}
+        conn.execute(models.UserStats.__table__.update().values(activity_counts={}, mode_counts={}))  # drifted rollups
+        assert user_stats.rebuild(conn) == 2
+        assert {user_id: user_stats.read(conn, user_id) for user_id in ("user-1", "user-2")} == incremental
+
+
+def test_recent_activity_window(memory_db):
+    today = datetime.utcnow().date()
+    delta = user_stats.StatsDelta()
+    for days_ago in (0, 3, 6, 7, 30):
+        delta.add_activity("chat", datetime.combine(today - timedelta(days=days_ago), datetime.min.time()))
+    with memory_db.engine.begin() as conn:
+        user_stats.apply_deltas(conn, {"user-1": delta}, today)
+        stats = user_stats.read(conn, "user-1", today)
+        assert stats["total_activities"] == 5 and stats["recent_activity_count"] == 3
+        assert user_stats.read(conn, "user-1", today + timedelta(days=3))["recent_activity_count"] == 2
+        assert user_stats.read(conn, "nobody")["total_activities"] == 0
+
+
+def test_user_analytics_endpoint_reads_rollup(memory_db):
+    record_traffic()
+    main.app.dependency_overrides[get_current_user] = lambda: {"id": "user-1"}
+    try:
+        body = TestClient(main.app).get("/user/analytics").json()
+    finally:
+        main.app.dependency_overrides.clear()
+    assert body["total_prompts"] == 3 and body["mode_usage"] == {"ai-dev": 2, "image-generation": 1}
+    assert body["activity_breakdown"] == {"prompt_optimize": 2, "chat": 3}
+    assert body["average_improvement"] == 12.5 and body["member_since"] is None
+
+
+def test_two_first_writes_for_the_same_user(monkeypatch, memory_db):
+    """A row created by another writer after the existence check is merged into, not inserted again"""
+    first, second = user_stats.StatsDelta(), user_stats.StatsDelta()
+    first.add_optimization("ai-dev", 10.0)
+    second.add_optimization("ai-dev", 20.0)
+    with memory_db.engine.begin() as conn:
+        user_stats.apply_deltas(conn, {"user-1": first})
+
+    monkeypatch.setattr(user_stats, "_row_exists", lambda conn, user_id: False)  # both writers saw no row
+    with memory_db.engine.begin() as conn:
+        user_stats.apply_deltas(conn, {"user-1": second})
+        stats = user_stats.read(conn, "user-1")
+    assert stats["mode_usage"] == {"ai-dev": 2} and stats["average_improvement"] == 15.0
+
+
+def test_concurrent_first_writes(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'stats.db'}", connect_args={"timeout": 30})
+    database.Base.metadata.create_all(bind=engine)
+
+    def write(i: int):
+        delta = user_stats.StatsDelta()
+        delta.add_activity("chat", datetime.utcnow())
+        with engine.begin() as conn:
+            user_stats.apply_deltas(conn, {"user-1": delta, f"user-{i + 2}": delta})
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(write, range(8)))
+
+    with engine.connect() as conn:
+        assert user_stats.read(conn, "user-1")["total_activities"] == 8
+        assert conn.execute(select(func.count()).select_from(models.UserStats.__table__)).scalar() == 9
+
+
+def test_rebuild_alongside_writers_keeps_every_delta(tmp_path):
+    """Rebuilds update the locked rows in place, so writers running between them lose nothing"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'stats.db'}", connect_args={"timeout": 30})
+    database.Base.metadata.create_all(bind=engine)
+
+    def write(i: int):
+        if i % 4 == 0:
+            with engine.begin() as conn:
+                user_stats.rebuild(conn, ["user-1"] if i % 8 else None)
+            return
+        created_at = datetime.utcnow()
+        delta = user_stats.StatsDelta()
+        delta.add_activity("chat", created_at)
+        with engine.begin() as conn:
+            conn.execute(models.UserActivity.__table__.insert().values(user_id="user-1", activity_type="chat", created_at=created_at))
+            user_stats.apply_deltas(conn, {"user-1": delta})
+
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        list(pool.map(write, range(24)))
+
+    with engine.connect() as conn:
+        assert user_stats.read(conn, "user-1")["total_activities"] == 18
+        assert user_stats.rebuild(conn, ["user-1", "nobody"]) == 2
+        assert user_stats.read(conn, "user-1")["total_activities"] == 18
+        assert user_stats.read(conn, "nobody")["total_activities"] == 0
@@ -0,0 +1,215 @@
+"""
+Per-user analytics rollups (the user_stats table behind /user/analytics).
+
+The write paths update a user's row in the same transaction as the rows
+they insert: the ActivitySink per flushed batch, OptimizationUnitOfWork
+per commit. /user/analytics then reads one row instead of aggregating
+user_activities, prompts and optimization_history. rebuild() recomputes
+rollups from those raw tables (repair job, and the backfill of schema
+migration 5).
+
+Run from backend/: python user_stats.py [--user USER_ID]
+"""
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+import logging
+import sys
+
+from sqlalchemy import bindparam, func, select
+
+import database
+import models
+
+# recent_activity_count covers this many calendar days (UTC), today included
+RECENT_DAYS = 7
+
+
+class StatsDelta:
+    """What one write adds to a user's rollup"""
+
+    __slots__ = ("activity_counts", "daily_activity", "mode_counts", "improvement_sum", "improvement_count")
+
+    def __init__(self):
+        self.activity_counts = Counter()
+        self.daily_activity = Counter()
+        self.mode_counts = Counter()
+        self.improvement_sum = 0.0
+        self.improvement_count = 0
+
+    def add_activity(self, activity_type: str, created_at: datetime):
+        self.activity_counts[activity_type] += 1
+        self.daily_activity[created_at.date().isoformat()] += 1
+
+    def add_optimization(self, mode: str, improvement_percentage: float):
+        self.mode_counts[mode] += 1
+        if improvement_percentage is not None:
+            self.improvement_sum += improvement_percentage
+            self.improvement_count += 1
+
+
+def _recent(daily_activity: dict, today) -> dict:
+    """Day buckets that still fall in the RECENT_DAYS window"""
+    cutoff = (today - timedelta(days=RECENT_DAYS - 1)).isoformat()
+    return {day: count for day, count in daily_activity.items() if day >= cutoff}
+
+
+def _merged(counts: dict, delta: Counter) -> dict:
+    merged = Counter(counts or {})
+    merged.update(delta)
+    return dict(merged)
+
+
+def _row_exists(conn, user_id: str) -> bool:
+    table = models.UserStats.__table__
+    return conn.execute(select(table.c.user_id).where(table.c.user_id == user_id)).first() is not None
+
+
+def _insert_if_missing(conn, user_id: str):
+    """Create the user's empty row; a row created meanwhile by another writer is left as it is"""
+    database.insert_if_missing(conn, models.UserStats.__table__, dict(
+        user_id=user_id, activity_counts={}, daily_activity={}, mode_counts={}, improvement_sum=0.0, improvement_count=0
+    ))
+
+
+def _lock(conn, condition=None):
+    """
+    Row-lock the user_stats rows matching condition (all rows if None) in user_id order.
+    SQLite ignores FOR UPDATE; a no-op UPDATE takes its database write lock instead.
+    """
+    table = models.UserStats.__table__
+    if conn.dialect.name == "sqlite":
+        update = table.update().values(user_id=table.c.user_id)
+        conn.execute(update.where(condition) if condition is not None else update)
+        return
+    locked = select(table.c.user_id).order_by(table.c.user_id).with_for_update()
+    conn.execute(locked.where(condition) if condition is not None else locked).all()
+
+
+def _select_for_update(conn, user_id: str):
+    table = models.UserStats.__table__
+    query = select(table).where(table.c.user_id == user_id)
+    if conn.dialect.name == "sqlite":
+        _lock(conn, table.c.user_id == user_id)
+        return conn.execute(query).one()
+    return conn.execute(query.with_for_update()).one()
+
+
+def apply_deltas(conn, deltas: dict, today=None):
+    """
+    Add {user_id: StatsDelta} to the users' rows within the caller's transaction.
+
+    A missing row is created with a conflict-tolerant insert before any row is
+    locked: on MySQL, two SELECT ... FOR UPDATE of the same missing row would
+    share a gap lock and their inserts deadlock. Rows are then locked in
+    user_id order, so concurrent writers cannot deadlock.
+    """
+    table = models.UserStats.__table__
+    today = today or datetime.utcnow().date()
+    for user_id in sorted(deltas):
+        if not _row_exists(conn, user_id):
+            _insert_if_missing(conn, user_id)
+    for user_id in sorted(deltas):
+        delta = deltas[user_id]
+        row = _select_for_update(conn, user_id)
+        conn.execute(table.update().where(table.c.user_id == user_id).values(
+            activity_counts=_merged(row.activity_counts, delta.activity_counts),
+            daily_activity=_recent(_merged(row.daily_activity, delta.daily_activity), today),
+            mode_counts=_merged(row.mode_counts, delta.mode_counts),
+            improvement_sum=(row.improvement_sum or 0.0) + delta.improvement_sum,
+            improvement_count=(row.improvement_count or 0) + delta.improvement_count,
+            updated_at=datetime.utcnow()
+        ))
+
+
+def read(conn, user_id: str, today=None) -> dict:
+    """The /user/analytics statistics of one user, from its rollup row"""
+    table = models.UserStats.__table__
+    row = conn.execute(select(table).where(table.c.user_id == user_id)).one_or_none()
+    activity_counts = (row.activity_counts if row else None) or {}
+    mode_counts = (row.mode_counts if row else None) or {}
+    recent = _recent((row.daily_activity if row else None) or {}, today or datetime.utcnow().date())
+    improvement_count = row.improvement_count if row else 0
+    return {
+        "total_activities": sum(activity_counts.values()),
+        "total_prompts": sum(mode_counts.values()),
+        "activity_breakdown": activity_counts,
+        "recent_activity_count": sum(recent.values()),
+        "mode_usage": mode_counts,
+        "average_improvement": round(row.improvement_sum / improvement_count, 2) if improvement_count else 0.0,
+    }
+
+
+def rebuild(conn, user_ids: list = None, today=None) -> int:
+    """
+    Recompute rollups from the raw tables (all users, or just user_ids) and
+    overwrite the stored rows; returns the number of rows written.
+
+    The rows are created if missing and locked like apply_deltas locks them
+    before the raw tables are read, so a concurrent writer has either committed
+    rows the rebuild counts, or waits and then adds its delta to the rebuilt row.
+    """
+    activities = models.UserActivity.__table__
+    prompts = models.Prompt.__table__
+    history = models.OptimizationHistory.__table__
+    table = models.UserStats.__table__
+    today = today or datetime.utcnow().date()
+    cutoff = datetime.combine(today - timedelta(days=RECENT_DAYS - 1), datetime.min.time())
+
+    if user_ids is None:
+        users = set(conn.execute(select(table.c.user_id)).scalars())
+        for user_column in (activities.c.user_id, prompts.c.user_id, history.c.user_id):
+            users.update(conn.execute(select(user_column).where(user_column.isnot(None)).distinct()).scalars())
+    else:
+        users = set(user_ids)
+    for user_id in sorted(users):
+        if not _row_exists(conn, user_id):
+            _insert_if_missing(conn, user_id)
+    _lock(conn, table.c.user_id.in_(user_ids) if user_ids is not None else None)
+
+    def scoped(query, user_column):
+        query = query.where(user_column.isnot(None))
+        return query.where(user_column.in_(user_ids)) if user_ids is not None else query
+
+    rollups = defaultdict(StatsDelta)
+    for user_id, activity_type, count in conn.execute(scoped(
+        select(activities.c.user_id, activities.c.activity_type, func.count()), activities.c.user_id
+    ).group_by(activities.c.user_id, activities.c.activity_type)):
+        rollups[user_id].activity_counts[activity_type] += count
+    day = func.date(activities.c.created_at)
+    for user_id, created_on, count in conn.execute(scoped(
+        select(activities.c.user_id, day, func.count()), activities.c.user_id
+    ).where(activities.c.created_at >= cutoff).group_by(activities.c.user_id, day)):
+        rollups[user_id].daily_activity[str(created_on)[:10]] += count
+    for user_id, mode, count in conn.execute(scoped(
+        select(prompts.c.user_id, prompts.c.mode, func.count()), prompts.c.user_id
+    ).group_by(prompts.c.user_id, prompts.c.mode)):
+        rollups[user_id].mode_counts[mode] += count
+    for user_id, improvement_sum, improvement_count in conn.execute(scoped(
+        select(history.c.user_id, func.sum(history.c.improvement_percentage), func.count(history.c.improvement_percentage)),
+        history.c.user_id
+    ).group_by(history.c.user_id)):
+        rollups[user_id].improvement_sum = improvement_sum or 0.0
+        rollups[user_id].improvement_count = improvement_count
+
+    if users:
+        conn.execute(table.update().where(table.c.user_id == bindparam("target_user_id")), [
+            {
+                "target_user_id": user_id,
+                "activity_counts": dict(rollups[user_id].activity_counts),
+                "daily_activity": dict(rollups[user_id].daily_activity),
+                "mode_counts": dict(rollups[user_id].mode_counts),
+                "improvement_sum": rollups[user_id].improvement_sum,
+                "improvement_count": rollups[user_id].improvement_count,
+                "updated_at": datetime.utcnow(),
+            }
+            for user_id in sorted(users)
+        ])
+    return len(users)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    users = [sys.argv[sys.argv.index("--user") + 1]] if "--user" in sys.argv else None
+    database.Base.metadata.create_all(bind=database.engine)
+    with database.engine.begin() as connection:
+        print(f"Rebuilt {rebuild(connection, users)} user_stats rows")
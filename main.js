@@ -3,12 +3,22 @@
 // API Client Configuration
 const API_BASE_URL = 'http://127.0.0.1:8000';
 
+// Per-tab id the backend keys the working mode by (when not signed in)
+function getSessionId() {
+    let sessionId = sessionStorage.getItem('promptengine_session_id');
+    if (!sessionId) {
+        sessionId = crypto.randomUUID();
+        sessionStorage.setItem('promptengine_session_id', sessionId);
+    }
+    return sessionId;
+}
+
 const apiClient = {
     async post(endpoint, data) {
         try {
             const response = await fetch(`${API_BASE_URL}${endpoint}`, {
                 method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
+                headers: { 'Content-Type': 'application/json', 'X-Session-ID': getSessionId() },
                 body: JSON.stringify(data)
             });
             if (!response.ok) {
@@ -23,7 +33,9 @@ const apiClient = {
     },
     async get(endpoint) {
         try {
-            const response = await fetch(`${API_BASE_URL}${endpoint}`);
+            const response = await fetch(`${API_BASE_URL}${endpoint}`, {
+                headers: { 'X-Session-ID': getSessionId() }
+            });
             if (!response.ok) throw new Error('API error');
             return await response.json();
         } catch (error) {
@@ -33,6 +45,81 @@ const apiClient = {
     }
 };
 
+// Live analysis over /ws/analyze: each keystroke sends only the edited range of the prompt
+class LiveAnalysisChannel {
+    constructor(onAnalysis) {
+        this.onAnalysis = onAnalysis;
+        this.socket = null;
+        this.text = null; // text the server holds; null until a reset has been sent
+        this.seq = 0;
+        this.retryAt = 0;
+        this.connect();
+    }
+
+    connect() {
+        if (typeof WebSocket === 'undefined') return;
+        this.retryAt = Date.now() + 5000;
+        try {
+            this.socket = new WebSocket(`${API_BASE_URL.replace(/^http/, 'ws')}/ws/analyze`);
+        } catch (error) {
+            this.socket = null;
+            return;
+        }
+        this.socket.onmessage = (event) => {
+            const message = JSON.parse(event.data);
+            if (message.type === 'error') {
+                // Out of sync: the next update sends the full text again
+                console.warn('Live analysis error, resyncing:', message.detail);
+                this.text = null;
+                return;
+            }
+            if (message.seq === this.seq) {
+                this.onAnalysis(message);
+            }
+        };
+        this.socket.onclose = () => {
+            this.socket = null;
+            this.text = null;
+        };
+    }
+
+    // Sync the server with the current text; returns false if the socket is not open (use HTTP instead)
+    update(text) {
+        if (!this.socket && Date.now() >= this.retryAt) this.connect();
+        if (!this.socket || this.socket.readyState !== WebSocket.OPEN) return false;
+
+        this.seq += 1;
+        const message = this.text === null
+            ? { type: 'reset', text }
+            : { type: 'edit', ...LiveAnalysisChannel.diff(this.text, text) };
+        this.socket.send(JSON.stringify({ ...message, seq: this.seq }));
+        this.text = text;
+        return true;
+    }
+
+    // Single replacement turning previous into next, in UTF-16 units, never splitting a surrogate pair
+    static diff(previous, next) {
+        const isHighSurrogate = (code) => code >= 0xD800 && code <= 0xDBFF;
+        const isLowSurrogate = (code) => code >= 0xDC00 && code <= 0xDFFF;
+
+        let start = 0;
+        const maxStart = Math.min(previous.length, next.length);
+        while (start < maxStart && previous.charCodeAt(start) === next.charCodeAt(start)) start++;
+        if (start > 0 && isHighSurrogate(previous.charCodeAt(start - 1))) start--;
+
+        let end = 0;
+        const maxEnd = Math.min(previous.length, next.length) - start;
+        while (end < maxEnd && previous.charCodeAt(previous.length - 1 - end) === next.charCodeAt(next.length - 1 - end)) end++;
+        if (end > 0 && isLowSurrogate(previous.charCodeAt(previous.length - end))) end--;
+
+        return {
+            offset: start,
+            deleted: previous.length - start - end,
+            inserted: next.slice(start, next.length - end)
+        };
+    }
+}
+
 class PromptEngine {
     constructor() {
         this.currentMode = 'ai-dev'; // Default mode
@@ -46,6 +133,12 @@ class PromptEngine {
         this.assistantMessages = [];
         this.promptAnalysis = {};
         this.improvementSuggestions = [];
+        this.liveAnalysis = new LiveAnalysisChannel((response) => {
+            // Ignore late results once the prompt is too short to analyze
+            if (document.getElementById('prompt-input').value.length >= 10) {
+                this.showAnalysis(response);
+            }
+        });
         
         this.init();
     }
@@ -568,39 +661,22 @@ class PromptEngine {
     analyzePromptQuality() {
         const prompt = document.getElementById('prompt-input').value;
         
+        // Keep the live analysis channel in sync with every change, even short prompts
+        const live = this.liveAnalysis.update(prompt);
+        
         if (prompt.length < 10) {
             this.updateQualityScores({ clarity: 0, specificity: 0, creativity: 0, technical: 0 });
             return;
         }
         
+        // Results arrive on the live channel when it is connected
+        if (live) {
+            return;
+        }
+        
         // Call backend API for analysis
         apiClient.post('/analyze', { prompt })
-            .then(response => {
-                // Update quality scores
-                const scores = {
-                    clarity: response.scores.clarity,
-                    specificity: response.scores.specificity,
-                    creativity: response.scores.creativity,
-                    technical: response.scores.technical
-                };
-                this.updateQualityScores(scores);
-                
-                // Update prompt analysis panel
-                const analysis = {
-                    wordCount: response.word_count,
-                    readability: response.readability,
-                    actionVerbs: response.action_verbs,
-                    elements: response.elements,
-                    scores: scores
-                };
-                this.updatePromptAnalysis(analysis);
-                
-                // Show analysis panel
-                const analysisPanel = document.getElementById('prompt-analysis');
-                if (analysisPanel) {
-                    analysisPanel.classList.remove('hidden');
-                }
-            })
+            .then(response => this.showAnalysis(response))
             .catch(error => {
                 console.warn('API analysis failed, using fallback');
                 // Fallback to client-side analysis
@@ -610,6 +686,33 @@ class PromptEngine {
             });
     }
     
+    showAnalysis(response) {
+        // Update quality scores
+        const scores = {
+            clarity: response.scores.clarity,
+            specificity: response.scores.specificity,
+            creativity: response.scores.creativity,
+            technical: response.scores.technical
+        };
+        this.updateQualityScores(scores);
+        
+        // Update prompt analysis panel
+        const analysis = {
+            wordCount: response.word_count,
+            readability: response.readability,
+            actionVerbs: response.action_verbs,
+            elements: response.elements,
+            scores: scores
+        };
+        this.updatePromptAnalysis(analysis);
+        
+        // Show analysis panel
+        const analysisPanel = document.getElementById('prompt-analysis');
+        if (analysisPanel) {
+            analysisPanel.classList.remove('hidden');
+        }
+    }
+    
     performDetailedAnalysis(prompt) {
         // Detailed prompt analysis
         const wordCount = prompt.trim().split(/\s+/).filter(word => word.length > 0).length;
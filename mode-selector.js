@@ -494,11 +494,21 @@ class ModeSelector {
         }
     }
 
+    // Per-tab id the backend keys the working mode by (same storage key as main.js)
+    getSessionId() {
+        let sessionId = sessionStorage.getItem('promptengine_session_id');
+        if (!sessionId) {
+            sessionId = crypto.randomUUID();
+            sessionStorage.setItem('promptengine_session_id', sessionId);
+        }
+        return sessionId;
+    }
+
     async updateBackendMode() {
         try {
             await fetch(`${API_BASE_URL}/set-mode`, {
                 method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
+                headers: { 'Content-Type': 'application/json', 'X-Session-ID': this.getSessionId() },
                 body: JSON.stringify({
                     mode: this.selectedMode,
                     config: this.modeConfigurations[this.selectedMode]